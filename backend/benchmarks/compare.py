@@ -0,0 +1,61 @@
+"""对比两次压测结果
+
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/new.json --threshold 10
+
+p95延迟上升或吞吐下降超过 threshold 百分比的场景视为回退，存在回退时退出码为1。
+"""
+import sys
+import json
+import argparse
+
+METRICS = ("throughput", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(base: float, new: float) -> float:
+    return (new - base) / base * 100 if base else 0.0
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    print(f"基准 {base['version']} ({base['timestamp']})  对比 {new['version']} ({new['timestamp']})")
+    print(f"{'场景':<24}" + "".join(f"{metric:>22}" for metric in METRICS))
+    regressions = []
+    for name in sorted(set(base["scenarios"]) | set(new["scenarios"])):
+        if name not in base["scenarios"] or name not in new["scenarios"]:
+            print(f"{name:<24}  仅存在于{'新' if name in new['scenarios'] else '基准'}结果中")
+            continue
+        before, after = base["scenarios"][name], new["scenarios"][name]
+        cells = []
+        for metric in METRICS:
+            change = _change(before[metric], after[metric])
+            cells.append(f"{before[metric]:>8} → {after[metric]:<8}{change:+5.0f}%")
+        print(f"{name:<24}" + "".join(f"{cell:>22}" for cell in cells))
+        if _change(before["p95_ms"], after["p95_ms"]) > threshold:
+            regressions.append(f"{name} p95 {before['p95_ms']}ms → {after['p95_ms']}ms")
+        if -_change(before["throughput"], after["throughput"]) > threshold:
+            regressions.append(f"{name} 吞吐 {before['throughput']} → {after['throughput']} ops/s")
+
+    rss_change = _change(base["peak_rss_bytes"], new["peak_rss_bytes"])
+    print(f"内存峰值 {base['peak_rss_bytes'] / 1024 / 1024:.1f}MB → {new['peak_rss_bytes'] / 1024 / 1024:.1f}MB ({rss_change:+.0f}%)")
+    if rss_change > threshold:
+        regressions.append(f"内存峰值上升 {rss_change:.0f}%")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="对比两次压测结果")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10, help="判定回退的变化百分比")
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print("\n性能回退:\n" + "\n".join(f"  {item}" for item in regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
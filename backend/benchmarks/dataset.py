@@ -0,0 +1,86 @@
+"""压测和微基准测试使用的固定数据集：同一种子总是生成相同的图片和记录"""
+import io
+import os
+import math
+import random
+from typing import List, Tuple
+from PIL import Image, ImageDraw
+
+SEED = 20240101
+
+# 生成的大文件缓存目录（不提交到仓库）
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".data")
+
+# 预置图片的文件名词表，搜索场景从中取关键词
+WORDS = [
+    "sunset", "beach", "mountain", "forest", "city", "night", "portrait", "coffee",
+    "sheep", "window", "winter", "flower", "river", "street", "cat", "dog",
+]
+
+
+def make_image(width: int, height: int, image_format: str = "PNG", seed: int = SEED) -> bytes:
+    """生成确定性的色块图片（压缩率接近真实截图和插画）"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(24):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randrange(1, width // 2 + 2), y0 + rng.randrange(1, height // 2 + 2)
+        draw.rectangle((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def small_images(count: int, seed: int = SEED) -> List[Tuple[str, bytes, str]]:
+    """批量上传使用的小图：(文件名, 内容, Content-Type)，尺寸和格式按种子轮换"""
+    rng = random.Random(seed)
+    images = []
+    for i in range(count):
+        width, height = rng.choice([(320, 240), (800, 600), (1280, 720), (1600, 1200)])
+        if i % 3 == 2:
+            images.append((f"{rng.choice(WORDS)}-{i}.jpg", make_image(width, height, "JPEG", seed + i), "image/jpeg"))
+        else:
+            images.append((f"{rng.choice(WORDS)}-{i}.png", make_image(width, height, "PNG", seed + i), "image/png"))
+    return images
+
+
+def large_image(size_mb: int, seed: int = SEED) -> str:
+    """切片上传使用的大图：随机噪点PNG（几乎不可压缩，文件大小约等于 size_mb），生成后缓存到 DATA_DIR"""
+    path = os.path.join(DATA_DIR, f"noise_{size_mb}mb_{seed}.png")
+    if os.path.exists(path):
+        return path
+    os.makedirs(DATA_DIR, exist_ok=True)
+    side = int(math.sqrt(size_mb * 1024 * 1024 / 3))
+    image = Image.frombytes("RGB", (side, side), random.Random(seed).randbytes(side * side * 3))
+    temp_path = f"{path}.tmp"
+    image.save(temp_path, "PNG", compress_level=1)
+    os.replace(temp_path, path)
+    return path
+
+
+def image_rows(user_id: int, username: str, count: int, base_url: str, seed: int = SEED) -> List[dict]:
+    """预置的图片记录（只写数据库，不生成文件），用于深分页和搜索场景"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        stem = f"{username}_seed_{i:08d}"
+        filename = f"{rng.choice(WORDS)}-{rng.choice(WORDS)}-{i}.png"
+        url = f"{base_url}/static/{username}/images/{stem}.png"
+        rows.append({
+            "user_id": user_id,
+            "filename": filename,
+            "nicname": f"seed-{username}-{i}",
+            "path": f"static/{username}/images/{stem}.png",
+            "url": url,
+            "markdown": f"![{filename}]({url})",
+            "html": f'<img src="{url}" alt="{filename}">',
+            "format": "png",
+            "width": rng.choice([320, 800, 1280, 1600]),
+            "height": rng.choice([240, 600, 720, 1200]),
+            # 直接写表时不会经过ORM的默认值
+            "bytes_saved": 0,
+            "access_count": 0,
+            "storage_tier": "hot",
+        })
+    return rows
@@ -0,0 +1,476 @@
+"""端到端压测
+
+在临时目录中启动应用（SQLite，或通过 --database-url 指定本地MySQL容器），Gitee指向本地模拟服务，
+按比例混合批量上传、10~100MB切片上传、深分页、搜索、外部Token鉴权和删除请求，
+输出各场景的延迟分位数、吞吐量和服务进程内存峰值（JSON，可用 benchmarks.compare 对比两个版本）。
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.load_test --duration 60 --concurrency 16 --output benchmarks/results/base.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+import httpx
+from sqlalchemy import create_engine, MetaData, Table, insert
+from benchmarks import dataset
+from benchmarks.stand_ins import FakeGitee
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "batch_upload=3,chunked_upload=0.2,list_deep=5,search=3,token_auth=2,delete=2"
+PAGE_SIZE = 20
+PASSWORD = "bench-password"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_version() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=10
+        ).stdout.strip() or "unknown"
+    except Exception:
+        return "unknown"
+
+
+def _process_tree(pid: int) -> List[int]:
+    """进程及其所有子进程（uvicorn多worker、图片处理进程池）"""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RssSampler:
+    """定期采样服务进程树的常驻内存之和，记录峰值（仅Linux）"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, sum(_rss(pid) for pid in _process_tree(self.pid)))
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+
+def _percentile(sorted_values: List[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """按场景记录每次操作的耗时、失败数和传输字节数"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    def record(self, name: str, seconds: float, ok: bool, nbytes: int = 0) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+        self.bytes[name] = self.bytes.get(name, 0) + nbytes
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        scenarios = {}
+        for name, values in sorted(self.latencies.items()):
+            ordered = sorted(values)
+            scenarios[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "throughput": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 2),
+                "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+                "bytes": self.bytes.get(name, 0),
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "total_operations": total,
+            "total_errors": sum(self.errors.values()),
+            "throughput": round(total / elapsed, 2) if elapsed else 0,
+            "scenarios": scenarios,
+        }
+
+
+def _ok(response: httpx.Response) -> bool:
+    """接口统一返回200，业务错误在响应体的code中"""
+    if response.status_code != 200:
+        return False
+    try:
+        return response.json().get("code") == 0
+    except ValueError:
+        return False
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.mix = self._parse_mix(args.mix)
+        self.recorder = Recorder()
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.workdir = tempfile.mkdtemp(prefix="imagebed-bench-")
+        self.database_url = args.database_url or f"sqlite:///{os.path.join(self.workdir, 'bench.db')}"
+        self.gitee = FakeGitee(args.gitee_latency_ms / 1000)
+        self.server: Optional[subprocess.Popen] = None
+        self._log = None
+        self.users: List[dict] = []
+        self.small_images = dataset.small_images(20)
+        self.large_files: Dict[int, bytes] = {}
+        self._counter = 0
+
+    @staticmethod
+    def _parse_mix(mix: str) -> Dict[str, float]:
+        weights = {}
+        for item in mix.split(","):
+            name, _, weight = item.partition("=")
+            if name.strip():
+                weights[name.strip()] = float(weight or 1)
+        unknown = set(weights) - set(SCENARIOS)
+        if unknown:
+            raise SystemExit(f"未知的场景: {', '.join(sorted(unknown))}，可选: {', '.join(SCENARIOS)}")
+        return weights
+
+    # ---- 服务启动与数据准备 ----
+
+    def start_server(self) -> None:
+        self.gitee.start()
+        max_chunked_mb = max(self.args.chunked_sizes) if self.args.chunked_sizes else 10
+        env = dict(
+            os.environ,
+            PYTHONPATH=BACKEND_DIR,
+            DATABASE_URL=self.database_url,
+            # 压测不依赖Redis：留空时应用内依赖Redis的功能（如限流）使用进程内实现
+            REDIS_URL="",
+            BASE_URL=self.base_url,
+            MAX_FILE_SIZE=str((max_chunked_mb + 1) * 1024 * 1024),
+            CHUNK_SIZE=str(self.args.chunk_size),
+            GITEE_ACCESS_TOKEN="bench-token" if self.args.gitee else "",
+            GITEE_REPO_OWNER="bench",
+            GITEE_REPO_NAME="bench",
+            GITEE_API_URL=self.gitee.api_url,
+            # 压测的是服务本身的容量，关闭限流避免大部分请求直接返回429
+            RATE_LIMIT_ENABLED="false",
+            TIMING_LOG_SAMPLE_RATE="0",
+            TIMING_LOG_SLOW_MS="3600000",
+        )
+        os.makedirs(os.path.join(self.workdir, "static"), exist_ok=True)
+        command = [
+            sys.executable, "-m", "uvicorn", "src.main:app",
+            "--host", "127.0.0.1", "--port", str(self.port),
+            "--workers", str(self.args.workers), "--log-level", "warning",
+        ]
+        # 在临时目录中运行，上传文件、临时切片和SQLite数据库都不会写入仓库；应用日志（含事件循环阻塞报告）写入 server.log
+        self._log = open(os.path.join(self.workdir, "server.log"), "w")
+        self.server = subprocess.Popen(command, cwd=self.workdir, env=env, stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            try:
+                if httpx.get(f"{self.base_url}/health", timeout=1).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if self.server.poll() is not None:
+                raise SystemExit(f"应用启动失败，日志: {os.path.join(self.workdir, 'server.log')}")
+            time.sleep(0.2)
+        raise SystemExit("等待应用启动超时")
+
+    def stop_server(self) -> None:
+        if self.server is not None:
+            self.server.terminate()
+            try:
+                self.server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.server.kill()
+        self.gitee.stop()
+        self._log.close()
+        if self.args.keep_workdir:
+            print(f"临时目录: {self.workdir}")
+        else:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        """注册用户、登录、创建外部Token，并为每个用户预置图片记录"""
+        run_id = f"{int(time.time())}{random.randrange(1000):03d}"
+        for i in range(self.args.users):
+            username = f"bench{run_id}u{i}"
+            response = await client.post("/api/auth/register", json={"username": username, "password": PASSWORD})
+            user_id = response.json()["data"]["id"]
+            response = await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+            headers = {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+            self.users.append({"id": user_id, "username": username, "headers": headers, "tokens": [], "uploaded": []})
+
+        # 外部Token校验会逐个比对所有Token，Token数量决定鉴权风暴的代价
+        for i in range(self.args.tokens):
+            user = self.users[i % len(self.users)]
+            response = await client.post("/api/tokens", json={"name": f"bench-{i}"}, headers=user["headers"])
+            user["tokens"].append(response.json()["data"]["token"])
+
+        if self.args.seed_images:
+            engine = create_engine(self.database_url)
+            images = Table("images", MetaData(), autoload_with=engine)
+            with engine.begin() as conn:
+                for user in self.users:
+                    rows = dataset.image_rows(user["id"], user["username"], self.args.seed_images, self.base_url)
+                    for start in range(0, len(rows), 1000):
+                        conn.execute(insert(images), rows[start:start + 1000])
+            engine.dispose()
+
+    # ---- 场景 ----
+
+    def _nicname(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}-{self._counter}"
+
+    async def _timed(self, name: str, request, nbytes: int = 0) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.recorder.record(name, time.perf_counter() - start, False, nbytes)
+            return None
+        self.recorder.record(name, time.perf_counter() - start, _ok(response), nbytes)
+        return response
+
+    async def batch_upload(self, client, user, rng):
+        files = rng.sample(self.small_images, self.args.batch_size)
+        response = await self._timed("batch_upload", client.post(
+            "/api/images",
+            headers=user["headers"],
+            files=[("files", (name, content, content_type)) for name, content, content_type in files],
+            data={"nicnames": [self._nicname(user["username"]) for _ in files]},
+        ), sum(len(content) for _, content, _ in files))
+        if response is not None and _ok(response):
+            user["uploaded"].extend(image["id"] for image in response.json()["data"]["images"])
+
+    def _large_file(self, size_mb: int) -> bytes:
+        if size_mb not in self.large_files:
+            with open(dataset.large_image(size_mb), "rb") as f:
+                self.large_files[size_mb] = f.read()
+        return self.large_files[size_mb]
+
+    async def chunked_upload(self, client, user, rng):
+        """init → 逐个上传切片 → merge，整个流程计为一次操作"""
+        size_mb = rng.choice(self.args.chunked_sizes)
+        content = self._large_file(size_mb)
+        chunk_size = self.args.chunk_size
+        total_chunks = (len(content) + chunk_size - 1) // chunk_size
+        start = time.perf_counter()
+        name = f"chunked_upload_{size_mb}mb"
+        try:
+            response = await client.post("/api/images/chunk/init", headers=user["headers"], json={
+                "filename": f"large-{size_mb}mb.png",
+                "file_size": len(content),
+                "total_chunks": total_chunks,
+                "nicname": self._nicname(user["username"]),
+            })
+            ok = _ok(response)
+            if ok:
+                upload_id = response.json()["data"]["upload_id"]
+                for index in range(total_chunks):
+                    response = await client.post("/api/images/chunk/upload", headers=user["headers"], data={
+                        "upload_id": upload_id, "chunk_index": str(index), "total_chunks": str(total_chunks),
+                    }, files={"file": ("blob", content[index * chunk_size:(index + 1) * chunk_size], "application/octet-stream")})
+                    if not _ok(response):
+                        ok = False
+                        break
+            if ok:
+                response = await client.post(f"/api/images/chunk/merge/{upload_id}", headers=user["headers"])
+                ok = _ok(response)
+                if ok:
+                    user["uploaded"].extend(image["id"] for image in response.json()["data"]["images"])
+        except httpx.HTTPError:
+            ok = False
+        self.recorder.record(name, time.perf_counter() - start, ok, len(content))
+
+    async def list_deep(self, client, user, rng):
+        """偏向后半部分的分页，OFFSET越大扫描越多"""
+        total_pages = max(1, (self.args.seed_images + len(user["uploaded"])) // PAGE_SIZE)
+        page = rng.randint(max(1, total_pages // 2), total_pages)
+        await self._timed("list_deep", client.get(
+            "/api/images", headers=user["headers"], params={"page": page, "page_size": PAGE_SIZE}
+        ))
+
+    async def search(self, client, user, rng):
+        await self._timed("search", client.get(
+            "/api/images", headers=user["headers"], params={"name_like": rng.choice(dataset.WORDS), "page_size": PAGE_SIZE}
+        ))
+
+    async def token_auth(self, client, user, rng):
+        """使用外部Token访问接口"""
+        tokens = [token for candidate in self.users for token in candidate["tokens"]]
+        if not tokens:
+            return
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        await self._timed("token_auth", client.get("/api/images", headers=headers, params={"page_size": 1}))
+
+    async def delete(self, client, user, rng):
+        """删除本次压测上传的图片，已上传的图片足够多时一半概率批量删除"""
+        uploaded = user["uploaded"]
+        if len(uploaded) >= 5 and rng.random() < 0.5:
+            image_ids = [uploaded.pop() for _ in range(5)]
+            await self._timed("batch_delete", client.post(
+                "/api/images/batch-delete", headers=user["headers"], json={"image_ids": image_ids}
+            ))
+        elif uploaded:
+            await self._timed("delete", client.delete(f"/api/images/{uploaded.pop()}", headers=user["headers"]))
+
+    # ---- 执行 ----
+
+    async def worker(self, client: httpx.AsyncClient, index: int, deadline: float) -> None:
+        rng = random.Random(self.args.seed + index)
+        user = self.users[index % len(self.users)]
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.perf_counter() < deadline:
+            scenario = SCENARIOS[rng.choices(names, weights)[0]]
+            await scenario(self, client, user, rng)
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.args.timeout, limits=limits) as client:
+            await self.setup(client)
+            sampler = RssSampler(self.server.pid)
+            sampler.start()
+            if self.args.warmup:
+                deadline = time.perf_counter() + self.args.warmup
+                await asyncio.gather(*(self.worker(client, i, deadline) for i in range(self.args.concurrency)))
+                self.recorder.reset()
+            deadline = time.perf_counter() + self.args.duration
+            await asyncio.gather(*(self.worker(client, i, deadline) for i in range(self.args.concurrency)))
+            result = self.recorder.summary()
+            result["peak_rss_bytes"] = sampler.stop()
+        result["gitee_uploads"] = self.gitee.uploads
+        return result
+
+
+SCENARIOS = {
+    "batch_upload": LoadTest.batch_upload,
+    "chunked_upload": LoadTest.chunked_upload,
+    "list_deep": LoadTest.list_deep,
+    "search": LoadTest.search,
+    "token_auth": LoadTest.token_auth,
+    "delete": LoadTest.delete,
+}
+
+
+def print_summary(result: dict) -> None:
+    print(f"\n版本 {result['version']}  耗时 {result['elapsed_seconds']}s  "
+          f"总吞吐 {result['throughput']} ops/s  失败 {result['total_errors']}  "
+          f"内存峰值 {result['peak_rss_bytes'] / 1024 / 1024:.1f}MB")
+    print(f"{'场景':<24}{'次数':>8}{'失败':>6}{'ops/s':>9}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}")
+    for name, stats in result["scenarios"].items():
+        print(f"{name:<24}{stats['count']:>8}{stats['errors']:>6}{stats['throughput']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="图床端到端压测")
+    parser.add_argument("--duration", type=float, default=60, help="压测时长（秒）")
+    parser.add_argument("--warmup", type=float, default=5, help="预热时长（秒），预热期间的结果不计入")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发虚拟用户数")
+    parser.add_argument("--workers", type=int, default=1, help="应用worker进程数")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"场景权重，默认 {DEFAULT_MIX}")
+    parser.add_argument("--users", type=int, default=4, help="注册的用户数")
+    parser.add_argument("--tokens", type=int, default=5, help="创建的外部Token总数")
+    parser.add_argument("--seed-images", type=int, default=20000, help="每个用户预置的图片记录数")
+    parser.add_argument("--batch-size", type=int, default=5, help="批量上传每次的文件数")
+    parser.add_argument("--chunked-sizes", type=lambda value: [int(v) for v in value.split(",") if v],
+                        default=[10, 100], help="切片上传的文件大小（MB，逗号分隔）")
+    parser.add_argument("--chunk-size", type=int, default=2 * 1024 * 1024, help="切片大小（字节）")
+    parser.add_argument("--gitee", action="store_true", help="上传后同步到模拟Gitee")
+    parser.add_argument("--gitee-latency-ms", type=float, default=100, help="模拟Gitee的响应延迟")
+    parser.add_argument("--database-url", help="使用本地MySQL容器等外部数据库，默认临时SQLite")
+    parser.add_argument("--timeout", type=float, default=300, help="单个请求超时（秒）")
+    parser.add_argument("--seed", type=int, default=dataset.SEED, help="随机种子")
+    parser.add_argument("--output", help="结果JSON文件路径")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留临时目录便于排查")
+    args = parser.parse_args()
+
+    test = LoadTest(args)
+    test.start_server()
+    try:
+        result = asyncio.run(test.run())
+    finally:
+        test.stop_server()
+
+    result = {
+        "version": _git_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "keep_workdir")},
+        **result,
+    }
+    if args.database_url:
+        # 不在结果中保存数据库密码
+        result["config"]["database_url"] = args.database_url.split("@")[-1]
+    print_summary(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""鉴权热点函数：verify_password，以及 TokenService.verify_token 随Token数量增长的耗时"""
+import pytest
+from fastapi import HTTPException
+from src.database import Base, engine, SessionLocal
+from src.models import User, Token
+from src.services.token import TokenService
+from src.utils.auth import verify_password, get_password_hash
+
+TOKEN_COUNTS = [1, 4, 16]
+
+
+def _token(index: int) -> str:
+    return f"bench-external-token-{index:04d}"
+
+
+@pytest.fixture(scope="module")
+def token_hashes():
+    """哈希开销大（bcrypt 12轮），整个模块只生成一次"""
+    return [get_password_hash(_token(i)) for i in range(max(TOKEN_COUNTS))]
+
+
+@pytest.fixture(scope="module")
+def db():
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    user = session.query(User).filter(User.username == "bench").first()
+    if user is None:
+        user = User(username="bench", password=get_password_hash("bench-password"))
+        session.add(user)
+        session.commit()
+    yield session
+    session.close()
+
+
+def _use_tokens(db, user_id: int, hashes: list) -> None:
+    db.query(Token).delete()
+    db.add_all(Token(user_id=user_id, name=f"token-{i}", token=hashed) for i, hashed in enumerate(hashes))
+    db.commit()
+
+
+@pytest.mark.benchmark(group="verify_password")
+@pytest.mark.parametrize("matches", [True, False], ids=["match", "mismatch"])
+def bench_verify_password(benchmark, token_hashes, matches):
+    plain = _token(0) if matches else "wrong-token"
+    assert benchmark.pedantic(verify_password, args=(plain, token_hashes[0]), rounds=10) is matches
+
+
+@pytest.mark.benchmark(group="verify_token")
+@pytest.mark.parametrize("count", TOKEN_COUNTS)
+def bench_verify_token_last(benchmark, db, token_hashes, count):
+    """命中最后一个Token（需要逐个比对全部Token）"""
+    user = db.query(User).filter(User.username == "bench").first()
+    _use_tokens(db, user.id, token_hashes[:count])
+    result = benchmark.pedantic(TokenService.verify_token, args=(db, _token(count - 1)), rounds=3)
+    assert result.id == user.id
+
+
+@pytest.mark.benchmark(group="verify_token")
+@pytest.mark.parametrize("count", TOKEN_COUNTS)
+def bench_verify_token_invalid(benchmark, db, token_hashes, count):
+    """无效Token（同样比对全部Token后返回401）"""
+    user = db.query(User).filter(User.username == "bench").first()
+    _use_tokens(db, user.id, token_hashes[:count])
+
+    def target():
+        with pytest.raises(HTTPException):
+            TokenService.verify_token(db, "wrong-token")
+
+    benchmark.pedantic(target, rounds=3)
@@ -0,0 +1,46 @@
+"""响应构造热点：generate_image_urls 和列表页的 ImageResponse.model_validate"""
+from datetime import datetime, timezone
+import pytest
+from src.models import Image
+from src.schemas.image import ImageResponse
+from src.utils.file import generate_image_urls
+from benchmarks import dataset
+
+CREATED_AT = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def rows():
+    rows = dataset.image_rows(1, "bench", 1000, "http://localhost:8000")
+    # 部分文件名带需要转义的字符
+    for i, row in enumerate(rows[::10]):
+        row["filename"] = f"<{row['filename']}> & \"{i}\".png"
+    return rows
+
+
+@pytest.mark.benchmark(group="generate_image_urls")
+def bench_generate_image_urls(benchmark, rows):
+    pairs = [(row["filename"], row["url"]) for row in rows]
+
+    def target():
+        for filename, url in pairs:
+            generate_image_urls(filename, url)
+
+    benchmark.extra_info["items"] = len(pairs)
+    benchmark(target)
+
+
+@pytest.mark.benchmark(group="image_response")
+@pytest.mark.parametrize("page_size", [20, 100])
+def bench_image_response_page(benchmark, rows, page_size):
+    """与列表接口相同：从ORM对象逐个构造响应模型（包括 srcset 等计算属性）"""
+    images = [
+        Image(id=i + 1, created_at=CREATED_AT, variants="200,800" if i % 2 else None, **row)
+        for i, row in enumerate(rows[:page_size])
+    ]
+
+    def target():
+        return [ImageResponse.model_validate(image) for image in images]
+
+    benchmark.extra_info["items"] = page_size
+    assert len(benchmark(target)) == page_size
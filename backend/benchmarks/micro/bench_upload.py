@@ -0,0 +1,84 @@
+"""上传热点函数：save_file、save_chunk、merge_chunks 在不同文件和切片大小下的耗时"""
+import io
+import os
+import shutil
+import uuid
+import pytest
+from starlette.datastructures import UploadFile
+from src.config import settings
+from src.utils.file import save_file, save_chunk, merge_chunks
+from benchmarks import dataset
+
+USERNAME = "bench"
+MB = 1024 * 1024
+
+
+def _content(size_mb: int) -> bytes:
+    """size_mb 为0时使用批量上传场景的小图，否则使用对应大小的噪点PNG"""
+    if size_mb == 0:
+        return dataset.small_images(1)[0][1]
+    with open(dataset.large_image(size_mb), "rb") as f:
+        return f.read()
+
+
+def _clear_uploads() -> None:
+    shutil.rmtree(os.path.join(settings.UPLOAD_FOLDER, USERNAME), ignore_errors=True)
+
+
+@pytest.mark.benchmark(group="save_file")
+@pytest.mark.parametrize("size_mb", [0, 1, 8, 32])
+def bench_save_file(benchmark, loop, size_mb):
+    content = _content(size_mb)
+
+    def setup():
+        _clear_uploads()
+        return (UploadFile(io.BytesIO(content), filename="bench.png"),), {}
+
+    def target(file):
+        loop.run_until_complete(save_file(file, USERNAME))
+
+    benchmark.extra_info["bytes"] = len(content)
+    benchmark.pedantic(target, setup=setup, rounds=10 if size_mb < 8 else 5, warmup_rounds=1)
+
+
+@pytest.mark.benchmark(group="save_chunk")
+@pytest.mark.parametrize("chunk_kb", [256, 1024, 5120])
+def bench_save_chunk(benchmark, loop, chunk_kb):
+    # 取噪点图的开头作为第一个切片，同时覆盖文件头校验
+    content = _content(8)[:chunk_kb * 1024]
+    upload_id = str(uuid.uuid4())
+    os.makedirs(os.path.join(settings.TEMP_UPLOAD_FOLDER, upload_id))
+
+    def setup():
+        return (UploadFile(io.BytesIO(content), filename="blob"),), {}
+
+    def target(file):
+        loop.run_until_complete(save_chunk(upload_id, 0, file, "png"))
+
+    benchmark.extra_info["bytes"] = len(content)
+    benchmark.pedantic(target, setup=setup, rounds=20)
+
+
+@pytest.mark.benchmark(group="merge_chunks")
+@pytest.mark.parametrize("size_mb,chunk_mb", [(8, 1), (8, 5), (32, 1), (32, 5)])
+def bench_merge_chunks(benchmark, loop, size_mb, chunk_mb):
+    content = _content(size_mb)
+    upload_id = str(uuid.uuid4())
+    temp_dir = os.path.join(settings.TEMP_UPLOAD_FOLDER, upload_id)
+    os.makedirs(temp_dir)
+    total_chunks = 0
+    for offset in range(0, len(content), chunk_mb * MB):
+        with open(os.path.join(temp_dir, f"chunk_{total_chunks}"), "wb") as f:
+            f.write(content[offset:offset + chunk_mb * MB])
+        total_chunks += 1
+
+    def setup():
+        _clear_uploads()
+
+    def target():
+        loop.run_until_complete(merge_chunks(upload_id, USERNAME, "bench.png", total_chunks))
+
+    benchmark.extra_info["bytes"] = len(content)
+    benchmark.extra_info["chunks"] = total_chunks
+    benchmark.pedantic(target, setup=setup, rounds=5)
+    shutil.rmtree(temp_dir)
@@ -0,0 +1,50 @@
+"""微基准测试的公共配置
+
+在 backend 目录下运行：
+
+    python -m pytest benchmarks/micro                                   # 运行全部微基准
+    python -m pytest benchmarks/micro --benchmark-compare=0001 \
+        --benchmark-compare-fail=median:15%                             # 与已提交的基线对比，回退超过15%时失败
+    python -m pytest benchmarks/micro --benchmark-save=baseline          # 优化合入后更新基线
+
+配置必须在导入 src 之前写入环境变量：上传目录和临时切片目录位于每次运行的临时目录中，数据库使用SQLite。
+"""
+import os
+import sys
+import shutil
+import asyncio
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+WORKDIR = tempfile.mkdtemp(prefix="imagebed-micro-")
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'micro.db')}",
+    REDIS_URL="",
+    STORAGE_BACKEND="local",
+    STORAGE_LAYOUT="sharded",
+    UPLOAD_FOLDER=os.path.join(WORKDIR, "static"),
+    TEMP_UPLOAD_FOLDER=os.path.join(WORKDIR, "temp"),
+    MAX_FILE_SIZE=str(128 * 1024 * 1024),
+    BASE_URL="http://localhost:8000",
+)
+sys.path.insert(0, BACKEND_DIR)
+
+import pytest
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def loop():
+    """被测函数大多是协程，在同一个事件循环中同步执行以便计时"""
+    event_loop = asyncio.new_event_loop()
+    yield event_loop
+    event_loop.close()
+
+
+@pytest.fixture(scope="session")
+def workdir():
+    return WORKDIR
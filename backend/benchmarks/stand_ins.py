@@ -0,0 +1,52 @@
+"""压测使用的本地替身服务"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGitee:
+    """模拟Gitee内容API：接受 PUT /repos/{owner}/{repo}/contents/{path}，返回下载地址
+
+    latency 模拟外网往返耗时，用于观察同步上传Gitee对事件循环的影响。
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.uploads = 0
+        self.bytes = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if fake.latency:
+                    time.sleep(fake.latency)
+                fake.uploads += 1
+                fake.bytes += len(body)
+                path = self.path.split("/contents/", 1)[-1]
+                payload = json.dumps({"content": {"download_url": f"http://gitee.invalid/raw/{path}"}}).encode()
+                self.send_response(201)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-gitee", daemon=True)
+
+    @property
+    def api_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/api/v5"
+
+    def start(self) -> "FakeGitee":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,21 @@
+"""gunicorn配置：Prometheus多进程指标目录的维护
+
+各worker把指标写入 PROMETHEUS_MULTIPROC_DIR 下的文件，/metrics 抓取时汇总。
+"""
+import os
+import shutil
+
+
+def on_starting(server):
+    """主进程启动时清空上次运行留下的指标文件"""
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """worker退出时移除其存活状态的Gauge（livesum等模式），避免重启后重复计数"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -10,6 +10,9 @@ CREATE TABLE IF NOT EXISTS users (
     username VARCHAR(50) UNIQUE NOT NULL,
     password VARCHAR(255) NOT NULL,
     email VARCHAR(100),
+    storage_used BIGINT NOT NULL DEFAULT 0,
+    storage_reserved BIGINT NOT NULL DEFAULT 0,
+    storage_quota BIGINT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -35,6 +38,19 @@ CREATE TABLE IF NOT EXISTS images (
     markdown VARCHAR(500) NOT NULL,
     html VARCHAR(500) NOT NULL,
     gitee_url VARCHAR(255),
+    format VARCHAR(10),
+    width INT,
+    height INT,
+    file_size BIGINT,
+    placeholder TEXT,
+    variants VARCHAR(100),
+    animation_formats VARCHAR(50),
+    processing_pending VARCHAR(50),
+    processing_attempts INT NOT NULL DEFAULT 0,
+    bytes_saved INT NOT NULL DEFAULT 0,
+    access_count BIGINT NOT NULL DEFAULT 0,
+    last_accessed_at DATETIME,
+    storage_tier VARCHAR(10) NOT NULL DEFAULT 'hot',
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
@@ -55,14 +71,61 @@ CREATE TABLE IF NOT EXISTS chunk_uploads (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- 图片访问统计表（按小时和按天汇总，由内存计数批量写入）
+CREATE TABLE IF NOT EXISTS image_stats (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    image_id INT NOT NULL,
+    user_id INT NOT NULL,
+    period VARCHAR(10) NOT NULL,
+    bucket DATETIME NOT NULL,
+    hits BIGINT NOT NULL DEFAULT 0,
+    bytes BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_image_stats_bucket (image_id, period, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 外部Token调用统计表
+CREATE TABLE IF NOT EXISTS token_stats (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    token_id INT NOT NULL,
+    user_id INT NOT NULL,
+    period VARCHAR(10) NOT NULL,
+    bucket DATETIME NOT NULL,
+    hits BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_token_stats_bucket (token_id, period, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 归档导入任务表
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    filename VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    entries INT NOT NULL DEFAULT 0,
+    imported INT NOT NULL DEFAULT 0,
+    skipped INT NOT NULL DEFAULT 0,
+    failed INT NOT NULL DEFAULT 0,
+    bytes_read BIGINT NOT NULL DEFAULT 0,
+    error VARCHAR(500),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    finished_at DATETIME,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- 创建索引
 CREATE INDEX idx_users_username ON users(username);
 CREATE INDEX idx_tokens_user_id ON tokens(user_id);
 CREATE INDEX idx_images_user_id ON images(user_id);
 CREATE INDEX idx_images_nicname ON images(nicname);
 CREATE INDEX idx_images_created_at ON images(created_at);
+CREATE INDEX idx_images_url ON images(url);
+CREATE INDEX idx_images_tier_accessed ON images(storage_tier, last_accessed_at);
+CREATE INDEX idx_images_processing_pending ON images(processing_pending);
+CREATE INDEX idx_image_stats_user_bucket ON image_stats(user_id, period, bucket);
+CREATE INDEX idx_token_stats_user_bucket ON token_stats(user_id, period, bucket);
 CREATE INDEX idx_chunk_uploads_user_id ON chunk_uploads(user_id);
 CREATE INDEX idx_chunk_uploads_upload_id ON chunk_uploads(upload_id);
+CREATE INDEX idx_import_jobs_user_id ON import_jobs(user_id);
 
 -- 创建管理员用户（账户：admin，密码：admin）
 INSERT INTO users (username, password, email) 
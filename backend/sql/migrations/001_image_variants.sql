@@ -0,0 +1,4 @@
+-- 图片表新增响应式缩略图记录字段
+USE imagebed;
+
+ALTER TABLE images ADD COLUMN variants VARCHAR(100) NULL AFTER gitee_url;
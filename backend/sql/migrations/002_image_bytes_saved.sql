@@ -0,0 +1,4 @@
+-- 图片表新增原图无损优化节省字节数字段
+USE imagebed;
+
+ALTER TABLE images ADD COLUMN bytes_saved INT NOT NULL DEFAULT 0 AFTER variants;
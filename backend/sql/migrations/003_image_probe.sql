@@ -0,0 +1,8 @@
+-- 图片表新增文件头探测结果和低清占位图字段
+USE imagebed;
+
+ALTER TABLE images
+    ADD COLUMN format VARCHAR(10) NULL AFTER gitee_url,
+    ADD COLUMN width INT NULL AFTER format,
+    ADD COLUMN height INT NULL AFTER width,
+    ADD COLUMN placeholder TEXT NULL AFTER height;
@@ -0,0 +1,4 @@
+-- 图片表新增GIF动图转换结果字段
+USE imagebed;
+
+ALTER TABLE images ADD COLUMN animation_formats VARCHAR(50) NULL AFTER variants;
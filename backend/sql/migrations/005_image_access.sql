@@ -0,0 +1,11 @@
+-- 图片表新增访问统计和存储层级字段
+USE imagebed;
+
+ALTER TABLE images
+    ADD COLUMN access_count BIGINT NOT NULL DEFAULT 0 AFTER bytes_saved,
+    ADD COLUMN last_accessed_at DATETIME NULL AFTER access_count,
+    ADD COLUMN storage_tier VARCHAR(10) NOT NULL DEFAULT 'hot' AFTER last_accessed_at;
+
+-- 访问计数按URL前缀批量更新；分层任务按访问时间查找冷图片
+CREATE INDEX idx_images_url ON images(url);
+CREATE INDEX idx_images_tier_accessed ON images(storage_tier, last_accessed_at);
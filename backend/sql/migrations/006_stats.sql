@@ -0,0 +1,28 @@
+-- 新增访问统计表（按小时和按天汇总）
+USE imagebed;
+
+-- 图片访问统计表（按小时和按天汇总，由内存计数批量写入）
+CREATE TABLE IF NOT EXISTS image_stats (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    image_id INT NOT NULL,
+    user_id INT NOT NULL,
+    period VARCHAR(10) NOT NULL,
+    bucket DATETIME NOT NULL,
+    hits BIGINT NOT NULL DEFAULT 0,
+    bytes BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_image_stats_bucket (image_id, period, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 外部Token调用统计表
+CREATE TABLE IF NOT EXISTS token_stats (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    token_id INT NOT NULL,
+    user_id INT NOT NULL,
+    period VARCHAR(10) NOT NULL,
+    bucket DATETIME NOT NULL,
+    hits BIGINT NOT NULL DEFAULT 0,
+    UNIQUE KEY uq_token_stats_bucket (token_id, period, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE INDEX idx_image_stats_user_bucket ON image_stats(user_id, period, bucket);
+CREATE INDEX idx_token_stats_user_bucket ON token_stats(user_id, period, bucket);
@@ -0,0 +1,10 @@
+-- 新增用户存储配额：图片记录原图大小，用户记录已用空间、预留空间和配额
+-- 执行后运行 python -m src.scripts.recount_storage 回填已有图片的大小和用户已用空间
+USE imagebed;
+
+ALTER TABLE users
+    ADD COLUMN storage_used BIGINT NOT NULL DEFAULT 0 AFTER email,
+    ADD COLUMN storage_reserved BIGINT NOT NULL DEFAULT 0 AFTER storage_used,
+    ADD COLUMN storage_quota BIGINT AFTER storage_reserved;
+
+ALTER TABLE images ADD COLUMN file_size BIGINT AFTER height;
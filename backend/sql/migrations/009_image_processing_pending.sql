@@ -0,0 +1,8 @@
+-- 图片表新增待重新提交的后台处理任务字段
+USE imagebed;
+
+ALTER TABLE images
+    ADD COLUMN processing_pending VARCHAR(50) NULL AFTER animation_formats;
+
+-- 定时任务按该字段查找需要重新处理的图片
+CREATE INDEX idx_images_processing_pending ON images(processing_pending);
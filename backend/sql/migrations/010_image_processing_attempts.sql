@@ -0,0 +1,5 @@
+-- 图片表新增后台任务重新提交次数字段，超过 PROCESS_RETRY_MAX_ATTEMPTS 后不再重试
+USE imagebed;
+
+ALTER TABLE images
+    ADD COLUMN processing_attempts INT NOT NULL DEFAULT 0 AFTER processing_pending;
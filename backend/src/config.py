@@ -11,28 +11,134 @@ class Settings(BaseSettings):
     # JWT配置
     JWT_SECRET_KEY: str = "your-strong-secret-key"
     JWT_ACCESS_TOKEN_EXPIRE_DAYS: int = 7
+    ADMIN_USERNAMES: str = ""  # 管理员用户名（逗号分隔），可使用性能分析等管理接口
     
     # Gitee配置（可选）
     GITEE_ACCESS_TOKEN: Optional[str] = None
     GITEE_REPO_OWNER: Optional[str] = None
     GITEE_REPO_NAME: Optional[str] = None
     GITEE_REPO_BRANCH: str = "main"
+    GITEE_API_URL: str = "https://gitee.com/api/v5"  # Gitee API地址（压测时指向本地的模拟服务）
     
     # 项目配置
     BASE_URL: str = "http://localhost:8000"
     UPLOAD_FOLDER: str = "static"
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
     ALLOWED_FILE_TYPES: str = "jpg,jpeg,png,gif,webp"
+    STORAGE_LAYOUT: str = "sharded"  # 存储布局：sharded（两级哈希分片目录）或 flat（用户图片目录平铺）
+    
+    # 存储后端配置
+    STORAGE_BACKEND: str = "local"  # local（本机文件系统）、s3（S3兼容对象存储，需要安装boto3）或 packed（小图打包存储）
+    S3_ENDPOINT_URL: Optional[str] = None  # MinIO等S3兼容服务的地址，使用AWS S3时留空
+    S3_BUCKET: str = "imagebed"
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_KEY_PREFIX: str = ""  # 对象key前缀
+    S3_PART_SIZE: int = 8 * 1024 * 1024  # 分片上传的分片大小（最小5MB）
+    S3_MAX_POOL_CONNECTIONS: int = 20  # S3客户端连接池大小
+    PACKED_FOLDER: str = "packed"  # 打包存储的段文件和索引目录（不能位于UPLOAD_FOLDER下，否则会被静态文件挂载直接暴露）
+    PACKED_MAX_BLOB_SIZE: int = 256 * 1024  # 不超过该大小的图片写入段文件，更大的仍存为独立文件
+    PACKED_SEGMENT_SIZE: int = 256 * 1024 * 1024  # 单个段文件的大小上限
+    PACKED_COMPACT_INTERVAL: int = 3600  # 后台压缩段文件的间隔（秒）
+    PACKED_COMPACT_GARBAGE_RATIO: float = 0.3  # 段中已删除数据超过该比例时压缩
     
     @property
     def allowed_file_types_list(self) -> list[str]:
         return [ft.strip() for ft in self.ALLOWED_FILE_TYPES.split(",")]
     
+    @property
+    def admin_usernames_list(self) -> list[str]:
+        return [u.strip() for u in self.ADMIN_USERNAMES.split(",") if u.strip()]
+    
     # 切片上传配置
     CHUNK_SIZE: int = 2 * 1024 * 1024  # 2MB per chunk
     TEMP_UPLOAD_FOLDER: str = "temp"
     CHUNK_EXPIRE_TIME: int = 24 * 3600  # 24 hours in seconds
     
+    # 上传准入控制配置（每个worker进程独立计算）
+    UPLOAD_MAX_CONCURRENT: int = 16  # 同时处理的上传请求数（直传、切片上传和合并）
+    UPLOAD_MAX_INFLIGHT_BYTES: int = 256 * 1024 * 1024  # 正在处理的上传请求体总字节数
+    UPLOAD_QUEUE_TIMEOUT: float = 5.0  # 超出上限时最长排队等待时间（秒），超时返回503
+    UPLOAD_MAX_QUEUE: int = 64  # 排队上限，队列已满时直接返回503
+    IMPORT_BATCH_SIZE: int = 100  # 归档导入每批插入的图片记录数（同时更新一次任务进度）
+    STORAGE_QUOTA_BYTES: int = 0  # 每个用户默认的存储配额（原图字节数），0表示不限制，可在 users.storage_quota 单独设置
+    DISK_WRITE_CONCURRENCY: int = 4  # 同时写盘（保存、切片、合并）的上传数，超出时按用户公平轮询排队
+    
+    # 后台图片处理配置
+    VARIANT_WIDTHS: str = "200,800,1600"  # 上传后预生成的响应式宽度，留空则不生成
+    PROCESS_POOL_WORKERS: int = 2  # 图片处理进程池大小
+    PROCESS_QUEUE_SIZE: int = 64  # 进程池排队上限，超过后丢弃新任务（背压）
+    PROCESS_RETRY_INTERVAL: int = 600  # 重新提交被丢弃（队列已满、进程池损坏）的后台任务的间隔（秒）
+    PROCESS_RETRY_BATCH_SIZE: int = 32  # 每次重新提交的图片数
+    PROCESS_RETRY_MAX_ATTEMPTS: int = 5  # 每张图片最多重新提交的次数，超过后不再重试
+    
+    OPTIMIZE_ORIGINALS: bool = False  # 上传后是否在后台无损优化原图（去除元数据、校正方向、无损重压缩）
+    OPTIMIZE_POOL_WORKERS: int = 1  # 原图优化进程池大小
+    OPTIMIZE_QUEUE_SIZE: int = 256  # 原图优化排队上限
+    OPTIMIZE_NICE: int = 10  # 原图优化进程的nice值（越大优先级越低）
+    TRANSCODE_FORMATS: str = "avif,webp"  # 按Accept协商的转码格式（按优先级），留空则关闭
+    
+    ANIMATION_VIDEO_FORMATS: str = "mp4"  # GIF动图转换的视频格式（mp4/webm，需要本机安装ffmpeg），留空则只生成动态WebP
+    ANIMATION_MAX_PIXELS: int = 500_000_000  # GIF转换的帧数×宽×高上限，超过时不转换
+    
+    @property
+    def animation_video_formats_list(self) -> list[str]:
+        return [f.strip().lower() for f in self.ANIMATION_VIDEO_FORMATS.split(",") if f.strip()]
+    
+    @property
+    def transcode_formats_list(self) -> list[str]:
+        return [f.strip().lower() for f in self.TRANSCODE_FORMATS.split(",") if f.strip()]
+    
+    @property
+    def variant_widths_list(self) -> list[int]:
+        return sorted(int(w.strip()) for w in self.VARIANT_WIDTHS.split(",") if w.strip())
+    
+    # 访问统计与冷热分层配置
+    STATS_FLUSH_INTERVAL: int = 60  # 内存中的访问统计写入数据库的间隔（秒）
+    STATS_HOURLY_RETENTION_DAYS: int = 7  # 按小时统计的保留天数，按天统计永久保留
+    COLD_STORAGE_FOLDER: Optional[str] = None  # 冷存储目录（可挂载到更便宜的磁盘），留空则不分层（仅本地存储后端）
+    COLD_AFTER_DAYS: int = 30  # 超过该天数未被访问的原图移到冷存储
+    TIERING_INTERVAL: int = 3600  # 冷热分层任务的运行间隔（秒）
+    TIERING_BATCH_SIZE: int = 200  # 每次最多移到冷存储的图片数
+    
+    # 限流配置（按用户和Token分别计算，配置了REDIS_URL时所有worker共享额度，否则每个worker单独计算）
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_REQUESTS_PER_MINUTE: int = 600  # 每分钟请求次数，0表示不限制
+    RATE_LIMIT_UPLOAD_MB_PER_MINUTE: int = 1024  # 每分钟上传字节数（MB），0表示不限制
+    RATE_LIMIT_AUTH_FAILURES_PER_MINUTE: int = 10  # 每分钟外部Token鉴权失败次数（按Token和客户端地址分别计算），超过后直接拒绝而不再校验
+    RATE_LIMIT_AUTH_FAILURES_GLOBAL_PER_MINUTE: int = 300  # 所有客户端合计的每分钟外部Token鉴权失败次数，随机Token也无法绕过
+    TRUSTED_PROXY_HEADER: Optional[str] = None  # 反向代理写入客户端地址的请求头（X-Forwarded-For 或 X-Real-IP），留空则使用连接的对端地址
+    
+    # 请求耗时分解配置
+    SERVER_TIMING_ENABLED: bool = True  # 响应中返回 Server-Timing 头（鉴权、表单解析、写入、数据库提交等阶段耗时）
+    TIMING_LOG_SAMPLE_RATE: float = 0.01  # 输出请求耗时分解日志的采样率，0表示只记录慢请求
+    TIMING_LOG_SLOW_MS: int = 1000  # 超过该耗时（毫秒）的请求总是输出耗时分解日志
+    OTEL_EXPORTER_OTLP_ENDPOINT: Optional[str] = None  # OpenTelemetry OTLP/HTTP 链路接收地址，留空则不导出
+    OTEL_SERVICE_NAME: str = "imagebed-backend"
+    
+    # SQL语句统计配置
+    DB_DEBUG_HEADERS: bool = False  # 响应头返回本次请求执行的SQL语句数和耗时（X-DB-Queries、X-DB-Time）
+    DB_REPEATED_QUERY_THRESHOLD: int = 10  # 同一请求中同一SQL重复执行超过该次数时记录日志（疑似N+1查询）
+    
+    # 事件循环阻塞监控配置
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_LAG_INTERVAL: float = 0.1  # 测量事件循环调度延迟的间隔（秒）
+    LOOP_BLOCK_THRESHOLD_MS: int = 200  # 事件循环阻塞超过该时长时记录阻塞位置的调用栈和路由
+    LOOP_BLOCK_FAIL_MS: int = 0  # 测试模式：请求阻塞事件循环超过该时长时抛出异常，0表示关闭
+    
+    # 线上性能分析配置（仅管理员，关闭时不注册中间件、没有任何开销）
+    PROFILING_ENABLED: bool = False
+    PROFILING_FOLDER: str = "profiles"  # CPU分析结果目录，多worker共用
+    PROFILING_SAMPLE_INTERVAL: float = 0.005  # CPU采样间隔（秒）
+    PROFILING_MAX_DURATION: int = 300  # 单次CPU分析的最长时间（秒）
+    PROFILING_TOKEN_EXPIRE: int = 600  # 单个请求分析令牌的有效期（秒）
+    
+    # 热点图片内存缓存配置（每个worker进程独立）
+    HOT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 缓存总字节预算，0表示关闭
+    HOT_CACHE_MAX_OBJECT_SIZE: int = 256 * 1024  # 单个文件超过该大小不缓存
+    HOT_CACHE_TTL: int = 60  # 缓存条目有效期（秒），限制其他worker删除图片后的陈旧时间
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
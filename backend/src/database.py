@@ -1,11 +1,28 @@
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .utils.metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_IN_USE, DB_POOL_OVERFLOW
+from .utils.query_stats import record_query
+
+
+class InstrumentedQueuePool(QueuePool):
+    """记录从连接池获取连接的等待时间（连接池耗尽时请求会在这里排队）"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
 
 # 创建数据库引擎，优化连接池配置
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
     pool_size=5,           # 连接池大小，默认5
     max_overflow=10,       # 连接池溢出最大连接数
     pool_pre_ping=True,     # 连接池预检查
@@ -13,6 +30,33 @@ engine = create_engine(
     echo_pool=True          # 连接池日志
 )
 
+# 连接池使用情况指标
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_IN_USE.inc()
+    DB_POOL_OVERFLOW.set(max(engine.pool.overflow(), 0))
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_IN_USE.dec()
+    DB_POOL_OVERFLOW.set(max(engine.pool.overflow(), 0))
+
+# SQL语句计数和耗时（按请求统计，用于调试响应头、指标和测试中的查询预算）
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    record_query(statement, time.perf_counter() - conn.info["query_start"].pop())
+
+@event.listens_for(engine, "handle_error")
+def _on_error(exception_context):
+    # 执行失败时不会触发 after_cursor_execute
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
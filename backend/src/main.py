@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response
 import os
 import asyncio
 
@@ -9,10 +10,24 @@ from src.config import settings
 from src.database import engine, Base
 
 # 导入路由
-from src.routers import auth_router, token_router, image_router
+from src.routers import auth_router, token_router, image_router, static_router, stats_router, profiling_router
 
 # 导入工具函数
-from src.utils.file import cleanup_expired_chunks
+from src.utils.file import cleanup_expired_chunks, count_chunk_sessions
+from src.utils.metrics import render_metrics, CHUNK_SESSIONS, CONTENT_TYPE_LATEST
+from src.middlewares import (
+    MetricsMiddleware, TimingMiddleware, ProfilingMiddleware, LoopBlockMiddleware, QueryCountMiddleware,
+    AdmissionMiddleware
+)
+from src.utils.loop_monitor import loop_monitor
+from src.utils.tracing import setup_tracing, shutdown_tracing
+from src.utils.worker import shutdown_executor
+from src.utils.cache import hot_cache
+from src.storage import get_storage, PackedStorage
+from src.services.tiering import TieringService
+from src.services.stats import StatsService
+from src.services.quota import QuotaService
+from src.services.processing import ProcessingService
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
@@ -35,6 +50,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求阶段耗时分解（Server-Timing 响应头、采样日志、OpenTelemetry导出）
+app.add_middleware(TimingMiddleware)
+
+# 每个请求的SQL语句数和耗时
+app.add_middleware(QueryCountMiddleware)
+
+# 测试模式：请求阻塞事件循环过久时抛出异常
+if settings.LOOP_BLOCK_FAIL_MS > 0:
+    app.add_middleware(LoopBlockMiddleware)
+
+# 携带分析令牌的请求做CPU采样（关闭时不注册，没有任何开销）
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# 上传准入控制：超出并发数和在途字节数时排队，排队过久返回503（位于耗时统计之内，被拒绝的请求也计入指标）
+app.add_middleware(AdmissionMiddleware)
+
+# 请求耗时指标（最后添加，位于中间件最外层，包含其他中间件的耗时）
+app.add_middleware(MetricsMiddleware)
+
+# 图片原图访问路由需在静态文件挂载之前注册，以便按Accept协商返回转码格式
+app.include_router(static_router)
+
 # 挂载静态文件
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -44,22 +82,96 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 app.include_router(auth_router)
 app.include_router(token_router)
 app.include_router(image_router)
+app.include_router(stats_router)
+app.include_router(profiling_router)
 
 # 健康检查
 @app.get("/health")
 def health_check():
     return {"status": "ok", "version": "1.0.0"}
 
+# 热点图片内存缓存统计（当前worker进程）
+@app.get("/health/cache")
+def cache_stats():
+    return hot_cache.stats()
+
+# Prometheus指标（多worker部署时汇总所有worker进程）
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    CHUNK_SESSIONS.set(count_chunk_sessions())
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+# 小图打包存储的段文件统计（仅packed存储后端）
+@app.get("/health/storage")
+def storage_stats():
+    storage = get_storage()
+    if isinstance(storage, PackedStorage):
+        return storage.stats()
+    return {"backend": settings.STORAGE_BACKEND}
+
 
 # 定时清理过期临时文件的后台任务
 async def periodic_cleanup():
     """定期清理过期的临时分片文件"""
     while True:
+        try:
+            expired = await asyncio.to_thread(QuotaService.expire_chunk_uploads)
+            if expired:
+                print(f"释放 {expired} 个过期切片上传会话预留的空间")
+        except Exception as e:
+            print(f"释放过期切片上传会话失败: {str(e)}")
         await cleanup_expired_chunks()
         # 每隔1小时运行一次清理任务
         await asyncio.sleep(10800)
 
 
+# 定时压缩打包存储段文件的后台任务
+async def periodic_compaction(storage: PackedStorage):
+    """定期回收段文件中已删除图片占用的空间"""
+    while True:
+        await asyncio.sleep(settings.PACKED_COMPACT_INTERVAL)
+        try:
+            reclaimed = await asyncio.to_thread(storage.compact, settings.PACKED_COMPACT_GARBAGE_RATIO)
+            if reclaimed:
+                print(f"段文件压缩完成，回收 {reclaimed} 字节")
+        except Exception as e:
+            print(f"段文件压缩失败: {str(e)}")
+
+
+# 定时写入访问统计的后台任务
+async def periodic_stats_flush():
+    """定期把内存中的图片访问和Token调用统计批量写入数据库"""
+    while True:
+        await asyncio.sleep(settings.STATS_FLUSH_INTERVAL)
+        await asyncio.to_thread(StatsService.flush)
+
+
+# 定时冷热分层的后台任务
+async def periodic_tiering():
+    """定期把长时间未访问的原图移到冷存储"""
+    while True:
+        await asyncio.sleep(settings.TIERING_INTERVAL)
+        try:
+            demoted = await asyncio.to_thread(TieringService.demote_cold_images, settings.TIERING_BATCH_SIZE)
+            if demoted:
+                print(f"已将 {demoted} 张图片移到冷存储")
+        except Exception as e:
+            print(f"冷热分层任务失败: {str(e)}")
+
+
+# 定时重新提交后台处理任务
+async def periodic_reprocess():
+    """定期重新提交因队列已满、进程池损坏等原因被丢弃的缩略图、GIF转换和原图优化任务"""
+    while True:
+        await asyncio.sleep(settings.PROCESS_RETRY_INTERVAL)
+        try:
+            resubmitted = await ProcessingService.reschedule_pending(settings.PROCESS_RETRY_BATCH_SIZE)
+            if resubmitted:
+                print(f"重新提交 {resubmitted} 张图片的后台处理任务")
+        except Exception as e:
+            print(f"重新提交后台处理任务失败: {str(e)}")
+
+
 # 启动事件，在应用启动时创建后台任务
 async def startup_event():
     """应用启动时执行的事件"""
@@ -67,8 +179,33 @@ async def startup_event():
     asyncio.create_task(periodic_cleanup())
     print("后台清理任务已启动，每隔3小时清理一次过期临时文件")
 
+    storage = get_storage()
+    if isinstance(storage, PackedStorage):
+        asyncio.create_task(periodic_compaction(storage))
+
+    asyncio.create_task(periodic_stats_flush())
+    if settings.LOOP_MONITOR_ENABLED or settings.LOOP_BLOCK_FAIL_MS > 0:
+        loop_monitor.start()
+    if setup_tracing():
+        print(f"请求链路导出到 {settings.OTEL_EXPORTER_OTLP_ENDPOINT}")
+    if TieringService.enabled():
+        asyncio.create_task(periodic_tiering())
+    # 后台处理只适用于本地存储后端
+    if storage.is_local:
+        asyncio.create_task(periodic_reprocess())
+
+# 关闭事件，释放图片处理进程池
+async def shutdown_event():
+    """应用关闭时执行的事件"""
+    shutdown_executor()
+    loop_monitor.stop()
+    # 写入尚未落库的访问统计
+    StatsService.flush()
+    shutdown_tracing()
+
 # 使用新的方式注册事件处理器
 app.add_event_handler("startup", startup_event)
+app.add_event_handler("shutdown", shutdown_event)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,11 @@
+from .metrics import MetricsMiddleware
+from .timing import TimingMiddleware, TimedRoute
+from .profiling import ProfilingMiddleware
+from .loop_block import LoopBlockMiddleware
+from .queries import QueryCountMiddleware
+from .admission import AdmissionMiddleware
+
+__all__ = [
+    "MetricsMiddleware", "TimingMiddleware", "TimedRoute", "ProfilingMiddleware", "LoopBlockMiddleware",
+    "QueryCountMiddleware", "AdmissionMiddleware"
+]
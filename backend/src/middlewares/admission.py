@@ -0,0 +1,69 @@
+import re
+import time
+from starlette.responses import JSONResponse
+from src.utils.admission import upload_admission, UploadRejected
+from src.utils.file import get_chunk_upload_size
+
+# 受准入控制的上传接口：直传、切片上传、切片合并（POST），归档导入（PUT）
+UPLOAD_PATH = re.compile(
+    r"^/api/images(?:/chunk/upload|/chunk/merge/(?P<upload_id>[^/]+)|/import/(?P<job_id>[^/]+))?$"
+)
+
+
+def _match_upload(scope):
+    """请求是否为受准入控制的上传，返回路径匹配结果"""
+    if scope["type"] != "http":
+        return None
+    match = UPLOAD_PATH.match(scope["path"])
+    if match is None or scope["method"] != ("PUT" if match.group("job_id") else "POST"):
+        return None
+    return match
+
+
+def _upload_cost(scope, match) -> int:
+    """上传占用的字节数：合并按已上传切片的总大小（合并和推送Gitee要读取整个文件），其他按请求体大小"""
+    upload_id = match.group("upload_id")
+    if upload_id:
+        return get_chunk_upload_size(upload_id)
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                break
+    return 0
+
+
+class AdmissionMiddleware:
+    """上传准入控制（纯ASGI中间件）
+
+    在读取请求体之前申请配额，超出并发数或在途字节数时排队，排队超时或队列已满时
+    直接返回503和Retry-After，客户端无需把整个文件传完才被拒绝；请求处理完成（包括推送Gitee）后归还配额。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        match = _match_upload(scope)
+        if match is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            cost = await upload_admission.acquire(_upload_cost(scope, match))
+        except UploadRejected as e:
+            # 与接口统一的响应格式，前端按 code/message 处理
+            response = JSONResponse(
+                {"code": 503, "message": "服务器繁忙，请稍后重试", "data": None},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            upload_admission.release(cost, time.perf_counter() - start)
@@ -0,0 +1,20 @@
+from src.utils.loop_monitor import loop_monitor
+
+
+class LoopBlockMiddleware:
+    """测试模式：请求阻塞事件循环超过 LOOP_BLOCK_FAIL_MS 时在请求结束后抛出 LoopBlockedError
+
+    仅在 LOOP_BLOCK_FAIL_MS 大于0时添加到应用，TestClient 会把异常抛给测试用例。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            loop_monitor.check_request(scope)
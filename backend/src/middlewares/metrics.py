@@ -0,0 +1,31 @@
+import time
+from src.utils.metrics import REQUEST_LATENCY, route_label
+
+
+class MetricsMiddleware:
+    """记录每个请求的耗时（纯ASGI中间件，不缓冲响应体）
+
+    路由标签使用匹配到的路由模板（如 /api/images/{image_id}），避免路径参数导致标签数量无限增长。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_LATENCY.labels(scope["method"], route_label(scope), str(status_code)).observe(time.perf_counter() - start)
@@ -0,0 +1,37 @@
+import asyncio
+from starlette.datastructures import MutableHeaders
+from src.services.profiling import ProfilingService, PROFILE_HEADER
+
+_HEADER_KEY = PROFILE_HEADER.lower().encode("latin-1")
+
+
+class ProfilingMiddleware:
+    """对携带 X-Profile 令牌的请求做CPU采样（仅在 PROFILING_ENABLED 时添加到应用）
+
+    令牌由管理员接口签发；响应头 X-Profile-Id 返回分析结果ID，请求结束后结果写入 PROFILING_FOLDER。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = next((value.decode("latin-1") for key, value in scope["headers"] if key == _HEADER_KEY), None)
+        profiler = ProfilingService.start_request_profile(token) if token else None
+        if profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Profile-Id", profiler.name)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # 停止采样会等待结果写入文件，放到线程中执行
+            await asyncio.to_thread(profiler.stop)
@@ -0,0 +1,41 @@
+from starlette.datastructures import MutableHeaders
+from src.utils.query_stats import start_request, end_request
+from src.utils.metrics import DB_QUERIES_PER_REQUEST, DB_REPEATED_QUERIES, route_label
+from src.config import settings
+
+
+class QueryCountMiddleware:
+    """统计每个请求执行的SQL语句数和耗时（纯ASGI中间件）
+
+    语句由数据库引擎的事件记录到当前请求的统计对象；同一语句重复执行超过
+    DB_REPEATED_QUERY_THRESHOLD 次时记录日志，便于发现逐条查询（N+1）的代码路径。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and settings.DB_DEBUG_HEADERS:
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Queries", str(stats.count))
+                headers.append("X-DB-Time", f"{stats.duration * 1000:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+            route = route_label(scope)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(stats.count)
+            repeated = stats.repeated(settings.DB_REPEATED_QUERY_THRESHOLD)
+            if repeated:
+                DB_REPEATED_QUERIES.labels(route).inc(len(repeated))
+                details = "\n".join(f"  [{count}x] {' '.join(statement.split())}" for statement, count in repeated)
+                print(f"疑似N+1查询 {scope['method']} {scope['path']}（共 {stats.count} 条SQL语句）:\n{details}")
@@ -0,0 +1,68 @@
+import time
+from typing import Callable
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData, MutableHeaders
+from src.utils.tracing import span, start_request, end_request, format_server_timing, finish_request
+from src.utils.metrics import route_label
+from src.config import settings
+
+
+class TimingMiddleware:
+    """按阶段分解请求耗时（纯ASGI中间件）
+
+    请求开始时创建阶段列表，鉴权、表单解析、写入存储、数据库提交、Gitee上传等阶段通过
+    src.utils.tracing.span 记录；响应开始时写入 Server-Timing 头，请求结束后按采样率输出日志。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        start_ns = time.time_ns()
+        status_code = 500
+        spans, token = start_request()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", format_server_timing(spans, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+            finish_request(scope["method"], route_label(scope), status_code, start_ns,
+                           time.perf_counter() - start, list(spans))
+
+
+class TimedRequest(Request):
+    """记录multipart表单接收和解析耗时的请求对象"""
+
+    async def _get_form(self, **kwargs) -> FormData:
+        # 表单解析结果会被缓存，只记录第一次解析
+        if self._form is not None:
+            return self._form
+        with span("multipart"):
+            return await super()._get_form(**kwargs)
+
+
+class TimedRoute(APIRoute):
+    """使用 TimedRequest 的路由类，表单参数在进入接口函数前解析，无法在接口内计时"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            return await handler(TimedRequest(request.scope, request.receive))
+
+        return timed_handler
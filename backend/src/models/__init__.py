@@ -1,5 +1,7 @@
 from .user import User
 from .token import Token
 from .image import Image
+from .stats import ImageStat, TokenStat
+from .import_job import ImportJob
 
-__all__ = ["User", "Token", "Image"]
+__all__ = ["User", "Token", "Image", "ImageStat", "TokenStat", "ImportJob"]
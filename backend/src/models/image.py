@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
+from typing import Optional
 from ..database import Base
+from ..utils.file import generate_variant_url, generate_rendition_url
 
 class Image(Base):
     __tablename__ = "images"
@@ -15,11 +17,48 @@ class Image(Base):
     markdown = Column(String(500), nullable=False)  # Markdown格式地址
     html = Column(String(500), nullable=False)  # HTML格式地址
     gitee_url = Column(String(255), nullable=True)  # Gitee访问URL（可选）
+    format = Column(String(10), nullable=True)  # 文件头探测到的真实格式：jpeg/png/gif/webp
+    width = Column(Integer, nullable=True)  # 显示宽度（像素）
+    height = Column(Integer, nullable=True)  # 显示高度（像素）
+    file_size = Column(BigInteger, nullable=True)  # 原图字节数（计入用户已用空间）
+    placeholder = Column(Text, nullable=True)  # 低清占位图（LQIP）data URI
+    variants = Column(String(100), nullable=True)  # 已生成的响应式宽度，逗号分隔，如 "200,800"
+    animation_formats = Column(String(50), nullable=True)  # GIF已转换的格式，逗号分隔，如 "webp,mp4"
+    processing_pending = Column(String(50), nullable=True)  # 被丢弃、待重新提交的后台任务，逗号分隔：derivatives/animation/optimize
+    processing_attempts = Column(Integer, nullable=False, default=0)  # 后台任务已重新提交的次数
+    bytes_saved = Column(Integer, nullable=False, default=0)  # 原图无损优化节省的字节数
+    access_count = Column(BigInteger, nullable=False, default=0)  # 累计访问次数（原图和衍生文件）
+    last_accessed_at = Column(DateTime(timezone=True), nullable=True)  # 最近访问时间（按批写入，有延迟）
+    storage_tier = Column(String(10), nullable=False, default="hot")  # 存储层级：hot/cold
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # 关系
     user = relationship("User", back_populates="images")
+    
+    @property
+    def variant_widths(self) -> list[int]:
+        """已生成的响应式宽度列表"""
+        if not self.variants:
+            return []
+        return [int(w) for w in self.variants.split(",")]
+    
+    @property
+    def srcset(self) -> Optional[str]:
+        """可直接用于 <img srcset> 的地址列表"""
+        widths = self.variant_widths
+        if not widths:
+            return None
+        return ", ".join(f"{generate_variant_url(self.url, w)} {w}w" for w in widths)
+    
+    @property
+    def video_url(self) -> Optional[str]:
+        """GIF动图转换得到的视频地址（优先MP4）"""
+        formats = (self.animation_formats or "").split(",")
+        for video_format in ("mp4", "webm"):
+            if video_format in formats:
+                return generate_rendition_url(self.url, video_format)
+        return None
 
 
 class ChunkUpload(Base):
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class ImportJob(Base):
+    """归档导入任务（导入过程中按批更新进度）"""
+    __tablename__ = "import_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String(255), nullable=True)  # 归档文件名（仅用于展示）
+    status = Column(String(20), nullable=False, default="pending")  # pending/running/completed/failed
+    entries = Column(Integer, nullable=False, default=0)  # 已读取的文件条目数
+    imported = Column(Integer, nullable=False, default=0)  # 已导入的图片数
+    skipped = Column(Integer, nullable=False, default=0)  # 跳过的非图片文件数
+    failed = Column(Integer, nullable=False, default=0)  # 校验或保存失败的图片数
+    bytes_read = Column(BigInteger, nullable=False, default=0)  # 已接收的请求体字节数
+    error = Column(String(500), nullable=True)  # 任务失败原因
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, UniqueConstraint
+from ..database import Base
+
+class ImageStat(Base):
+    """图片访问统计（按小时和按天汇总）"""
+    __tablename__ = "image_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    image_id = Column(Integer, nullable=False)  # 不设外键：图片删除后保留历史流量
+    user_id = Column(Integer, nullable=False)
+    period = Column(String(10), nullable=False)  # 汇总粒度：hour/day
+    bucket = Column(DateTime, nullable=False)  # 时间桶起点
+    hits = Column(BigInteger, nullable=False, default=0)  # 访问次数
+    bytes = Column(BigInteger, nullable=False, default=0)  # 返回的字节数
+    
+    __table_args__ = (
+        UniqueConstraint("image_id", "period", "bucket", name="uq_image_stats_bucket"),
+    )
+
+
+class TokenStat(Base):
+    """外部Token调用统计（按小时和按天汇总）"""
+    __tablename__ = "token_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    token_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    period = Column(String(10), nullable=False)  # 汇总粒度：hour/day
+    bucket = Column(DateTime, nullable=False)  # 时间桶起点
+    hits = Column(BigInteger, nullable=False, default=0)  # 调用次数
+    
+    __table_args__ = (
+        UniqueConstraint("token_id", "period", "bucket", name="uq_token_stats_bucket"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from ..database import Base
@@ -10,6 +10,9 @@ class User(Base):
     username = Column(String(50), unique=True, index=True, nullable=False)
     password = Column(String(255), nullable=False)
     email = Column(String(100), nullable=True)  # 邮箱可重复
+    storage_used = Column(BigInteger, nullable=False, default=0)  # 已用存储空间（原图字节数，上传和删除时增量更新）
+    storage_reserved = Column(BigInteger, nullable=False, default=0)  # 进行中的上传预留的空间
+    storage_quota = Column(BigInteger, nullable=True)  # 存储配额（字节），为空时使用 STORAGE_QUOTA_BYTES，0表示不限制
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -1,5 +1,8 @@
 from .auth import router as auth_router
 from .token import router as token_router
 from .image import router as image_router
+from .static import router as static_router
+from .stats import router as stats_router
+from .profiling import router as profiling_router
 
-__all__ = ["auth_router", "token_router", "image_router"]
+__all__ = ["auth_router", "token_router", "image_router", "static_router", "stats_router", "profiling_router"]
@@ -1,18 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from src.database import get_db
 from src.schemas.image import (
     ImageResponse, ImageQueryParams, BatchDeleteRequest, 
-    BatchDeleteResponse, UploadResponse, ChunkInitRequest,
-    ChunkInitResponse, ChunkUploadRequest, ChunkUploadResponse
+    BatchDeleteResponse, UploadResponse, OptimizationStatsResponse, ChunkInitRequest,
+    ChunkInitResponse, ChunkUploadRequest, ChunkUploadResponse, StorageUsageResponse,
+    ImportJobRequest, ImportJobResponse
 )
 from src.schemas.common import Response, Pagination
 from src.services.image import ImageService
+from src.services.export import ExportService
+from src.services.importer import ImportService
 from src.models.user import User
-from src.utils.dependency import get_current_user
+from src.utils.dependency import get_current_user, rate_limits, rate_limit_upload
+from src.middlewares import TimedRoute
 
-router = APIRouter(prefix="/api", tags=["图片管理"])
+# 上传接口的表单解析耗时计入 Server-Timing
+router = APIRouter(prefix="/api", tags=["图片管理"], route_class=TimedRoute, dependencies=rate_limits)
 
 @router.get("/images", response_model=Response[List[ImageResponse]])
 async def get_images(
@@ -63,7 +69,7 @@ async def get_images(
             data=None
         )
 
-@router.post("/images", response_model=Response[UploadResponse])
+@router.post("/images", response_model=Response[UploadResponse], dependencies=[Depends(rate_limit_upload)])
 async def upload_images(
     request: Request,
     files: List[UploadFile] = File(...),
@@ -96,7 +102,7 @@ async def delete_image(
 ):
     """删除单张图片"""
     try:
-        ImageService.delete_image(db, current_user, image_id)
+        await ImageService.delete_image(db, current_user, image_id)
         return Response(
             code=0,
             message="删除成功",
@@ -117,7 +123,7 @@ async def batch_delete_images(
 ):
     """批量删除图片"""
     try:
-        result = ImageService.batch_delete_images(db, current_user, delete_request)
+        result = await ImageService.batch_delete_images(db, current_user, delete_request)
         return Response(
             code=0,
             message="批量删除成功",
@@ -131,6 +137,174 @@ async def batch_delete_images(
         )
 
 
+@router.get("/images/optimization-stats", response_model=Response[OptimizationStatsResponse])
+async def get_optimization_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取原图无损优化节省的空间统计"""
+    try:
+        result = ImageService.get_optimization_stats(db, current_user)
+        return Response(
+            code=0,
+            message="查询成功",
+            data=result
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+
+@router.get("/images/storage-usage", response_model=Response[StorageUsageResponse])
+async def get_storage_usage(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取存储空间使用情况和配额"""
+    try:
+        result = ImageService.get_storage_usage(db, current_user)
+        return Response(
+            code=0,
+            message="查询成功",
+            data=result
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+
+@router.get("/images/export/metadata")
+async def export_image_metadata(
+    format: str = "ndjson",
+    name_like: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    sort_by: str = "created_at",
+    order: str = "desc",
+    current_user: User = Depends(get_current_user)
+):
+    """导出所有匹配图片的元数据（地址、Markdown、HTML等），format为ndjson或csv，过滤条件与图片列表相同"""
+    try:
+        media_type = ExportService.metadata_media_type(format)
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+    query_params = ImageQueryParams(
+        name_like=name_like,
+        start_date=start_date,
+        end_date=end_date,
+        sort_by=sort_by,
+        order=order
+    )
+    return StreamingResponse(
+        ExportService.stream_metadata(current_user, query_params, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{current_user.username}-images.{format}"'}
+    )
+
+
+@router.get("/images/export")
+async def export_images(
+    manifest: bool = True,
+    after_id: int = 0,
+    until_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """导出全部图片为ZIP（流式生成，manifest为True时附带元数据清单 manifest.ndjson）
+
+    中断后以最后一个完整条目的id（条目名 images/{id}_{文件名}）作为 after_id、
+    首次响应头 X-Export-Until-Id 的值作为 until_id 重新请求剩余部分。
+    """
+    if until_id is None:
+        until_id = ExportService.get_until_id(db, current_user)
+    filename = f"{current_user.username}-images-{after_id}-{until_id}.zip"
+    return StreamingResponse(
+        ExportService.stream_zip(current_user, after_id, until_id, manifest),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Export-Until-Id": str(until_id),
+        }
+    )
+
+
+@router.post("/images/import", response_model=Response[ImportJobResponse])
+async def create_import_job(
+    request: ImportJobRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """创建归档导入任务，之后用 PUT /images/import/{job_id} 上传归档"""
+    try:
+        result = ImportService.create_job(db, current_user, request)
+        return Response(
+            code=0,
+            message="导入任务创建成功",
+            data=result
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+
+@router.put("/images/import/{job_id}", response_model=Response[ImportJobResponse], dependencies=[Depends(rate_limit_upload)])
+async def run_import_job(
+    job_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """上传ZIP或TAR（可gzip压缩）归档并导入，请求体为归档文件本身（不是multipart表单），边接收边导入"""
+    try:
+        result = await ImportService.run_job(db, current_user, job_id, request.stream())
+        return Response(
+            code=0,
+            message="导入完成" if result.status == "completed" else f"导入失败: {result.error}",
+            data=result
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+
+@router.get("/images/import/{job_id}", response_model=Response[ImportJobResponse])
+async def get_import_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """查询归档导入任务的进度"""
+    try:
+        result = ImportService.get_job(db, current_user, job_id)
+        return Response(
+            code=0,
+            message="查询成功",
+            data=result
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+
 @router.post("/images/chunk/init", response_model=Response[ChunkInitResponse])
 async def init_chunk_upload(
     request: ChunkInitRequest,
@@ -153,7 +327,7 @@ async def init_chunk_upload(
         )
 
 
-@router.post("/images/chunk/upload", response_model=Response[ChunkUploadResponse])
+@router.post("/images/chunk/upload", response_model=Response[ChunkUploadResponse], dependencies=[Depends(rate_limit_upload)])
 async def upload_chunk(
     upload_id: str = Form(...),
     chunk_index: int = Form(...),
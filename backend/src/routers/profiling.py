@@ -0,0 +1,226 @@
+import json
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from typing import List, Optional
+from src.schemas.profiling import ProfileTokenResponse, WorkerProfileResponse, ProfileFileResponse, MemorySnapshotResponse
+from src.schemas.common import Response
+from src.services.profiling import ProfilingService
+from src.models.user import User
+from src.utils.dependency import get_admin_user
+from src.utils.profiling import to_collapsed, to_speedscope
+
+router = APIRouter(prefix="/api/admin/profiling", tags=["性能分析"])
+
+@router.post("/request-token", response_model=Response[ProfileTokenResponse])
+async def create_request_token(current_user: User = Depends(get_admin_user)):
+    """签发单个请求CPU分析令牌：请求携带 X-Profile 头时采样，响应头 X-Profile-Id 返回结果ID"""
+    try:
+        token = ProfilingService.create_request_token(current_user)
+        return Response(
+            code=0,
+            message="签发成功",
+            data=token
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.post("/worker/start", response_model=Response[WorkerProfileResponse])
+async def start_worker_profile(
+    duration: float = 60,
+    current_user: User = Depends(get_admin_user)
+):
+    """开始对处理本请求的worker做CPU采样，到达duration秒后自动停止"""
+    try:
+        profile = ProfilingService.start_worker_profile(duration)
+        return Response(
+            code=0,
+            message="已开始CPU分析",
+            data=profile
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.post("/worker/stop", response_model=Response[WorkerProfileResponse])
+async def stop_worker_profile(current_user: User = Depends(get_admin_user)):
+    """提前停止worker的CPU分析（多worker部署时需落到开始分析的同一worker，否则等待自动停止）"""
+    try:
+        profile = ProfilingService.stop_worker_profile()
+        return Response(
+            code=0,
+            message="已停止CPU分析",
+            data=profile
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.get("/profiles", response_model=Response[List[ProfileFileResponse]])
+async def list_profiles(current_user: User = Depends(get_admin_user)):
+    """已保存的CPU分析结果"""
+    try:
+        profiles = ProfilingService.list_profiles()
+        return Response(
+            code=0,
+            message="查询成功",
+            data=profiles
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    format: str = "speedscope",
+    current_user: User = Depends(get_admin_user)
+):
+    """下载CPU分析结果：speedscope（JSON，可在 speedscope.app 打开）或 collapsed（折叠栈，用于生成火焰图）"""
+    try:
+        if format not in ("speedscope", "collapsed"):
+            raise HTTPException(status_code=400, detail="格式只能是 speedscope 或 collapsed")
+        with open(ProfilingService.get_profile_path(profile_id)) as f:
+            profile = json.load(f)
+        if format == "collapsed":
+            return PlainTextResponse(to_collapsed(profile), headers={
+                "Content-Disposition": f'attachment; filename="{profile_id}.folded"'
+            })
+        return JSONResponse(to_speedscope(profile), headers={
+            "Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'
+        })
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.delete("/profiles/{profile_id}", response_model=Response)
+async def delete_profile(profile_id: str, current_user: User = Depends(get_admin_user)):
+    """删除CPU分析结果"""
+    try:
+        ProfilingService.delete_profile(profile_id)
+        return Response(
+            code=0,
+            message="删除成功",
+            data=None
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.post("/memory/start", response_model=Response)
+async def start_memory_tracing(
+    frames: int = 1,
+    current_user: User = Depends(get_admin_user)
+):
+    """开始跟踪处理本请求的worker的内存分配（frames为每次分配保存的调用栈深度）"""
+    try:
+        ProfilingService.start_memory_tracing(frames)
+        return Response(
+            code=0,
+            message="已开始跟踪内存分配",
+            data=None
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.post("/memory/stop", response_model=Response)
+async def stop_memory_tracing(current_user: User = Depends(get_admin_user)):
+    """停止跟踪内存分配并丢弃已保存的快照"""
+    try:
+        ProfilingService.stop_memory_tracing()
+        return Response(
+            code=0,
+            message="已停止跟踪内存分配",
+            data=None
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.post("/memory/snapshots", response_model=Response[MemorySnapshotResponse])
+async def take_memory_snapshot(
+    limit: int = 20,
+    current_user: User = Depends(get_admin_user)
+):
+    """保存内存快照，返回分配最多的代码行"""
+    try:
+        snapshot = ProfilingService.take_memory_snapshot(min(limit, 200))
+        return Response(
+            code=0,
+            message="快照已保存",
+            data=snapshot
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.get("/memory/top", response_model=Response[MemorySnapshotResponse])
+async def get_memory_top(
+    limit: int = 20,
+    snapshot_id: Optional[int] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """分配最多的代码行（不指定快照ID时读取当前状态）"""
+    try:
+        snapshot = ProfilingService.get_memory_top(min(limit, 200), snapshot_id)
+        return Response(
+            code=0,
+            message="查询成功",
+            data=snapshot
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.get("/memory/diff", response_model=Response[MemorySnapshotResponse])
+async def diff_memory_snapshots(
+    base: int,
+    target: int,
+    limit: int = 20,
+    current_user: User = Depends(get_admin_user)
+):
+    """对比两个快照，返回内存增长最多的代码行"""
+    try:
+        diff = ProfilingService.diff_memory_snapshots(base, target, min(limit, 200))
+        return Response(
+            code=0,
+            message="查询成功",
+            data=diff
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
@@ -0,0 +1,151 @@
+import os
+import re
+import mimetypes
+import aiofiles
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from src.services.processing import ProcessingService, NEGOTIABLE_EXTENSIONS
+from src.services.tiering import TieringService
+from src.utils.cache import hot_cache
+from src.utils.stats import image_hits
+from src.utils.metrics import SERVED_BYTES
+from src.utils.file import resolve_image_path, resolve_derived_path, image_stem, get_image_path, is_cold_path
+from src.storage import get_storage
+
+router = APIRouter(tags=["图片访问"])
+
+def _not_modified(request: Request, headers) -> bool:
+    """协商缓存：ETag未变化"""
+    return request.headers.get("if-none-match") == headers.get("etag")
+
+def _not_modified_response(headers) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={
+        key: value for key, value in headers.items()
+        if key in ("etag", "last-modified", "vary")
+    })
+
+async def _serve_file(request: Request, username: str, filename: str, derived: bool) -> Response:
+    """返回原图或衍生文件，并在内存中记录访问次数和字节数"""
+    response = await _build_response(request, username, filename, derived)
+    nbytes = int(response.headers.get("content-length") or 0)
+    image_hits.record((username, image_stem(filename)), nbytes)
+    SERVED_BYTES.labels("derived" if derived else "original").inc(nbytes)
+    return response
+
+async def _build_response(request: Request, username: str, filename: str, derived: bool) -> Response:
+    """构造原图或衍生文件的响应，热点小图走内存缓存"""
+    # 防止路径穿越
+    if username.startswith(".") or filename.startswith("."):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    file_extension = os.path.splitext(filename)[1].lstrip(".").lower()
+    negotiable = not derived and file_extension in NEGOTIABLE_EXTENSIONS
+    accept = request.headers.get("accept", "")
+
+    # 热点小图直接从内存返回，不触发任何文件系统调用；同一张图片的原图和衍生文件属于同一缓存分组
+    group = (username, image_stem(filename))
+    cache_key = (group, filename, ProcessingService.negotiation_key(accept) if negotiable else ())
+    if hot_cache.enabled:
+        cached = hot_cache.get(cache_key)
+        if cached:
+            body, headers = cached
+            if _not_modified(request, headers):
+                return _not_modified_response(headers)
+            return Response(content=body, headers=headers)
+
+    if not get_storage().is_local:
+        if derived:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+        return await _serve_remote(request, get_image_path(username, filename), cache_key)
+
+    # 按存储布局查找文件，兼容迁移前的平铺目录
+    file_path = resolve_derived_path(username, filename) if derived else resolve_image_path(username, filename)
+    if not file_path:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not derived and is_cold_path(file_path):
+        # 冷图片被访问：本次从冷存储返回，同时在后台移回热存储
+        TieringService.schedule_promotion(file_path)
+
+    headers = {}
+    media_type = None
+    serve_path = file_path
+    settled = True
+    if negotiable:
+        # 同一URL会按Accept返回不同内容，缓存需区分
+        headers["Vary"] = "Accept"
+        rendition, settled = ProcessingService.negotiate_rendition(file_path, accept)
+        if rendition:
+            serve_path, media_type = rendition
+
+    stat_result = os.stat(serve_path)
+    response = FileResponse(serve_path, media_type=media_type, headers=headers, stat_result=stat_result)
+
+    # 协商结果已稳定且通过准入时读入内存缓存
+    if settled and hot_cache.should_admit(cache_key, stat_result.st_size):
+        async with aiofiles.open(serve_path, "rb") as f:
+            body = await f.read()
+        cached_headers = dict(response.headers)
+        if hot_cache.put(cache_key, body, cached_headers):
+            response = Response(content=body, headers=cached_headers)
+
+    if _not_modified(request, response.headers):
+        return _not_modified_response(response.headers)
+
+    return response
+
+def _parse_range(range_header: str, size: int):
+    """解析单个字节区间的Range请求头，返回 (start, end)，无效时返回None"""
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", range_header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # 后缀区间：最后N个字节
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+async def _serve_remote(request: Request, key: str, cache_key: tuple) -> Response:
+    """从远程存储后端流式返回原图，支持Range请求"""
+    storage = get_storage()
+    size = await storage.size(key)
+    if size is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    headers = {
+        "content-type": mimetypes.guess_type(key)[0] or "application/octet-stream",
+        "accept-ranges": "bytes",
+    }
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                            headers={"content-range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+        headers["content-length"] = str(end - start + 1)
+        return StreamingResponse(storage.get_range(key, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers)
+
+    # 小文件读入内存缓存，后续请求不再访问远程存储
+    if hot_cache.should_admit(cache_key, size):
+        body = await storage.read(key)
+        headers["content-length"] = str(len(body))
+        hot_cache.put(cache_key, body, headers)
+        return Response(content=body, headers=headers)
+
+    headers["content-length"] = str(size)
+    return StreamingResponse(storage.get_range(key), headers=headers)
+
+@router.api_route("/static/{username}/images/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_image_file(username: str, filename: str, request: Request):
+    """访问图片原图（支持按Accept协商返回WebP/AVIF，GIF动图返回视频或动态WebP）"""
+    return await _serve_file(request, username, filename, derived=False)
+
+@router.api_route("/static/{username}/derived/{filename}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_derived_file(username: str, filename: str, request: Request):
+    """访问衍生文件（响应式缩略图、GIF转换的视频等）"""
+    return await _serve_file(request, username, filename, derived=True)
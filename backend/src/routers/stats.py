@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List
+from src.database import get_db
+from src.schemas.stats import TopImageResponse, TrafficPoint, TokenStatsResponse
+from src.schemas.common import Response
+from src.services.stats import StatsService
+from src.models.user import User
+from src.utils.dependency import get_current_user, rate_limits
+
+router = APIRouter(prefix="/api/stats", tags=["访问统计"], dependencies=rate_limits)
+
+@router.get("/top-images", response_model=Response[List[TopImageResponse]])
+async def get_top_images(
+    days: int = 7,
+    limit: int = 10,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取最近N天访问次数最多的图片（统计按批写入，约有1分钟延迟）"""
+    try:
+        top_images = StatsService.get_top_images(db, current_user.id, days, min(limit, 100))
+        return Response(
+            code=0,
+            message="查询成功",
+            data=top_images
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.get("/traffic", response_model=Response[List[TrafficPoint]])
+async def get_traffic(
+    granularity: str = "day",
+    days: int = 7,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取图片访问流量时间序列（granularity: hour 或 day）"""
+    try:
+        traffic = StatsService.get_traffic(db, current_user.id, granularity, days)
+        return Response(
+            code=0,
+            message="查询成功",
+            data=traffic
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
+
+@router.get("/tokens", response_model=Response[List[TokenStatsResponse]])
+async def get_token_stats(
+    days: int = 30,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取最近N天各外部Token的调用次数"""
+    try:
+        token_stats = StatsService.get_token_stats(db, current_user.id, days)
+        return Response(
+            code=0,
+            message="查询成功",
+            data=token_stats
+        )
+    except HTTPException as e:
+        return Response(
+            code=e.status_code,
+            message=e.detail,
+            data=None
+        )
@@ -5,9 +5,9 @@ from src.schemas.token import TokenCreate, TokenResponse, TokenCreateResponse, T
 from src.schemas.common import Response
 from src.services.token import TokenService
 from src.models.user import User
-from src.utils.dependency import get_current_user
+from src.utils.dependency import get_current_user, rate_limits
 
-router = APIRouter(prefix="/api", tags=["Token管理"])
+router = APIRouter(prefix="/api", tags=["Token管理"], dependencies=rate_limits)
 
 @router.get("/tokens", response_model=Response[TokenListResponse])
 async def get_tokens(
@@ -1,11 +1,13 @@
 from .auth import UserCreate, UserLogin, UserResponse, LoginResponse
 from .token import TokenCreate, TokenResponse, TokenCreateResponse, TokenListResponse
 from .image import ImageResponse, ImageQueryParams, BatchDeleteRequest, BatchDeleteResponse, UploadResponse
+from .stats import TopImageResponse, TrafficPoint, TokenStatsResponse
 from .common import Response, Pagination
 
 __all__ = [
     "UserCreate", "UserLogin", "UserResponse", "LoginResponse",
     "TokenCreate", "TokenResponse", "TokenCreateResponse", "TokenListResponse",
     "ImageResponse", "ImageQueryParams", "BatchDeleteRequest", "BatchDeleteResponse", "UploadResponse",
+    "TopImageResponse", "TrafficPoint", "TokenStatsResponse",
     "Response", "Pagination"
 ]
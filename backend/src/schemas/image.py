@@ -10,6 +10,15 @@ class ImageResponse(BaseModel):
     markdown: str
     html: str
     gitee_url: Optional[str] = None
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    placeholder: Optional[str] = None
+    srcset: Optional[str] = None
+    video_url: Optional[str] = None
+    bytes_saved: int = 0
+    access_count: int = 0
+    last_accessed_at: Optional[datetime] = None
     created_at: datetime
     
     class Config:
@@ -37,6 +46,42 @@ class UploadResponse(BaseModel):
     images: List[ImageResponse]
 
 
+class OptimizationStatsResponse(BaseModel):
+    """原图优化统计"""
+    optimized: int = Field(..., description="已优化（变小）的图片数")
+    bytes_saved: int = Field(..., description="累计节省的字节数")
+
+
+class ImportJobRequest(BaseModel):
+    """创建归档导入任务"""
+    filename: Optional[str] = Field(None, max_length=255, description="归档文件名（仅用于展示）")
+
+
+class ImportJobResponse(BaseModel):
+    """归档导入任务状态"""
+    id: int
+    filename: Optional[str] = None
+    status: str = Field(..., description="pending（等待上传）/running/completed/failed")
+    entries: int = Field(0, description="已读取的文件条目数")
+    imported: int = Field(0, description="已导入的图片数")
+    skipped: int = Field(0, description="跳过的非图片文件数")
+    failed: int = Field(0, description="校验或保存失败的图片数")
+    bytes_read: int = Field(0, description="已接收的字节数")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class StorageUsageResponse(BaseModel):
+    """存储空间使用情况"""
+    used: int = Field(..., description="已用空间（字节）")
+    reserved: int = Field(..., description="进行中的上传预留的空间（字节）")
+    quota: Optional[int] = Field(None, description="配额（字节），为空表示不限制")
+
+
 class ChunkInitRequest(BaseModel):
     """初始化切片上传请求"""
     filename: str = Field(..., description="原始文件名")
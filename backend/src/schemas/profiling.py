@@ -0,0 +1,43 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+
+class ProfileTokenResponse(BaseModel):
+    """单个请求CPU分析的触发令牌"""
+    token: str
+    header: str = Field(..., description="携带令牌的请求头，响应头 X-Profile-Id 返回分析结果ID")
+    expires_in: int = Field(..., description="有效期（秒）")
+
+
+class WorkerProfileResponse(BaseModel):
+    """worker级CPU分析"""
+    profile_id: str
+    pid: int = Field(..., description="进行分析的worker进程ID，多worker部署时停止请求需落到同一worker")
+    duration: float = Field(..., description="最长采样时间或实际采样时间（秒）")
+
+
+class ProfileFileResponse(BaseModel):
+    """已保存的CPU分析结果"""
+    profile_id: str
+    size: int
+    created_at: datetime
+
+
+class MemoryStat(BaseModel):
+    """按代码行汇总的内存分配"""
+    location: str
+    size: int = Field(..., description="分配的字节数")
+    count: int = Field(..., description="分配的内存块数")
+    size_diff: Optional[int] = Field(None, description="相对基准快照的字节数变化")
+    count_diff: Optional[int] = Field(None, description="相对基准快照的内存块数变化")
+
+
+class MemorySnapshotResponse(BaseModel):
+    """tracemalloc内存快照"""
+    snapshot_id: Optional[int] = Field(None, description="快照ID，未保存快照时为空")
+    pid: int
+    traced_current: int = Field(..., description="当前跟踪到的内存字节数")
+    traced_peak: int = Field(..., description="开始跟踪以来的峰值字节数")
+    snapshot_ids: List[int] = Field(..., description="当前worker保存的快照ID")
+    top: List[MemoryStat]
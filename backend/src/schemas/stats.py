@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Optional
+from .image import ImageResponse
+
+
+class TopImageResponse(BaseModel):
+    """热门图片"""
+    image: ImageResponse
+    hits: int = Field(..., description="统计周期内的访问次数")
+    bytes: int = Field(..., description="统计周期内返回的字节数")
+
+
+class TrafficPoint(BaseModel):
+    """流量时间序列中的一个时间桶"""
+    bucket: datetime = Field(..., description="时间桶起点")
+    hits: int = Field(..., description="访问次数")
+    bytes: int = Field(..., description="返回的字节数")
+
+
+class TokenStatsResponse(BaseModel):
+    """外部Token调用统计"""
+    token_id: int
+    name: Optional[str] = Field(None, description="Token名称，Token已删除时为空")
+    hits: int = Field(..., description="统计周期内的调用次数")
@@ -0,0 +1,117 @@
+"""在线迁移图片存储布局
+
+将已有图片（原图及衍生文件）分批移动到当前配置的存储布局（STORAGE_LAYOUT），并更新 Image.path。
+迁移期间服务无需停机：访问路由会在所有布局中查找文件，URL保持不变。
+
+用法：
+    python -m src.scripts.migrate_storage [--batch-size 500] [--sleep 0.1] [--dry-run]
+"""
+import os
+import time
+import argparse
+from sqlalchemy import select
+from src.database import SessionLocal
+from src.models.image import Image
+from src.utils.file import (
+    get_image_path, get_layout, split_image_path, resolve_image_path,
+    list_derived_files, get_derived_path, prune_empty_dirs, is_cold_path
+)
+from src.storage import get_storage
+from src.config import settings
+
+
+def _move(source: str, target: str) -> None:
+    """同一文件系统内原子移动文件"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(source, target)
+
+
+def migrate_image(image: Image, dry_run: bool = False) -> bool:
+    """迁移单张图片，返回是否发生了移动"""
+    username, filename = split_image_path(image.path)
+    target_path = get_image_path(username, filename)
+    if image.path == target_path:
+        return False
+
+    # 数据库中的路径可能已过期（例如上次迁移中断），以实际文件位置为准
+    source_path = image.path if os.path.isfile(image.path) else resolve_image_path(username, filename)
+    if not source_path:
+        print(f"文件不存在，跳过: {image.path}")
+        return False
+
+    if dry_run:
+        print(f"{source_path} -> {target_path}")
+        return True
+
+    # 先移动衍生文件，再移动原图，最后更新数据库；任一时刻访问路由都能找到文件
+    for derived_path in list_derived_files(source_path):
+        derived_target = get_derived_path(target_path, os.path.basename(derived_path))
+        if derived_path != derived_target:
+            _move(derived_path, derived_target)
+            prune_empty_dirs(derived_path)
+    if source_path != target_path:
+        _move(source_path, target_path)
+        prune_empty_dirs(source_path)
+
+    image.path = target_path
+    return True
+
+
+def migrate(batch_size: int, sleep: float, dry_run: bool) -> int:
+    """按主键分批迁移所有图片，每批提交一次事务"""
+    migrated = 0
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            images = db.scalars(
+                select(Image).where(Image.id > last_id).order_by(Image.id).limit(batch_size)
+            ).all()
+            if not images:
+                break
+
+            batch_migrated = 0
+            for image in images:
+                if is_cold_path(image.path):
+                    # 冷存储中的图片保持原布局，移回热存储时按当前布局存放
+                    continue
+                if get_layout(image.path) != settings.STORAGE_LAYOUT or not os.path.isfile(image.path):
+                    try:
+                        if migrate_image(image, dry_run):
+                            batch_migrated += 1
+                    except OSError as e:
+                        print(f"迁移失败 {image.path}: {str(e)}")
+            last_id = images[-1].id
+
+            if not dry_run:
+                db.commit()
+            migrated += batch_migrated
+            print(f"已处理至 id={last_id}，本批迁移 {batch_migrated} 张，累计 {migrated} 张")
+        finally:
+            db.close()
+
+        # 批次之间让出磁盘IO，避免影响线上请求
+        if sleep:
+            time.sleep(sleep)
+
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在线迁移图片存储布局")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的图片数")
+    parser.add_argument("--sleep", type=float, default=0.1, help="批次之间的暂停时间（秒）")
+    parser.add_argument("--dry-run", action="store_true", help="只打印将要移动的文件")
+    args = parser.parse_args()
+
+    if not get_storage().is_local:
+        print("存储布局迁移仅适用于本地存储后端")
+        return
+
+    print(f"目标存储布局: {settings.STORAGE_LAYOUT}")
+    migrated = migrate(args.batch_size, args.sleep, args.dry_run)
+    print(f"迁移完成，共迁移 {migrated} 张图片")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""回填图片大小并重新统计用户存储空间
+
+分批读取尚未记录大小的图片（Image.file_size 为空）在存储后端中的实际大小，
+然后按图片和切片上传会话重新计算每个用户的已用空间（storage_used）和预留空间（storage_reserved）。
+执行 007_storage_quota.sql 迁移后运行一次；计数与实际不一致时也可以再次运行（建议在低峰期，
+统计期间完成的上传可能被覆盖）。
+
+用法：
+    python -m src.scripts.recount_storage [--batch-size 500] [--sleep 0.1] [--all]
+"""
+import asyncio
+import argparse
+from sqlalchemy import select, func, update
+from src.database import SessionLocal
+from src.models.image import Image, ChunkUpload
+from src.models.user import User
+from src.storage import get_storage
+
+
+async def backfill(batch_size: int, sleep: float, recheck_all: bool) -> int:
+    """按主键分批回填图片大小，每批提交一次事务"""
+    storage = get_storage()
+    filled = 0
+    last_id = 0
+    while True:
+        db = SessionLocal()
+        try:
+            query = select(Image).where(Image.id > last_id)
+            if not recheck_all:
+                query = query.where(Image.file_size.is_(None))
+            images = db.scalars(query.order_by(Image.id).limit(batch_size)).all()
+            if not images:
+                break
+
+            for image in images:
+                size = await storage.size(image.path)
+                if size is None:
+                    print(f"文件不存在，按0计算: {image.path}")
+                    size = 0
+                image.file_size = size
+            last_id = images[-1].id
+
+            db.commit()
+            filled += len(images)
+            print(f"已处理至 id={last_id}，累计 {filled} 张")
+        finally:
+            db.close()
+
+        # 批次之间让出IO，避免影响线上请求
+        if sleep:
+            await asyncio.sleep(sleep)
+
+    return filled
+
+
+def recount() -> int:
+    """按图片大小和进行中的切片上传重新计算每个用户的已用空间和预留空间"""
+    db = SessionLocal()
+    try:
+        used = dict(db.execute(
+            select(Image.user_id, func.coalesce(func.sum(Image.file_size), 0)).group_by(Image.user_id)
+        ).all())
+        reserved = dict(db.execute(
+            select(ChunkUpload.user_id, func.coalesce(func.sum(ChunkUpload.file_size), 0)).group_by(ChunkUpload.user_id)
+        ).all())
+        user_ids = db.scalars(select(User.id)).all()
+        for user_id in user_ids:
+            db.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(storage_used=used.get(user_id, 0), storage_reserved=reserved.get(user_id, 0))
+            )
+        db.commit()
+        return len(user_ids)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回填图片大小并重新统计用户存储空间")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的图片数")
+    parser.add_argument("--sleep", type=float, default=0.1, help="批次之间的暂停时间（秒）")
+    parser.add_argument("--all", action="store_true", help="重新读取所有图片的大小，而不只是未记录大小的图片")
+    args = parser.parse_args()
+
+    filled = asyncio.run(backfill(args.batch_size, args.sleep, args.all))
+    print(f"回填完成，共处理 {filled} 张图片")
+    users = recount()
+    print(f"已重新统计 {users} 个用户的存储空间")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
 from .auth import AuthService
 from .token import TokenService
 from .image import ImageService
+from .processing import ProcessingService
+from .tiering import TieringService
+from .stats import StatsService
+from .quota import QuotaService
+from .export import ExportService
+from .importer import ImportService
 
-__all__ = ["AuthService", "TokenService", "ImageService"]
+__all__ = ["AuthService", "TokenService", "ImageService", "ProcessingService", "TieringService", "StatsService", "QuotaService", "ExportService", "ImportService"]
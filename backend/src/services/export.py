@@ -0,0 +1,198 @@
+import io
+import os
+import asyncio
+import csv
+import json
+from typing import AsyncIterator, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from fastapi import HTTPException, status
+from src.database import SessionLocal
+from src.models.image import Image
+from src.models.user import User
+from src.schemas.image import ImageQueryParams
+from src.services.image import ImageService
+from src.utils.archive import ZipStreamWriter
+from src.utils.file import resolve_image_path, split_image_path
+from src.utils.metrics import SERVED_BYTES
+from src.storage import get_storage
+
+# 每次查询的图片数（每批使用独立的短会话，下载较慢时不长时间占用数据库连接）
+_BATCH_SIZE = 500
+
+MANIFEST_NAME = "manifest.ndjson"
+
+# 元数据导出：服务端游标每次取回的行数，以及输出缓冲达到多少字节时发送一次
+_YIELD_PER = 1000
+_FLUSH_SIZE = 64 * 1024
+
+# 元数据导出的字段（同时也是CSV的列顺序）
+METADATA_FIELDS = (
+    "id", "filename", "nicname", "url", "markdown", "html", "gitee_url",
+    "format", "width", "height", "file_size", "created_at",
+)
+
+METADATA_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+# 以这些字符开头的单元格会被电子表格当作公式执行（CSV注入）
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value):
+    """CSV单元格：用户可控的文本以公式字符开头时加 ' 前缀，电子表格按文本显示"""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _metadata_record(image) -> dict:
+    """导出的元数据：image为图片或只包含导出列的查询结果行"""
+    record = {field: getattr(image, field) for field in METADATA_FIELDS}
+    record["created_at"] = image.created_at.isoformat() if image.created_at else None
+    return record
+
+
+def _entry_name(image: Image) -> str:
+    """ZIP条目名：以图片id开头，按id顺序写入，断点续传时据此确定 after_id"""
+    filename = os.path.basename((image.filename or "").replace("\\", "/")).lstrip(".")
+    return f"images/{image.id}_{filename or os.path.basename(image.path)}"
+
+
+class ExportService:
+    """导出用户的全部图片
+
+    按图片id顺序边读边生成ZIP（存储模式，图片本身已压缩），不使用临时文件。
+    中断后用 after_id（最后一个完整条目的id）和首次响应给出的 until_id 重新请求，
+    得到剩余图片组成的新ZIP；ZIP的中央目录需要所有条目的CRC，因此不支持按字节Range续传。
+    """
+
+    @staticmethod
+    def get_until_id(db: Session, user: User) -> int:
+        """导出范围的上界：开始导出时用户最新图片的id，续传时沿用，导出期间新上传的图片不会混入"""
+        return db.scalar(select(func.coalesce(func.max(Image.id), 0)).where(Image.user_id == user.id))
+
+    @staticmethod
+    def fetch_batch(user_id: int, after_id: int, until_id: int) -> List[Image]:
+        """按id顺序读取 (after_id, until_id] 范围内的一批图片"""
+        db = SessionLocal()
+        try:
+            images = db.scalars(
+                select(Image)
+                .where(Image.user_id == user_id, Image.id > after_id, Image.id <= until_id)
+                .order_by(Image.id)
+                .limit(_BATCH_SIZE)
+            ).all()
+            db.expunge_all()
+            return images
+        finally:
+            db.close()
+
+    @staticmethod
+    async def iter_batches(user_id: int, after_id: int, until_id: int) -> AsyncIterator[List[Image]]:
+        """分批读取导出范围内的图片，查询在线程中执行，不阻塞事件循环"""
+        while True:
+            images = await asyncio.to_thread(ExportService.fetch_batch, user_id, after_id, until_id)
+            if not images:
+                return
+            yield images
+            after_id = images[-1].id
+
+    @staticmethod
+    async def _locate(image: Image) -> Tuple[Optional[str], Optional[int]]:
+        """图片在存储后端中的key和大小，文件不存在时返回 (None, None)"""
+        storage = get_storage()
+        size = await storage.size(image.path)
+        if size is not None:
+            return image.path, size
+        if storage.is_local:
+            # 数据库中的路径可能已过期（布局迁移或冷热分层进行中），依次检查各布局和冷存储中的路径
+            key = await asyncio.to_thread(resolve_image_path, *split_image_path(image.path))
+            if key:
+                return key, await storage.size(key)
+        return None, None
+
+    @staticmethod
+    async def stream_zip(user: User, after_id: int, until_id: int, manifest: bool) -> AsyncIterator[bytes]:
+        """生成ZIP的字节流；manifest为True时在最后附加每张图片元数据的NDJSON清单"""
+        storage = get_storage()
+        writer = ZipStreamWriter()
+        missing: Set[int] = set()
+        async for images in ExportService.iter_batches(user.id, after_id, until_id):
+            for image in images:
+                key, size = await ExportService._locate(image)
+                if key is None or size is None:
+                    print(f"导出时文件不存在，跳过: {image.path}")
+                    missing.add(image.id)
+                    continue
+                with writer.open(_entry_name(image), image.created_at, size) as entry:
+                    async for chunk in storage.get_range(key):
+                        entry.write(chunk)
+                        data = writer.drain()
+                        SERVED_BYTES.labels("export").inc(len(data))
+                        yield data
+                yield writer.drain()
+
+        if manifest:
+            with writer.open(MANIFEST_NAME) as entry:
+                async for images in ExportService.iter_batches(user.id, after_id, until_id):
+                    for image in images:
+                        entry.write(ExportService.manifest_line(image, image.id not in missing))
+                    yield writer.drain()
+
+        yield writer.close()
+
+    @staticmethod
+    def manifest_line(image: Image, exported: bool = True) -> bytes:
+        """清单中一张图片的元数据（一行JSON）"""
+        record = {"id": image.id, "entry": _entry_name(image) if exported else None, **_metadata_record(image)}
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+    @staticmethod
+    def metadata_media_type(export_format: str) -> str:
+        """元数据导出格式对应的Content-Type，不支持的格式返回400"""
+        if export_format not in METADATA_MEDIA_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的导出格式，允许的格式：{', '.join(METADATA_MEDIA_TYPES)}"
+            )
+        return METADATA_MEDIA_TYPES[export_format]
+
+    @staticmethod
+    def stream_metadata(user: User, query_params: ImageQueryParams, export_format: str) -> Iterator[bytes]:
+        """按列表查询的过滤条件和排序导出所有匹配图片的元数据（NDJSON或CSV）
+
+        使用服务端游标（yield_per）逐批取回，内存占用与图片数量无关；导出期间占用一个数据库连接。
+        同步生成器：StreamingResponse 在线程池中迭代，数据库读取不阻塞事件循环。
+        """
+        db = SessionLocal()
+        try:
+            query = (
+                ImageService.build_query(db, user, query_params)
+                .with_entities(*[getattr(Image, field) for field in METADATA_FIELDS])
+                .yield_per(_YIELD_PER)
+            )
+            buffer = io.StringIO()
+            writer = None
+            if export_format == "csv":
+                # 带BOM，Excel才能正确识别UTF-8编码的中文
+                buffer.write("\ufeff")
+                writer = csv.writer(buffer)
+                writer.writerow(METADATA_FIELDS)
+            # 只取导出的列，不构造ORM对象
+            for row in query:
+                record = _metadata_record(row)
+                if writer:
+                    writer.writerow([_csv_cell(value) for value in record.values()])
+                else:
+                    buffer.write(json.dumps(record, ensure_ascii=False) + "\n")
+                if buffer.tell() >= _FLUSH_SIZE:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode("utf-8")
+        finally:
+            db.close()
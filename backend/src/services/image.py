@@ -7,13 +7,21 @@ from src.models.image import Image, ChunkUpload
 from src.models.user import User
 from src.schemas.image import (
     ImageResponse, ImageQueryParams, BatchDeleteRequest, BatchDeleteResponse, UploadResponse,
-    ChunkInitRequest, ChunkInitResponse, ChunkUploadResponse, ChunkUploadRequest
+    OptimizationStatsResponse, ChunkInitRequest, ChunkInitResponse, ChunkUploadResponse, ChunkUploadRequest,
+    StorageUsageResponse
 )
 from src.utils.file import (
-    save_file, delete_file, generate_image_urls, clear_empty_user_dir,
-    init_chunk_upload, save_chunk, merge_chunks, cleanup_chunk_upload, get_chunk_upload_status
+    save_file, delete_image_files, get_cache_group, generate_image_urls, clear_empty_user_dir,
+    init_chunk_upload, save_chunk, merge_chunks, cleanup_chunk_upload, get_chunk_upload_status,
+    get_chunk_upload_size
 )
 from src.utils.gitee import upload_to_gitee
+from src.utils.cache import hot_cache
+from src.services.processing import ProcessingService
+from src.services.quota import QuotaService
+from src.utils.metrics import UPLOAD_STAGE
+from src.utils.tracing import span
+from src.utils.fair_queue import disk_scheduler
 from src.config import settings
 
 class ImageService:
@@ -22,14 +30,26 @@ class ImageService:
         """上传图片（支持批量）"""
         uploaded_images = []
         failed_count = 0
+        # 每次提交后user会过期，先取出需要的属性，避免每个文件都重新查询用户
+        user_id, username = user.id, user.username
         
         for i, file in enumerate(files):
+            reserved = 0
             try:
                 # 获取当前文件的nicname，如果没有提供则使用None
                 nicname = nicnames[i] if nicnames and i < len(nicnames) else None
                 
-                # 保存文件到本地
-                file_path, url = await save_file(file, user.username)
+                # 写入存储前按文件大小预留配额，超出配额时不写入；大小未知时按上限预留
+                size = file.size if file.size is not None else settings.MAX_FILE_SIZE
+                QuotaService.reserve(db, user_id, size)
+                reserved = size
+                
+                # 保存文件到本地（同时探测真实格式和尺寸），写盘按用户公平排队，成本与预留一致
+                async with disk_scheduler.slot(user_id, reserved):
+                    with span("save", UPLOAD_STAGE):
+                        file_path, url, probe = await save_file(file, username)
+                # 按实际写入的字节数记账，多预留的部分在consume时释放
+                size = probe["file_size"]
                 
                 # 生成不同格式的图片地址
                 urls = generate_image_urls(file.filename, url)
@@ -37,44 +57,55 @@ class ImageService:
                 # 上传到Gitee（如果配置了）
                 gitee_url = None
                 if settings.GITEE_ACCESS_TOKEN:
-                    gitee_url = await upload_to_gitee(file_path, file_path.split('/')[-1])
+                    with span("gitee", UPLOAD_STAGE):
+                        gitee_url = await upload_to_gitee(file_path, file_path.split('/')[-1])
                 
                 # 创建图片记录，直接使用原始nicname
                 db_image = Image(
-                    user_id=user.id,
+                    user_id=user_id,
                     filename=file.filename,
                     nicname=nicname,
                     path=file_path,
                     url=urls["url"],
                     markdown=urls["markdown"],
                     html=urls["html"],
-                    gitee_url=gitee_url
+                    gitee_url=gitee_url,
+                    format=probe["format"],
+                    width=probe["width"],
+                    height=probe["height"],
+                    file_size=size
                 )
                 
                 db.add(db_image)
-                db.commit()
-                db.refresh(db_image)
+                # 预留的空间与图片记录在同一事务中转为已用空间
+                QuotaService.consume(db, user_id, reserved, size)
+                with span("db_commit", UPLOAD_STAGE):
+                    db.commit()
+                    db.refresh(db_image)
+                reserved = 0
+                
+                # 提交后台处理任务（缩略图、原图优化）
+                ProcessingService.schedule_post_upload(db_image)
                 
-                uploaded_images.append(db_image)
+                # 下一个文件提交时图片会过期，在此之前转换为响应模型，避免最后逐个重新查询
+                uploaded_images.append(ImageResponse.model_validate(db_image))
             except Exception as e:
                 print(f"上传图片失败: {str(e)}")
                 failed_count += 1
-        
-        # 转换为响应模型
-        image_responses = [
-            ImageResponse.model_validate(image) for image in uploaded_images
-        ]
+                if reserved:
+                    db.rollback()
+                    QuotaService.release(db, user_id, reserved)
+                    db.commit()
         
         return UploadResponse(
             uploaded=len(uploaded_images),
             failed=failed_count,
-            images=image_responses
+            images=uploaded_images
         )
     
     @staticmethod
-    def get_images(db: Session, user: User, query_params: ImageQueryParams) -> dict:
-        """查询图片列表（支持多条件过滤、分页）"""
-        # 构建查询
+    def build_query(db: Session, user: User, query_params: ImageQueryParams):
+        """按查询参数构建图片查询（过滤和排序，不分页），列表查询和元数据导出共用"""
         query = db.query(Image).filter(Image.user_id == user.id)
         
         # 时间范围过滤
@@ -98,6 +129,14 @@ class ImageService:
         else:
             query = query.order_by(getattr(Image, query_params.sort_by).desc())
         
+        return query
+    
+    @staticmethod
+    def get_images(db: Session, user: User, query_params: ImageQueryParams) -> dict:
+        """查询图片列表（支持多条件过滤、分页）"""
+        # 构建查询
+        query = ImageService.build_query(db, user, query_params)
+        
         # 分页
         total = query.count()
         images = query.offset((query_params.page - 1) * query_params.page_size).limit(query_params.page_size).all()
@@ -119,7 +158,7 @@ class ImageService:
         }
     
     @staticmethod
-    def delete_image(db: Session, user: User, image_id: int) -> bool:
+    async def delete_image(db: Session, user: User, image_id: int) -> bool:
         """删除单张图片"""
         # 查找图片
         image = db.query(Image).filter(
@@ -133,10 +172,12 @@ class ImageService:
                 detail="图片不存在"
             )
         
-        # 删除本地文件
-        delete_file(image.path)
+        # 删除本地文件及缩略图
+        await delete_image_files(image.path)
+        hot_cache.invalidate(get_cache_group(image.path))
         
-        # 删除数据库记录
+        # 删除数据库记录，释放已用空间
+        QuotaService.free(db, user.id, image.file_size or 0)
         db.delete(image)
         db.commit()
         
@@ -146,43 +187,63 @@ class ImageService:
         return True
     
     @staticmethod
-    def batch_delete_images(db: Session, user: User, delete_request: BatchDeleteRequest) -> BatchDeleteResponse:
+    async def batch_delete_images(db: Session, user: User, delete_request: BatchDeleteRequest) -> BatchDeleteResponse:
         """批量删除图片"""
         deleted_count = 0
-        failed_count = 0
+        freed = 0
+        username = user.username
+        
+        # 一次查询所有要删除的图片，不存在或不属于当前用户的计为失败
+        images = db.query(Image).filter(
+            Image.id.in_(delete_request.image_ids),
+            Image.user_id == user.id
+        ).all()
         
-        for image_id in delete_request.image_ids:
+        for image in images:
             try:
-                # 查找图片
-                image = db.query(Image).filter(
-                    Image.id == image_id,
-                    Image.user_id == user.id
-                ).first()
+                # 删除本地文件及缩略图
+                await delete_image_files(image.path)
+                hot_cache.invalidate(get_cache_group(image.path))
                 
-                if image:
-                    # 删除本地文件
-                    delete_file(image.path)
-                    
-                    # 删除数据库记录
-                    db.delete(image)
-                    deleted_count += 1
-                else:
-                    failed_count += 1
+                freed += image.file_size or 0
+                db.delete(image)
+                deleted_count += 1
             except Exception as e:
                 print(f"批量删除图片失败: {str(e)}")
-                failed_count += 1
         
-        # 提交事务
+        # 删除数据库记录，一次释放所有已删除图片的已用空间
+        QuotaService.free(db, user.id, freed)
         db.commit()
         
         # 清理空用户目录
-        clear_empty_user_dir(user.username)
+        clear_empty_user_dir(username)
         
         return BatchDeleteResponse(
             deleted=deleted_count,
-            failed=failed_count
+            failed=len(delete_request.image_ids) - deleted_count
+        )
+    
+    @staticmethod
+    def get_optimization_stats(db: Session, user: User) -> OptimizationStatsResponse:
+        """统计原图优化节省的空间"""
+        optimized, bytes_saved = db.query(
+            func.count(Image.id),
+            func.coalesce(func.sum(Image.bytes_saved), 0)
+        ).filter(
+            Image.user_id == user.id,
+            Image.bytes_saved > 0
+        ).one()
+        
+        return OptimizationStatsResponse(
+            optimized=optimized,
+            bytes_saved=bytes_saved
         )
     
+    @staticmethod
+    def get_storage_usage(db: Session, user: User) -> StorageUsageResponse:
+        """查询存储空间使用情况"""
+        return QuotaService.get_usage(db, user)
+    
     @staticmethod
     async def init_chunk_upload(db: Session, user: User, request: ChunkInitRequest) -> ChunkInitResponse:
         """初始化切片上传"""
@@ -199,15 +260,23 @@ class ImageService:
                 detail=f"不支持的文件类型，允许的类型：{', '.join(settings.allowed_file_types_list)}"
             )
         
+        # 按声明的文件大小预留配额，超出配额时不创建上传会话
+        QuotaService.reserve(db, user.id, request.file_size)
+        
         # 初始化切片上传
-        upload_id, temp_path = await init_chunk_upload(
-            username=user.username,
-            filename=request.filename,
-            file_size=request.file_size,
-            total_chunks=request.total_chunks
-        )
+        try:
+            upload_id, temp_path = await init_chunk_upload(
+                username=user.username,
+                filename=request.filename,
+                file_size=request.file_size,
+                total_chunks=request.total_chunks
+            )
+        except Exception:
+            QuotaService.release(db, user.id, request.file_size)
+            db.commit()
+            raise
         
-        # 创建切片上传记录
+        # 创建切片上传记录（会话过期时由 QuotaService.expire_chunk_uploads 释放预留的空间）
         chunk_upload = ChunkUpload(
             upload_id=upload_id,
             user_id=user.id,
@@ -253,8 +322,9 @@ class ImageService:
                 detail=f"无效的切片索引，必须在0-{chunk_upload.total_chunks-1}范围内"
             )
         
-        # 保存切片
-        await save_chunk(upload_id, chunk_index, file)
+        # 保存切片（写盘按用户公平排队），所有切片的总大小不能超过初始化时声明并预留的文件大小
+        async with disk_scheduler.slot(user.id, file.size or 0):
+            await save_chunk(upload_id, chunk_index, file, chunk_upload.file_extension, max_total=chunk_upload.file_size)
         
         # 更新已上传切片数
         chunk_upload.uploaded_chunks = await get_chunk_upload_status(upload_id, chunk_upload.total_chunks)
@@ -295,13 +365,18 @@ class ImageService:
                 detail=f"还有 {chunk_upload.total_chunks - chunk_upload.uploaded_chunks} 个切片未上传"
             )
         
-        # 合并切片，传递nicname参数
-        file_path, url = await merge_chunks(
-            upload_id=upload_id,
-            username=user.username,
-            filename=chunk_upload.filename,
-            total_chunks=chunk_upload.total_chunks,
-        )
+        # 实际大小（切片保存时已限制不超过预留的文件大小）
+        size = get_chunk_upload_size(upload_id)
+        
+        # 合并切片，传递nicname参数（写盘按用户公平排队）
+        async with disk_scheduler.slot(user.id, chunk_upload.file_size):
+            with span("save", UPLOAD_STAGE):
+                file_path, url, probe = await merge_chunks(
+                    upload_id=upload_id,
+                    username=user.username,
+                    filename=chunk_upload.filename,
+                    total_chunks=chunk_upload.total_chunks,
+                )
         
         # 生成不同格式的图片地址
         urls = generate_image_urls(chunk_upload.filename, url)
@@ -309,7 +384,8 @@ class ImageService:
         # 上传到Gitee（如果配置了）
         gitee_url = None
         if settings.GITEE_ACCESS_TOKEN:
-            gitee_url = await upload_to_gitee(file_path, file_path.split('/')[-1])
+            with span("gitee", UPLOAD_STAGE):
+                gitee_url = await upload_to_gitee(file_path, file_path.split('/')[-1])
         
         # 创建图片记录，直接使用从merge_chunks返回的原始nicname
         db_image = Image(
@@ -320,21 +396,30 @@ class ImageService:
             url=urls["url"],
             markdown=urls["markdown"],
             html=urls["html"],
-            gitee_url=gitee_url
+            gitee_url=gitee_url,
+            format=probe["format"],
+            width=probe["width"],
+            height=probe["height"],
+            file_size=size
         )
         
         db.add(db_image)
         
-        # 删除切片上传记录
+        # 删除切片上传记录，预留的空间转为已用空间
+        QuotaService.consume(db, user.id, chunk_upload.file_size, size)
         db.delete(chunk_upload)
         
         # 提交事务
-        db.commit()
-        db.refresh(db_image)
+        with span("db_commit", UPLOAD_STAGE):
+            db.commit()
+            db.refresh(db_image)
         
         # 清理临时文件
         await cleanup_chunk_upload(upload_id)
         
+        # 提交后台处理任务（缩略图、原图优化）
+        ProcessingService.schedule_post_upload(db_image)
+        
         # 转换为响应模型
         image_response = ImageResponse.model_validate(db_image)
         
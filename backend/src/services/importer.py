@@ -0,0 +1,218 @@
+import os
+from datetime import datetime
+from typing import AsyncIterator, List
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from src.models.image import Image
+from src.models.user import User
+from src.models.import_job import ImportJob
+from src.schemas.image import ImportJobRequest, ImportJobResponse
+from src.services.processing import ProcessingService
+from src.services.quota import QuotaService
+from src.utils.archive import iter_archive, ArchiveError
+from src.utils.file import save_content, generate_image_urls, delete_image_files
+from src.utils.gitee import upload_to_gitee
+from src.utils.metrics import UPLOAD_STAGE
+from src.utils.tracing import span
+from src.utils.fair_queue import disk_scheduler
+from src.config import settings
+
+# 导入时每次预留的配额，避免每张图片都单独执行一次预留
+_RESERVE_STEP = 32 * 1024 * 1024
+
+
+def _is_image_entry(name: str) -> bool:
+    """归档条目是否按图片导入：跳过隐藏文件、macOS资源文件和不支持的扩展名"""
+    filename = os.path.basename(name)
+    if not filename or filename.startswith(".") or "__MACOSX/" in name:
+        return False
+    return "." in filename and filename.rsplit(".", 1)[-1].lower() in settings.allowed_file_types_list
+
+
+class _ImportBatch:
+    """一次导入中已保存、尚未插入数据库的图片，以及已预留但未使用的配额"""
+
+    def __init__(self, db: Session, user: User, job: ImportJob):
+        self.db = db
+        self.user = user
+        self.job = job
+        self.images: List[Image] = []
+        self.bytes = 0
+        self.reserved = 0
+
+    def reserve(self, size: int) -> None:
+        """从本次导入预留的配额中扣除，不够时按步长追加预留，超出配额时返回413"""
+        if size > self.reserved:
+            needed = size - self.reserved
+            try:
+                QuotaService.reserve(self.db, self.user.id, max(needed, _RESERVE_STEP))
+                self.reserved += max(needed, _RESERVE_STEP)
+            except HTTPException:
+                # 剩余空间不足一个步长时只预留本图片需要的部分
+                QuotaService.reserve(self.db, self.user.id, needed)
+                self.reserved += needed
+        self.reserved -= size
+
+    def add(self, image: Image) -> None:
+        self.images.append(image)
+        self.bytes += image.file_size
+
+    def flush(self, bytes_read: int) -> None:
+        """批量插入图片记录，预留的空间转为已用空间，同一事务中更新任务进度"""
+        self.db.add_all(self.images)
+        QuotaService.consume(self.db, self.user.id, self.bytes, self.bytes)
+        self.job.imported += len(self.images)
+        self.job.bytes_read = bytes_read
+        with span("db_commit", UPLOAD_STAGE):
+            self.db.flush()
+            # 插入后已有id，移出会话后提交不会让这些对象过期，提交后台任务时无需逐个重新查询
+            for image in self.images:
+                self.db.expunge(image)
+            self.db.commit()
+        # 提交后台处理任务（缩略图、原图优化）
+        for image in self.images:
+            ProcessingService.schedule_post_upload(image)
+        self.images.clear()
+        self.bytes = 0
+
+    async def abort(self) -> None:
+        """导入中断：删除尚未入库的文件，释放预留的配额"""
+        self.db.rollback()
+        for image in self.images:
+            await delete_image_files(image.path)
+        QuotaService.release(self.db, self.user.id, self.bytes + self.reserved)
+        self.db.commit()
+        self.images.clear()
+        self.bytes = self.reserved = 0
+
+    def finish(self) -> None:
+        """释放未使用的预留配额"""
+        QuotaService.release(self.db, self.user.id, self.reserved)
+        self.reserved = 0
+
+
+class ImportService:
+    """从ZIP/TAR归档批量导入图片
+
+    先创建任务，再把归档作为请求体上传；边接收边逐条解析，每个条目走与直传相同的校验和保存流程，
+    图片记录按批插入。导入过程中可以通过任务状态接口查询进度。
+    """
+
+    @staticmethod
+    def create_job(db: Session, user: User, request: ImportJobRequest) -> ImportJobResponse:
+        """创建导入任务"""
+        job = ImportJob(user_id=user.id, filename=request.filename, status="pending")
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return ImportJobResponse.model_validate(job)
+
+    @staticmethod
+    def get_job(db: Session, user: User, job_id: int) -> ImportJobResponse:
+        """查询导入任务状态"""
+        job = db.query(ImportJob).filter(ImportJob.id == job_id, ImportJob.user_id == user.id).first()
+        if not job:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="导入任务不存在"
+            )
+        return ImportJobResponse.model_validate(job)
+
+    @staticmethod
+    async def run_job(db: Session, user: User, job_id: int, stream: AsyncIterator[bytes]) -> ImportJobResponse:
+        """读取请求体中的归档并导入，返回任务的最终状态"""
+        # 每个任务只能上传一次：原子地从pending切换到running
+        result = db.execute(
+            update(ImportJob)
+            .where(ImportJob.id == job_id, ImportJob.user_id == user.id, ImportJob.status == "pending")
+            .values(status="running")
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount == 0:
+            ImportService.get_job(db, user, job_id)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="导入任务已执行"
+            )
+        job = db.get(ImportJob, job_id)
+
+        bytes_read = 0
+
+        async def counted() -> AsyncIterator[bytes]:
+            nonlocal bytes_read
+            async for chunk in stream:
+                bytes_read += len(chunk)
+                yield chunk
+
+        batch = _ImportBatch(db, user, job)
+        try:
+            async for name, content in iter_archive(counted(), settings.MAX_FILE_SIZE):
+                job.entries += 1
+                if not _is_image_entry(name):
+                    job.skipped += 1
+                elif content is None:
+                    print(f"导入图片失败 {name}: 文件大小超过限制")
+                    job.failed += 1
+                else:
+                    try:
+                        batch.add(await ImportService._save_entry(batch, user, os.path.basename(name), content))
+                    except HTTPException as e:
+                        print(f"导入图片失败 {name}: {e.detail}")
+                        job.failed += 1
+                if job.entries % settings.IMPORT_BATCH_SIZE == 0:
+                    batch.flush(bytes_read)
+            batch.flush(bytes_read)
+            batch.finish()
+            job.status = "completed"
+        except Exception as e:
+            # 归档格式错误、客户端断开或数据库写入失败：已入库的批次保留
+            print(f"导入任务 {job_id} 失败: {str(e)}")
+            await batch.abort()
+            job.bytes_read = bytes_read
+            job.status = "failed"
+            job.error = (str(e) if isinstance(e, ArchiveError) else f"导入中断: {type(e).__name__}")[:500]
+        job.finished_at = datetime.now()
+        db.commit()
+        db.refresh(job)
+        return ImportJobResponse.model_validate(job)
+
+    @staticmethod
+    async def _save_entry(batch: _ImportBatch, user: User, filename: str, content: bytes) -> Image:
+        """校验并保存一个条目，返回尚未插入数据库的图片记录"""
+        size = len(content)
+        batch.reserve(size)
+        try:
+            # 写盘按用户公平排队
+            async with disk_scheduler.slot(user.id, size):
+                with span("save", UPLOAD_STAGE):
+                    file_path, url, probe = await save_content(content, filename, user.username, method="import")
+        except Exception:
+            # 保存失败，预留的配额留给后续条目
+            batch.reserved += size
+            raise
+
+        urls = generate_image_urls(filename, url)
+
+        # 上传到Gitee（如果配置了）
+        gitee_url = None
+        if settings.GITEE_ACCESS_TOKEN:
+            with span("gitee", UPLOAD_STAGE):
+                gitee_url = await upload_to_gitee(file_path, file_path.split('/')[-1])
+
+        # 归档中没有昵称，使用唯一的存储文件名
+        return Image(
+            user_id=user.id,
+            filename=filename,
+            nicname=os.path.basename(file_path),
+            path=file_path,
+            url=urls["url"],
+            markdown=urls["markdown"],
+            html=urls["html"],
+            gitee_url=gitee_url,
+            format=probe["format"],
+            width=probe["width"],
+            height=probe["height"],
+            file_size=size
+        )
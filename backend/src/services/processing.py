@@ -0,0 +1,341 @@
+import os
+import asyncio
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from PIL import features
+from sqlalchemy import select, update
+from src.database import SessionLocal
+from src.models.image import Image
+from src.utils.file import get_variant_path, get_transcode_path, delete_file, delete_local_image_files, get_cache_group
+from src.utils.image_process import render_derivatives, transcode_image, optimize_image, convert_animation
+from src.utils.worker import process_pool, optimize_pool
+from src.utils.cache import hot_cache
+from src.services.quota import QuotaService
+from src.storage import get_storage
+from src.config import settings
+
+# 可转码的原图扩展名（GIF可能是动图，WEBP无需转码）
+TRANSCODABLE_EXTENSIONS = {"jpg", "jpeg", "png"}
+
+# 需要按Accept协商的原图扩展名（GIF只返回上传时预先转换好的结果）
+NEGOTIABLE_EXTENSIONS = TRANSCODABLE_EXTENSIONS | {"gif"}
+
+# 各转码格式对应的MIME类型
+TRANSCODE_MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# GIF动图转换的视频格式对应的MIME类型
+VIDEO_MEDIA_TYPES = {"mp4": "video/mp4", "webm": "video/webm"}
+
+# 会影响协商结果的Accept类型
+NEGOTIATION_MEDIA_TYPES = set(TRANSCODE_MEDIA_TYPES.values()) | set(VIDEO_MEDIA_TYPES.values()) | {"video/*"}
+
+# 当前进程中正在转码的文件，避免同一文件重复提交
+_transcoding: set = set()
+
+
+def _add_task(pending: Optional[str], task: str) -> str:
+    """在未完成任务列表（逗号分隔）中加入task"""
+    tasks = pending.split(",") if pending else []
+    if task not in tasks:
+        tasks.append(task)
+    return ",".join(tasks)
+
+
+def _remove_task(pending: Optional[str], task: str) -> Optional[str]:
+    """从未完成任务列表中移除task，列表为空时返回None"""
+    tasks = [t for t in (pending or "").split(",") if t and t != task]
+    return ",".join(tasks) or None
+
+
+@lru_cache(maxsize=None)
+def codec_available(image_format: str) -> bool:
+    """检查Pillow是否支持编码该格式"""
+    return features.check(image_format)
+
+
+def parse_accept(accept: str) -> set:
+    """解析Accept请求头，返回客户端接受（q>0）的MIME类型集合"""
+    accepted = set()
+    for media_range in accept.split(","):
+        parts = [p.strip() for p in media_range.split(";")]
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if parts[0] and quality > 0:
+            accepted.add(parts[0].lower())
+    return accepted
+
+
+class ProcessingService:
+    """上传后的后台图片处理（在进程池中执行，不阻塞上传请求）"""
+
+    @staticmethod
+    def schedule_derivatives(image: Image) -> bool:
+        """提交衍生图片生成任务：响应式缩略图和低清占位图"""
+        variant_paths = {width: get_variant_path(image.path, width) for width in settings.variant_widths_list}
+        image_id = image.id
+        submitted = process_pool.submit(
+            render_derivatives, image.path, variant_paths,
+            callback=lambda result: ProcessingService._save_derivatives(image_id, variant_paths, result),
+            key=image.user_id,
+            on_drop=lambda: ProcessingService.mark_pending(image_id, "derivatives")
+        )
+        if not submitted:
+            # 进程池已饱和：暂时跳过预生成（前端回退到原图），稍后由定时任务重新提交
+            print(f"图片处理队列已满，稍后重新生成缩略图: {image.path}")
+        return submitted
+
+    @staticmethod
+    def _save_derivatives(image_id: int, variant_paths: dict, result: dict) -> None:
+        """记录已生成的缩略图和占位图"""
+        db = SessionLocal()
+        try:
+            image = db.get(Image, image_id)
+            if not image:
+                # 处理期间图片已被删除，清理孤立的缩略图
+                for width in result["variants"]:
+                    delete_file(variant_paths[width])
+                return
+            image.variants = ",".join(str(w) for w in result["variants"]) or None
+            image.placeholder = result["placeholder"]
+            # 文件头中的尺寸未考虑EXIF方向，以解码后的显示尺寸为准
+            image.width = result["width"]
+            image.height = result["height"]
+            image.processing_pending = _remove_task(image.processing_pending, "derivatives")
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def mark_pending(image_id: int, task: str) -> None:
+        """记录被丢弃（队列已满、进程池损坏）的后台任务，由定时任务重新提交
+
+        任务本身执行失败（如文件损坏）时不记录，重试也会同样失败。
+        """
+        db = SessionLocal()
+        try:
+            image = db.get(Image, image_id)
+            if image:
+                image.processing_pending = _add_task(image.processing_pending, task)
+                db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def claim_pending(batch_size: int) -> List[Image]:
+        """取出有未完成任务的图片并清空其记录，同时累加重新提交次数（条件更新，多个worker不会取到同一张图片）
+
+        已达到 PROCESS_RETRY_MAX_ATTEMPTS 的图片不再取出，始终被丢弃的任务不会占满每一批。
+        """
+        db = SessionLocal()
+        try:
+            images = db.scalars(
+                select(Image)
+                .where(
+                    Image.processing_pending.isnot(None),
+                    Image.processing_attempts < settings.PROCESS_RETRY_MAX_ATTEMPTS
+                )
+                .order_by(Image.id)
+                .limit(batch_size)
+            ).all()
+            claimed = []
+            for image in images:
+                result = db.execute(
+                    update(Image)
+                    .where(Image.id == image.id, Image.processing_pending == image.processing_pending)
+                    .values(processing_pending=None, processing_attempts=Image.processing_attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    claimed.append(image)
+            # 移出会话后提交，提交后仍可读取图片属性
+            db.expunge_all()
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    @staticmethod
+    async def reschedule_pending(batch_size: int) -> int:
+        """重新提交之前被丢弃的后台任务，返回处理的图片数"""
+        images = await asyncio.to_thread(ProcessingService.claim_pending, batch_size)
+        for image in images:
+            tasks = image.processing_pending.split(",")
+            if "derivatives" in tasks:
+                ProcessingService.schedule_derivatives(image)
+            if "animation" in tasks:
+                ProcessingService.schedule_animation(image)
+            if "optimize" in tasks:
+                ProcessingService.schedule_optimize(image)
+        return len(images)
+
+    @staticmethod
+    def negotiation_key(accept: str) -> tuple:
+        """提取Accept中影响协商结果的MIME类型，作为响应缓存key的一部分"""
+        return tuple(sorted(parse_accept(accept) & NEGOTIATION_MEDIA_TYPES))
+
+    @staticmethod
+    def negotiate_rendition(file_path: str, accept: str) -> Tuple[Optional[Tuple[str, str]], bool]:
+        """根据Accept请求头选择转码后的文件
+
+        Returns:
+            Tuple: (rendition, settled)。rendition为已缓存的转码文件 (路径, MIME类型)，
+                没有可用转码时为None；尚未转码时会提交后台转码任务，本次请求先返回原图，
+                此时settled为False，表示协商结果之后会变化，不应缓存本次响应。
+        """
+        file_extension = os.path.splitext(file_path)[1].lstrip(".").lower()
+        if file_extension not in NEGOTIABLE_EXTENSIONS:
+            return None, True
+
+        accepted = parse_accept(accept)
+        if file_extension == "gif":
+            return ProcessingService._negotiate_animation(file_path, accepted), True
+
+        for image_format in settings.transcode_formats_list:
+            media_type = TRANSCODE_MEDIA_TYPES.get(image_format)
+            if media_type not in accepted or not codec_available(image_format):
+                continue
+
+            output_path = get_transcode_path(file_path, image_format)
+            if os.path.exists(output_path):
+                return (output_path, media_type), True
+            if os.path.exists(f"{output_path}.skip"):
+                # 该格式转码后更大，尝试下一个格式
+                continue
+
+            ProcessingService.schedule_transcode(file_path, output_path, image_format)
+            return None, False
+
+        return None, True
+
+    @staticmethod
+    def _negotiate_animation(file_path: str, accepted: set) -> Optional[Tuple[str, str]]:
+        """为GIF选择已转换好的视频或动态WebP
+
+        Safari等支持在<img>中播放视频的浏览器会在Accept中声明video/*。
+        """
+        for video_format in settings.animation_video_formats_list:
+            media_type = VIDEO_MEDIA_TYPES.get(video_format)
+            if media_type in accepted or "video/*" in accepted:
+                output_path = get_transcode_path(file_path, video_format)
+                if os.path.exists(output_path):
+                    return output_path, media_type
+
+        if "image/webp" in accepted:
+            output_path = get_transcode_path(file_path, "webp")
+            if os.path.exists(output_path):
+                return output_path, "image/webp"
+
+        return None
+
+    @staticmethod
+    def schedule_transcode(file_path: str, output_path: str, image_format: str) -> bool:
+        """提交转码任务"""
+        if output_path in _transcoding:
+            return False
+
+        # 成功、失败、被丢弃或进程池损坏都要移除标记，之后的请求才能重新提交
+        submitted = process_pool.submit(
+            transcode_image, file_path, output_path, image_format.upper(),
+            callback=lambda _: _transcoding.discard(output_path),
+            on_drop=lambda: _transcoding.discard(output_path),
+            on_error=lambda: _transcoding.discard(output_path)
+        )
+        if submitted:
+            _transcoding.add(output_path)
+        return submitted
+
+    @staticmethod
+    def schedule_optimize(image: Image) -> bool:
+        """提交原图无损优化任务（低优先级）"""
+        if not settings.OPTIMIZE_ORIGINALS:
+            return False
+
+        image_id = image.id
+        file_path = image.path
+        submitted = optimize_pool.submit(
+            optimize_image, file_path,
+            callback=lambda saved: ProcessingService._save_optimization(image_id, file_path, saved),
+            key=image.user_id,
+            on_drop=lambda: ProcessingService.mark_pending(image_id, "optimize")
+        )
+        if not submitted:
+            print(f"原图优化队列已满，稍后重试: {file_path}")
+        return submitted
+
+    @staticmethod
+    def _save_optimization(image_id: int, file_path: str, bytes_saved: int) -> None:
+        """记录原图优化节省的字节数"""
+        db = SessionLocal()
+        try:
+            image = db.get(Image, image_id)
+            if not image:
+                # 优化期间图片已被删除，替换操作可能重新生成了文件
+                delete_local_image_files(file_path)
+                return
+            if bytes_saved:
+                # 原图已被替换，内存缓存中的旧内容失效
+                hot_cache.invalidate(get_cache_group(file_path))
+            # 原图变小，图片大小和用户已用空间相应减少
+            delta = bytes_saved - (image.bytes_saved or 0)
+            if delta > 0 and image.file_size:
+                image.file_size = max(0, image.file_size - delta)
+                QuotaService.free(db, image.user_id, delta)
+            image.bytes_saved = bytes_saved
+            image.processing_pending = _remove_task(image.processing_pending, "optimize")
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def schedule_animation(image: Image) -> bool:
+        """提交GIF转换任务：动态WebP和视频"""
+        video_paths = {
+            video_format: get_transcode_path(image.path, video_format)
+            for video_format in settings.animation_video_formats_list
+            if video_format in VIDEO_MEDIA_TYPES
+        }
+        image_id = image.id
+        file_path = image.path
+        submitted = process_pool.submit(
+            convert_animation, file_path, get_transcode_path(file_path, "webp"), video_paths,
+            settings.ANIMATION_MAX_PIXELS,
+            callback=lambda converted: ProcessingService._save_animation(image_id, file_path, converted),
+            key=image.user_id,
+            on_drop=lambda: ProcessingService.mark_pending(image_id, "animation")
+        )
+        if not submitted:
+            print(f"图片处理队列已满，稍后重新转换GIF: {file_path}")
+        return submitted
+
+    @staticmethod
+    def _save_animation(image_id: int, file_path: str, converted: list) -> None:
+        """记录GIF转换结果"""
+        db = SessionLocal()
+        try:
+            image = db.get(Image, image_id)
+            if not image:
+                delete_local_image_files(file_path)
+                return
+            image.animation_formats = ",".join(converted) or None
+            image.processing_pending = _remove_task(image.processing_pending, "animation")
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def schedule_post_upload(image: Image) -> None:
+        """上传完成后提交所有后台处理任务
+
+        后台处理需要直接读写本机文件，非本地存储后端时跳过，客户端回退到原图。
+        """
+        if get_storage().local_path(image.path) is None:
+            return
+        ProcessingService.schedule_derivatives(image)
+        if image.format == "gif":
+            ProcessingService.schedule_animation(image)
+        ProcessingService.schedule_optimize(image)
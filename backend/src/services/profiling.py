@@ -0,0 +1,205 @@
+import os
+import re
+import time
+import uuid
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import HTTPException, status
+from jose import JWTError, jwt
+from src.models.user import User
+from src.schemas.profiling import (
+    ProfileTokenResponse, WorkerProfileResponse, ProfileFileResponse, MemoryStat, MemorySnapshotResponse
+)
+from src.utils.auth import create_access_token
+from src.utils.profiling import SamplingProfiler, memory_tracker, format_statistics
+from src.config import settings
+
+# 触发单个请求CPU分析的请求头
+PROFILE_HEADER = "X-Profile"
+
+_PROFILE_ID_PATTERN = re.compile(r"^(request|worker)-\d+-[0-9a-f]{12}$")
+
+# 当前worker进行中的CPU分析（同一时间只允许一个，采样线程会采集所有线程）
+_active: Optional[SamplingProfiler] = None
+
+
+def _new_profile(kind: str, max_duration: float) -> SamplingProfiler:
+    profile_id = f"{kind}-{int(time.time())}-{uuid.uuid4().hex[:12]}"
+    return SamplingProfiler(
+        profile_id,
+        os.path.join(settings.PROFILING_FOLDER, f"{profile_id}.json"),
+        settings.PROFILING_SAMPLE_INTERVAL,
+        max_duration,
+    )
+
+
+def _profile_path(profile_id: str) -> str:
+    if not _PROFILE_ID_PATTERN.match(profile_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="分析结果不存在")
+    path = os.path.join(settings.PROFILING_FOLDER, f"{profile_id}.json")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="分析结果不存在或尚未写入")
+    return path
+
+
+class ProfilingService:
+    """线上worker的CPU和内存分析（仅管理员，PROFILING_ENABLED 关闭时不产生任何开销）"""
+
+    @staticmethod
+    def check_enabled() -> None:
+        if not settings.PROFILING_ENABLED:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="性能分析未开启")
+
+    @staticmethod
+    def create_request_token(user: User) -> ProfileTokenResponse:
+        """签发短期令牌：请求携带 X-Profile 头时对该请求做CPU采样
+
+        令牌不含sub，不能当作登录令牌使用；校验只需验签，不查询数据库，各worker通用。
+        """
+        ProfilingService.check_enabled()
+        token = create_access_token(
+            {"scope": "profile", "admin": user.username},
+            timedelta(seconds=settings.PROFILING_TOKEN_EXPIRE)
+        )
+        return ProfileTokenResponse(token=token, header=PROFILE_HEADER, expires_in=settings.PROFILING_TOKEN_EXPIRE)
+
+    @staticmethod
+    def start_request_profile(token: str) -> Optional[SamplingProfiler]:
+        """校验令牌并开始对当前请求采样，令牌无效或已有分析进行中时返回None"""
+        global _active
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=["HS256"])
+        except JWTError:
+            return None
+        if payload.get("scope") != "profile" or (_active is not None and _active.running):
+            return None
+        _active = _new_profile("request", settings.PROFILING_MAX_DURATION)
+        _active.start()
+        return _active
+
+    @staticmethod
+    def start_worker_profile(duration: float) -> WorkerProfileResponse:
+        """开始对当前worker采样，到达duration秒后自动停止并保存"""
+        global _active
+        ProfilingService.check_enabled()
+        if _active is not None and _active.running:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"worker {os.getpid()} 已有进行中的CPU分析: {_active.name}"
+            )
+        duration = max(1.0, min(duration, settings.PROFILING_MAX_DURATION))
+        _active = _new_profile("worker", duration)
+        _active.start()
+        return WorkerProfileResponse(profile_id=_active.name, pid=os.getpid(), duration=duration)
+
+    @staticmethod
+    def stop_worker_profile() -> WorkerProfileResponse:
+        """提前停止当前worker的CPU分析（需落到开始分析的同一worker）"""
+        ProfilingService.check_enabled()
+        profiler = _active
+        if profiler is None or not profiler.running or not profiler.name.startswith("worker-"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"worker {os.getpid()} 没有进行中的CPU分析"
+            )
+        profiler.stop()
+        return WorkerProfileResponse(profile_id=profiler.name, pid=os.getpid(), duration=profiler.duration)
+
+    @staticmethod
+    def list_profiles() -> List[ProfileFileResponse]:
+        """已保存的CPU分析结果（所有worker共用同一目录）"""
+        ProfilingService.check_enabled()
+        if not os.path.isdir(settings.PROFILING_FOLDER):
+            return []
+        profiles = []
+        with os.scandir(settings.PROFILING_FOLDER) as entries:
+            for entry in entries:
+                profile_id, ext = os.path.splitext(entry.name)
+                if ext == ".json" and _PROFILE_ID_PATTERN.match(profile_id):
+                    stat_result = entry.stat()
+                    profiles.append(ProfileFileResponse(
+                        profile_id=profile_id,
+                        size=stat_result.st_size,
+                        created_at=datetime.fromtimestamp(stat_result.st_mtime)
+                    ))
+        return sorted(profiles, key=lambda profile: profile.created_at, reverse=True)
+
+    @staticmethod
+    def get_profile_path(profile_id: str) -> str:
+        ProfilingService.check_enabled()
+        return _profile_path(profile_id)
+
+    @staticmethod
+    def delete_profile(profile_id: str) -> None:
+        ProfilingService.check_enabled()
+        os.remove(_profile_path(profile_id))
+
+    @staticmethod
+    def start_memory_tracing(frames: int) -> None:
+        """开始跟踪内存分配（跟踪期间分配内存有额外开销，分析完成后应停止）"""
+        ProfilingService.check_enabled()
+        memory_tracker.start(max(1, min(frames, 50)))
+
+    @staticmethod
+    def stop_memory_tracing() -> None:
+        ProfilingService.check_enabled()
+        memory_tracker.stop()
+
+    @staticmethod
+    def _require_tracing() -> None:
+        ProfilingService.check_enabled()
+        if not memory_tracker.tracing:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"worker {os.getpid()} 未开始跟踪内存分配"
+            )
+
+    @staticmethod
+    def _snapshot_response(snapshot_id: Optional[int], top: List[dict]) -> MemorySnapshotResponse:
+        current, peak = tracemalloc.get_traced_memory()
+        return MemorySnapshotResponse(
+            snapshot_id=snapshot_id,
+            pid=os.getpid(),
+            traced_current=current,
+            traced_peak=peak,
+            snapshot_ids=memory_tracker.snapshot_ids(),
+            top=[MemoryStat(**stat) for stat in top]
+        )
+
+    @staticmethod
+    def take_memory_snapshot(limit: int) -> MemorySnapshotResponse:
+        """保存内存快照，返回分配最多的代码行"""
+        ProfilingService._require_tracing()
+        snapshot_id, snapshot = memory_tracker.take_snapshot()
+        return ProfilingService._snapshot_response(
+            snapshot_id, format_statistics(snapshot.statistics("lineno"), limit)
+        )
+
+    @staticmethod
+    def get_memory_top(limit: int, snapshot_id: Optional[int] = None) -> MemorySnapshotResponse:
+        """分配最多的代码行：指定快照ID时读取已保存的快照，否则临时采集一次（不保存）"""
+        ProfilingService._require_tracing()
+        if snapshot_id is None:
+            snapshot = memory_tracker.current_snapshot()
+        else:
+            snapshot = ProfilingService._get_snapshot(snapshot_id)
+        return ProfilingService._snapshot_response(snapshot_id, format_statistics(snapshot.statistics("lineno"), limit))
+
+    @staticmethod
+    def diff_memory_snapshots(base_id: int, target_id: int, limit: int) -> MemorySnapshotResponse:
+        """两个快照之间按代码行统计的内存增长"""
+        ProfilingService._require_tracing()
+        base = ProfilingService._get_snapshot(base_id)
+        target = ProfilingService._get_snapshot(target_id)
+        return ProfilingService._snapshot_response(target_id, format_statistics(target.compare_to(base, "lineno"), limit))
+
+    @staticmethod
+    def _get_snapshot(snapshot_id: int):
+        snapshot = memory_tracker.get_snapshot(snapshot_id)
+        if snapshot is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"worker {os.getpid()} 中不存在快照 {snapshot_id}"
+            )
+        return snapshot
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, case, or_, func
+from sqlalchemy.orm import Session
+from src.database import SessionLocal
+from src.models.user import User
+from src.models.image import ChunkUpload
+from src.schemas.image import StorageUsageResponse
+from src.config import settings
+
+
+def _quota_expr():
+    """用户的配额：未单独设置时使用 STORAGE_QUOTA_BYTES"""
+    return func.coalesce(User.storage_quota, settings.STORAGE_QUOTA_BYTES)
+
+
+def _subtract(column, size: int):
+    """计数减少，不低于0"""
+    return case((column > size, column - size), else_=0)
+
+
+class QuotaService:
+    """用户存储配额
+
+    已用空间（storage_used）和预留空间（storage_reserved）在上传、删除时增量更新，不需要遍历用户目录；
+    写入文件之前先用带条件的UPDATE原子地预留空间，多个worker并发上传也不会超出配额。
+    预留和扣减只执行UPDATE，由调用方在同一事务中提交（预留需要立即提交，其他worker才能看到）。
+    """
+
+    @staticmethod
+    def get_quota(user: User) -> Optional[int]:
+        """用户的配额字节数，None表示不限制"""
+        quota = user.storage_quota if user.storage_quota is not None else settings.STORAGE_QUOTA_BYTES
+        return quota if quota > 0 else None
+
+    @staticmethod
+    def reserve(db: Session, user_id: int, size: int) -> None:
+        """预留空间并提交，超出配额时返回413"""
+        result = db.execute(
+            update(User)
+            .where(
+                User.id == user_id,
+                or_(_quota_expr() <= 0, User.storage_used + User.storage_reserved + size <= _quota_expr())
+            )
+            .values(storage_reserved=User.storage_reserved + size)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        if result.rowcount == 0:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="存储空间不足"
+            )
+
+    @staticmethod
+    def release(db: Session, user_id: int, size: int) -> None:
+        """释放预留的空间（上传失败或切片会话过期）"""
+        db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(storage_reserved=_subtract(User.storage_reserved, size))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def consume(db: Session, user_id: int, reserved: int, size: int) -> None:
+        """上传完成：预留的空间转为实际占用的空间"""
+        db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(
+                storage_reserved=_subtract(User.storage_reserved, reserved),
+                storage_used=User.storage_used + size
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def free(db: Session, user_id: int, size: int) -> None:
+        """删除图片或原图优化变小后减少已用空间"""
+        if not size:
+            return
+        db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(storage_used=_subtract(User.storage_used, size))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def get_usage(db: Session, user: User) -> StorageUsageResponse:
+        """查询存储空间使用情况"""
+        db.refresh(user)
+        return StorageUsageResponse(
+            used=user.storage_used,
+            reserved=user.storage_reserved,
+            quota=QuotaService.get_quota(user)
+        )
+
+    @staticmethod
+    def expire_chunk_uploads() -> int:
+        """释放过期切片上传会话预留的空间并删除会话记录（临时文件由 cleanup_expired_chunks 清理）"""
+        cutoff = datetime.now() - timedelta(seconds=settings.CHUNK_EXPIRE_TIME)
+        db = SessionLocal()
+        try:
+            sessions = db.scalars(select(ChunkUpload).where(ChunkUpload.created_at < cutoff)).all()
+            for chunk_upload in sessions:
+                QuotaService.release(db, chunk_upload.user_id, chunk_upload.file_size)
+                db.delete(chunk_upload)
+            db.commit()
+            return len(sessions)
+        finally:
+            db.close()
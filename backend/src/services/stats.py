@@ -0,0 +1,248 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, bindparam, or_, func
+from sqlalchemy.orm import Session
+from src.database import SessionLocal
+from src.models.image import Image
+from src.models.token import Token
+from src.models.stats import ImageStat, TokenStat
+from src.schemas.image import ImageResponse
+from src.schemas.stats import TopImageResponse, TrafficPoint, TokenStatsResponse
+from src.utils.stats import image_hits, token_hits
+from src.utils.file import generate_image_url, image_stem
+from src.config import settings
+
+# 缓存分组 (用户名, 主文件名) -> (图片ID, 用户ID)，避免每次写入都按URL查询
+_image_ids: Dict[Tuple[str, str], Tuple[int, int]] = {}
+_IMAGE_ID_CACHE_SIZE = 100000
+
+# 每次按URL前缀查询的分组数
+_RESOLVE_BATCH_SIZE = 200
+
+# 上次清理过期小时统计的时间
+_last_prune = 0.0
+
+PERIODS = ("hour", "day")
+
+# 按天统计最多查询的天数
+MAX_DAILY_DAYS = 5 * 366
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _day_bucket(bucket: datetime) -> datetime:
+    return bucket.replace(hour=0)
+
+
+def _upsert(db: Session, table, rows: List[dict], key_columns: List[str], counter_columns: List[str]) -> None:
+    """批量写入统计行，已存在的时间桶累加计数"""
+    if not rows:
+        return
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        statement = statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in counter_columns}
+        )
+    else:
+        # 本地开发和测试使用的SQLite
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={column: table.c[column] + statement.excluded[column] for column in counter_columns}
+        )
+    db.execute(statement, rows)
+
+
+class StatsService:
+    """访问统计：内存计数按批写入（write-behind），查询只读取按小时/按天汇总的统计表"""
+
+    @staticmethod
+    def flush() -> int:
+        """把内存中累计的图片访问和Token调用写入数据库，返回写入的统计行数"""
+        drained_images = image_hits.drain()
+        drained_tokens = token_hits.drain()
+        if not drained_images and not drained_tokens:
+            return 0
+
+        db = SessionLocal()
+        try:
+            written = StatsService._flush_images(db, drained_images)
+            written += StatsService._flush_tokens(db, drained_tokens)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.close()
+            # 放回计数，下次一起写入
+            image_hits.restore(drained_images)
+            token_hits.restore(drained_tokens)
+            print(f"写入访问统计失败: {str(e)}")
+            return 0
+
+        try:
+            StatsService._prune_hourly(db)
+        except Exception as e:
+            db.rollback()
+            print(f"清理过期小时统计失败: {str(e)}")
+        finally:
+            db.close()
+        return written
+
+    @staticmethod
+    def _resolve_images(db: Session, groups: set) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """按原图URL前缀查找分组对应的图片，已删除的图片不会出现在结果中"""
+        missing = [group for group in groups if group not in _image_ids]
+        if len(_image_ids) + len(missing) > _IMAGE_ID_CACHE_SIZE:
+            _image_ids.clear()
+            missing = list(groups)
+
+        for i in range(0, len(missing), _RESOLVE_BATCH_SIZE):
+            batch = missing[i:i + _RESOLVE_BATCH_SIZE]
+            conditions = [
+                Image.url.like(_escape_like(generate_image_url(username, f"{stem}.")) + "%", escape="\\")
+                for username, stem in batch
+            ]
+            for image_id, user_id, url in db.execute(select(Image.id, Image.user_id, Image.url).where(or_(*conditions))):
+                base_url, filename = url.rsplit("/images/", 1)
+                _image_ids[(base_url.rsplit("/", 1)[1], image_stem(filename))] = (image_id, user_id)
+
+        return {group: _image_ids[group] for group in groups if group in _image_ids}
+
+    @staticmethod
+    def _flush_images(db: Session, drained: dict) -> int:
+        if not drained:
+            return 0
+        image_ids = StatsService._resolve_images(db, {group for group, _ in drained})
+
+        totals: Dict[int, list] = {}  # 图片ID -> [次数, 最近访问时间]
+        buckets: Dict[Tuple[int, str, datetime], list] = {}  # (图片ID, 粒度, 时间桶) -> [用户ID, 次数, 字节数]
+        for (group, hour), (hits, nbytes, last_seen) in drained.items():
+            if group not in image_ids:
+                continue
+            image_id, user_id = image_ids[group]
+            total = totals.setdefault(image_id, [0, last_seen])
+            total[0] += hits
+            total[1] = max(total[1], last_seen)
+            for period, bucket in (("hour", hour), ("day", _day_bucket(hour))):
+                entry = buckets.setdefault((image_id, period, bucket), [user_id, 0, 0])
+                entry[1] += hits
+                entry[2] += nbytes
+
+        if totals:
+            images = Image.__table__
+            db.execute(
+                update(images)
+                .where(images.c.id == bindparam("image_id"))
+                .values(access_count=images.c.access_count + bindparam("hits"), last_accessed_at=bindparam("accessed_at")),
+                [{"image_id": image_id, "hits": hits, "accessed_at": last_seen} for image_id, (hits, last_seen) in totals.items()]
+            )
+
+        rows = [
+            {"image_id": image_id, "user_id": user_id, "period": period, "bucket": bucket, "hits": hits, "bytes": nbytes}
+            for (image_id, period, bucket), (user_id, hits, nbytes) in buckets.items()
+        ]
+        _upsert(db, ImageStat.__table__, rows, ["image_id", "period", "bucket"], ["hits", "bytes"])
+        return len(rows)
+
+    @staticmethod
+    def _flush_tokens(db: Session, drained: dict) -> int:
+        buckets: Dict[Tuple[int, str, datetime], list] = {}  # (Token ID, 粒度, 时间桶) -> [用户ID, 次数]
+        for ((token_id, user_id), hour), (hits, _, _) in drained.items():
+            for period, bucket in (("hour", hour), ("day", _day_bucket(hour))):
+                entry = buckets.setdefault((token_id, period, bucket), [user_id, 0])
+                entry[1] += hits
+
+        rows = [
+            {"token_id": token_id, "user_id": user_id, "period": period, "bucket": bucket, "hits": hits}
+            for (token_id, period, bucket), (user_id, hits) in buckets.items()
+        ]
+        _upsert(db, TokenStat.__table__, rows, ["token_id", "period", "bucket"], ["hits"])
+        return len(rows)
+
+    @staticmethod
+    def _prune_hourly(db: Session) -> None:
+        """删除超过保留期的小时统计（每小时最多执行一次），按天统计永久保留"""
+        global _last_prune
+        if time.monotonic() - _last_prune < 3600:
+            return
+        _last_prune = time.monotonic()
+        cutoff = datetime.now() - timedelta(days=settings.STATS_HOURLY_RETENTION_DAYS)
+        for model in (ImageStat, TokenStat):
+            db.query(model).filter(model.period == "hour", model.bucket < cutoff).delete(synchronize_session=False)
+        db.commit()
+
+    @staticmethod
+    def _since(period: str, days: int) -> datetime:
+        if period not in PERIODS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="统计粒度只能是 hour 或 day"
+            )
+        if days < 1:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="统计天数必须大于0"
+            )
+        # 小时统计只保留 STATS_HOURLY_RETENTION_DAYS 天；上限同时避免日期计算溢出
+        max_days = settings.STATS_HOURLY_RETENTION_DAYS if period == "hour" else MAX_DAILY_DAYS
+        if days > max_days:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"统计天数不能超过{max_days}"
+            )
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return today - timedelta(days=days - 1)
+
+    @staticmethod
+    def get_top_images(db: Session, user_id: int, days: int = 7, limit: int = 10) -> List[TopImageResponse]:
+        """统计周期内访问次数最多的图片（读取按天汇总）"""
+        since = StatsService._since("day", days)
+        hits = func.sum(ImageStat.hits)
+        top = db.execute(
+            select(ImageStat.image_id, hits, func.sum(ImageStat.bytes))
+            .where(ImageStat.user_id == user_id, ImageStat.period == "day", ImageStat.bucket >= since)
+            .group_by(ImageStat.image_id)
+            .order_by(hits.desc())
+            .limit(limit)
+        ).all()
+
+        images = {
+            image.id: image
+            for image in db.query(Image).filter(Image.user_id == user_id, Image.id.in_([row[0] for row in top])).all()
+        }
+        return [
+            TopImageResponse(image=ImageResponse.model_validate(images[image_id]), hits=image_hits_sum, bytes=bytes_sum or 0)
+            for image_id, image_hits_sum, bytes_sum in top
+            if image_id in images  # 已删除的图片不再展示
+        ]
+
+    @staticmethod
+    def get_traffic(db: Session, user_id: int, granularity: str = "day", days: int = 7) -> List[TrafficPoint]:
+        """用户所有图片的访问流量时间序列"""
+        since = StatsService._since(granularity, days)
+        rows = db.execute(
+            select(ImageStat.bucket, func.sum(ImageStat.hits), func.sum(ImageStat.bytes))
+            .where(ImageStat.user_id == user_id, ImageStat.period == granularity, ImageStat.bucket >= since)
+            .group_by(ImageStat.bucket)
+            .order_by(ImageStat.bucket)
+        ).all()
+        return [TrafficPoint(bucket=bucket, hits=hits, bytes=nbytes or 0) for bucket, hits, nbytes in rows]
+
+    @staticmethod
+    def get_token_stats(db: Session, user_id: int, days: int = 30) -> List[TokenStatsResponse]:
+        """统计周期内各外部Token的调用次数"""
+        since = StatsService._since("day", days)
+        hits = func.sum(TokenStat.hits)
+        rows = db.execute(
+            select(TokenStat.token_id, Token.name, hits)
+            .outerjoin(Token, Token.id == TokenStat.token_id)
+            .where(TokenStat.user_id == user_id, TokenStat.period == "day", TokenStat.bucket >= since)
+            .group_by(TokenStat.token_id, Token.name)
+            .order_by(hits.desc())
+        ).all()
+        return [TokenStatsResponse(token_id=token_id, name=name, hits=token_hits_sum) for token_id, name, token_hits_sum in rows]
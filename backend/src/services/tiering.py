@@ -0,0 +1,166 @@
+import os
+import fcntl
+import shutil
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import select, or_, and_
+from src.database import SessionLocal
+from src.models.image import Image
+from src.utils.file import (
+    generate_image_url, get_image_path, get_cold_path, resolve_image_path,
+    split_image_path, is_cold_path, delete_file, prune_empty_dirs
+)
+from src.storage import get_storage
+from src.config import settings
+
+# 同时进行的提升任务上限，避免批量扫描冷图片时把冷存储整体搬回热存储
+MAX_CONCURRENT_PROMOTIONS = 4
+
+# 当前进程中正在提升回热存储的文件
+_promoting: set = set()
+
+# 保存后台任务引用，防止被垃圾回收
+_tasks: set = set()
+
+
+def _copy(source: str, target: str) -> None:
+    """跨磁盘复制文件：先写临时文件再原子替换，访问方不会读到不完整的文件"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_path = f"{target}.tmp"
+    shutil.copy2(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class TieringService:
+    """冷热分层存储
+
+    根据 StatsService 批量写入的最近访问时间，长时间未访问的原图移到冷存储目录（可挂载到更便宜的磁盘），再次被访问时提升回热存储。
+    URL保持不变，访问路由在热存储找不到时回退到冷存储。衍生文件较小，始终留在热存储。
+    """
+
+    @staticmethod
+    def enabled() -> bool:
+        """冷热分层只适用于本地存储后端"""
+        return bool(settings.COLD_STORAGE_FOLDER) and get_storage().is_local
+
+    @staticmethod
+    def demote_cold_images(batch_size: int) -> int:
+        """把超过 COLD_AFTER_DAYS 天未访问的原图移到冷存储，返回移动的图片数
+
+        多个worker同时运行时只有拿到文件锁的进程执行。
+        """
+        if not TieringService.enabled():
+            return 0
+
+        os.makedirs(settings.COLD_STORAGE_FOLDER, exist_ok=True)
+        with open(os.path.join(settings.COLD_STORAGE_FOLDER, ".tiering.lock"), "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            cutoff = datetime.now() - timedelta(days=settings.COLD_AFTER_DAYS)
+            demoted = 0
+            last_id = 0
+            db = SessionLocal()
+            try:
+                while demoted < batch_size:
+                    images = db.scalars(
+                        select(Image)
+                        .where(
+                            Image.id > last_id,
+                            Image.storage_tier == "hot",
+                            or_(
+                                Image.last_accessed_at < cutoff,
+                                and_(Image.last_accessed_at.is_(None), Image.created_at < cutoff)
+                            )
+                        )
+                        .order_by(Image.id)
+                        .limit(batch_size)
+                    ).all()
+                    if not images:
+                        break
+                    for image in images:
+                        if demoted >= batch_size:
+                            break
+                        if TieringService._demote(db, image):
+                            demoted += 1
+                    last_id = images[-1].id
+            finally:
+                db.close()
+            return demoted
+
+    @staticmethod
+    def _demote(db, image: Image) -> bool:
+        """移动单张原图到冷存储：先复制并更新数据库，再删除热存储中的文件"""
+        source_path = image.path if os.path.isfile(image.path) else resolve_image_path(*split_image_path(image.path))
+        if not source_path:
+            print(f"文件不存在，跳过: {image.path}")
+            return False
+
+        if is_cold_path(source_path):
+            # 数据库记录未同步（例如上次移动中断）
+            image.path, image.storage_tier = source_path, "cold"
+            db.commit()
+            return False
+
+        target_path = get_cold_path(source_path)
+        try:
+            _copy(source_path, target_path)
+            image.path, image.storage_tier = target_path, "cold"
+            db.commit()
+        except Exception as e:
+            # 复制失败或图片已被删除
+            db.rollback()
+            delete_file(target_path)
+            print(f"移动到冷存储失败 {source_path}: {str(e)}")
+            return False
+
+        delete_file(source_path)
+        prune_empty_dirs(source_path)
+        return True
+
+    @staticmethod
+    def promote(cold_path: str) -> bool:
+        """把被访问的冷图片移回热存储"""
+        username, filename = split_image_path(cold_path)
+        target_path = get_image_path(username, filename)
+        db = SessionLocal()
+        try:
+            image = db.scalars(select(Image).where(Image.url == generate_image_url(username, filename))).first()
+            if not image or not os.path.isfile(cold_path):
+                return False
+            _copy(cold_path, target_path)
+            image.path, image.storage_tier = target_path, "hot"
+            # 刷新访问时间，避免下次分层时又被移走
+            image.last_accessed_at = datetime.now()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            delete_file(target_path)
+            print(f"移回热存储失败 {cold_path}: {str(e)}")
+            return False
+        finally:
+            db.close()
+
+        delete_file(cold_path)
+        prune_empty_dirs(cold_path)
+        return True
+
+    @staticmethod
+    def schedule_promotion(cold_path: str) -> bool:
+        """在后台线程中把冷图片移回热存储，本次请求直接从冷存储返回"""
+        if cold_path in _promoting or len(_promoting) >= MAX_CONCURRENT_PROMOTIONS:
+            return False
+        _promoting.add(cold_path)
+        task = asyncio.get_running_loop().create_task(TieringService._run_promotion(cold_path))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+        return True
+
+    @staticmethod
+    async def _run_promotion(cold_path: str) -> None:
+        try:
+            await asyncio.to_thread(TieringService.promote, cold_path)
+        finally:
+            _promoting.discard(cold_path)
@@ -4,6 +4,7 @@ from src.models.token import Token
 from src.models.user import User
 from src.schemas.token import TokenCreate, TokenResponse, TokenCreateResponse, TokenListResponse
 from src.utils.auth import generate_external_token, get_password_hash
+from src.utils.stats import token_hits
 
 class TokenService:
     @staticmethod
@@ -85,6 +86,8 @@ class TokenService:
                 # 查找关联用户
                 user = db.query(User).filter(User.id == db_token.user_id).first()
                 if user:
+                    # 记录Token调用次数（内存累计，定期批量写入）
+                    token_hits.record((db_token.id, user.id))
                     return user
         
         raise HTTPException(
@@ -0,0 +1,37 @@
+from typing import Optional
+from src.config import settings
+from .base import StorageBackend
+from .local import LocalStorage
+from .packed import PackedStorage
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """获取当前配置的存储后端（进程内单例）"""
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "s3":
+            from .s3 import S3Storage
+            _storage = S3Storage(
+                bucket=settings.S3_BUCKET,
+                endpoint_url=settings.S3_ENDPOINT_URL or None,
+                region=settings.S3_REGION or None,
+                access_key_id=settings.S3_ACCESS_KEY_ID or None,
+                secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+                key_prefix=settings.S3_KEY_PREFIX,
+                part_size=settings.S3_PART_SIZE,
+                max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS
+            )
+        elif settings.STORAGE_BACKEND == "packed":
+            _storage = PackedStorage(
+                root=settings.PACKED_FOLDER,
+                max_blob_size=settings.PACKED_MAX_BLOB_SIZE,
+                segment_size=settings.PACKED_SEGMENT_SIZE
+            )
+        else:
+            _storage = LocalStorage()
+    return _storage
+
+
+__all__ = ["StorageBackend", "LocalStorage", "PackedStorage", "get_storage"]
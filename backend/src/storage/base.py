@@ -0,0 +1,41 @@
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+
+class StorageBackend(ABC):
+    """文件存储后端接口
+
+    key为存储路径（即 Image.path，如 static/{username}/images/xx/yy/{filename}），
+    与存储布局、访问URL的对应关系由 src.utils.file 负责。
+    """
+
+    # 是否为本机文件系统（决定能否直接交给Pillow/FileResponse处理）
+    is_local: bool = False
+
+    @abstractmethod
+    async def put_stream(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        """流式写入文件，返回写入的字节数；失败时不留下不完整的文件"""
+
+    @abstractmethod
+    def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """流式读取文件的 [start, end] 字节区间（end包含在内，为None时读到结尾）"""
+
+    @abstractmethod
+    async def delete(self, key: str) -> bool:
+        """删除文件，文件不存在时返回False"""
+
+    @abstractmethod
+    async def size(self, key: str) -> Optional[int]:
+        """获取文件大小，文件不存在时返回None"""
+
+    async def exists(self, key: str) -> bool:
+        """检查文件是否存在"""
+        return await self.size(key) is not None
+
+    def local_path(self, key: str) -> Optional[str]:
+        """文件在本机的路径，非本地存储返回None"""
+        return None
+
+    async def read(self, key: str) -> bytes:
+        """读取整个文件（仅用于小文件）"""
+        return b"".join([chunk async for chunk in self.get_range(key)])
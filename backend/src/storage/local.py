@@ -0,0 +1,60 @@
+import os
+from typing import AsyncIterator, Optional
+import aiofiles
+from .base import StorageBackend
+
+# 流式读取的块大小
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorage(StorageBackend):
+    """本机文件系统存储，key即相对于工作目录的文件路径"""
+
+    is_local = True
+
+    async def put_stream(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        written = 0
+        try:
+            async with aiofiles.open(key, "wb") as f:
+                async for chunk in stream:
+                    await f.write(chunk)
+                    written += len(chunk)
+        except BaseException:
+            # 清理写了一半的文件
+            if os.path.exists(key):
+                os.remove(key)
+            raise
+        return written
+
+    async def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        remaining = None if end is None else end - start + 1
+        async with aiofiles.open(key, "rb") as f:
+            await f.seek(start)
+            while remaining is None or remaining > 0:
+                read_size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await f.read(read_size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    # 本地文件的删除和stat很快，直接在事件循环中执行
+    async def delete(self, key: str) -> bool:
+        if os.path.exists(key):
+            os.remove(key)
+            return True
+        return False
+
+    async def size(self, key: str) -> Optional[int]:
+        try:
+            return os.stat(key).st_size
+        except OSError:
+            return None
+
+    async def exists(self, key: str) -> bool:
+        return os.path.isfile(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return key
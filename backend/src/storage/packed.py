@@ -0,0 +1,383 @@
+import os
+import time
+import fcntl
+import struct
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+from .base import StorageBackend
+from .local import LocalStorage
+
+# 段文件中每条记录的头部：魔数、key长度、数据长度，之后依次是key和数据
+_RECORD_HEADER = struct.Struct(">4sHI")
+_RECORD_MAGIC = b"IMGB"
+
+# 索引日志条目：条目长度（不含自身），之后是操作、段号、数据偏移、数据长度和key
+_ENTRY_LENGTH = struct.Struct(">H")
+_ENTRY_BODY = struct.Struct(">BIQI")
+
+OP_PUT = 1
+OP_DELETE = 2
+OP_DROP_SEGMENT = 3
+
+# 读取时检查其他worker写入的索引变更的最小间隔（秒）
+REFRESH_INTERVAL = 1.0
+
+
+class PackedStorage(StorageBackend):
+    """小图打包存储：小文件追加写入大的段文件，大文件仍按原路径存为本机文件
+
+    每张小图只占段文件中的一段 (段号, 偏移, 长度)，不再占用独立的inode和目录项，
+    读取时一次pread即可返回。索引是追加写的操作日志，所有worker进程各自在内存中维护索引，
+    读取时按需读取日志新增的部分；写入通过文件锁串行化。
+    删除只在日志中记录，段文件的空间由后台压缩回收：把垃圾比例高的段中仍有效的数据
+    复制到当前段后删除整个段文件，同时把索引日志重写为只包含有效条目的新版本。
+    """
+
+    def __init__(self, root: str, max_blob_size: int, segment_size: int, local: Optional[LocalStorage] = None):
+        self.root = root
+        self.max_blob_size = max_blob_size
+        self.segment_size = segment_size
+        self.local = local or LocalStorage()
+        self.segment_dir = os.path.join(root, "segments")
+        os.makedirs(self.segment_dir, exist_ok=True)
+
+        self.index: Dict[str, Tuple[int, int, int]] = {}  # key -> (段号, 数据偏移, 数据长度)
+        self.live_bytes: Dict[int, int] = {}  # 段号 -> 有效数据字节数
+        self._generation = -1
+        self._log_position = 0  # 已读取的索引日志字节数
+        self._log_entries = 0  # 当前索引日志中的条目数
+        self._last_refresh = 0.0
+        self._fds: Dict[int, list] = {}  # 段号 -> [读取用的文件描述符, 正在使用的读取数]
+
+        self._mutex = threading.RLock()  # 保护内存中的索引
+        self._write_lock = threading.Lock()  # 同一进程内的写入互斥（flock对同一描述符不互斥）
+        self._lock_fd = os.open(os.path.join(root, "LOCK"), os.O_RDWR | os.O_CREAT, 0o644)
+        self._refresh(force=True)
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.segment_dir, f"{segment:08d}.seg")
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.root, f"index.{generation}.log")
+
+    def _list_segments(self) -> list:
+        return sorted(int(name[:-4]) for name in os.listdir(self.segment_dir) if name.endswith(".seg"))
+
+    def _read_generation(self) -> int:
+        try:
+            with open(os.path.join(self.root, "CURRENT")) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _refresh(self, force: bool = False) -> None:
+        """读取其他进程追加的索引条目；索引日志被重写后重新加载"""
+        with self._mutex:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < REFRESH_INTERVAL:
+                return
+            self._last_refresh = now
+
+            for _ in range(3):
+                generation = self._read_generation()
+                if generation != self._generation:
+                    self._reset(generation)
+                try:
+                    with open(self._log_path(generation), "rb") as f:
+                        f.seek(self._log_position)
+                        data = f.read()
+                    break
+                except FileNotFoundError:
+                    if generation == 0 and not os.path.exists(os.path.join(self.root, "CURRENT")):
+                        # 尚未写入过任何数据
+                        return
+                    # 读取期间日志被重写，重新读取CURRENT
+                    continue
+            else:
+                return
+
+            self._log_position += self._apply_log(data)
+
+    def _reset(self, generation: int) -> None:
+        self.index.clear()
+        self.live_bytes.clear()
+        self._close_fds()
+        self._generation = generation
+        self._log_position = 0
+        self._log_entries = 0
+
+    def _apply_log(self, data: bytes) -> int:
+        """应用日志条目，返回完整读取的字节数（末尾写了一半的条目留到下次）"""
+        position = 0
+        while position + _ENTRY_LENGTH.size <= len(data):
+            (entry_length,) = _ENTRY_LENGTH.unpack_from(data, position)
+            entry_end = position + _ENTRY_LENGTH.size + entry_length
+            if entry_end > len(data):
+                break
+            body_start = position + _ENTRY_LENGTH.size
+            op, segment, offset, length = _ENTRY_BODY.unpack_from(data, body_start)
+            key = data[body_start + _ENTRY_BODY.size:entry_end].decode("utf-8")
+            self._apply(op, segment, offset, length, key)
+            self._log_entries += 1
+            position = entry_end
+        return position
+
+    def _apply(self, op: int, segment: int, offset: int, length: int, key: str) -> None:
+        if op in (OP_PUT, OP_DELETE):
+            old = self.index.pop(key, None)
+            if old:
+                self.live_bytes[old[0]] -= old[2]
+            if op == OP_PUT:
+                self.index[key] = (segment, offset, length)
+                self.live_bytes[segment] = self.live_bytes.get(segment, 0) + length
+        elif op == OP_DROP_SEGMENT:
+            self.live_bytes.pop(segment, None)
+            self._release_fd(segment)
+
+    def _release_fd(self, segment: int) -> None:
+        """不再缓存段的描述符（需持有 _mutex）；正在读取时由最后一个读取者关闭，避免描述符被复用后读到其他文件"""
+        entry = self._fds.pop(segment, None)
+        if entry is not None and entry[1] == 0:
+            os.close(entry[0])
+
+    def _close_fds(self) -> None:
+        for segment in list(self._fds):
+            self._release_fd(segment)
+
+    @contextmanager
+    def _locked(self):
+        """跨进程写锁；持有期间内存索引与日志保持同步"""
+        with self._write_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                self._refresh(force=True)
+                log_path = self._log_path(self._generation)
+                if os.path.exists(log_path) and os.path.getsize(log_path) > self._log_position:
+                    # 上次写入中途崩溃留下了不完整的条目
+                    os.truncate(log_path, self._log_position)
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _append_entry(self, op: int, segment: int, offset: int, length: int, key: str) -> None:
+        """追加索引条目（需持有写锁）"""
+        key_bytes = key.encode("utf-8")
+        body = _ENTRY_BODY.pack(op, segment, offset, length) + key_bytes
+        entry = _ENTRY_LENGTH.pack(len(body)) + body
+        fd = os.open(self._log_path(self._generation), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, entry)
+        finally:
+            os.close(fd)
+        with self._mutex:
+            self._apply(op, segment, offset, length, key)
+            self._log_entries += 1
+            self._log_position += len(entry)
+
+    def _append_blob(self, key: str, data: bytes) -> int:
+        """把数据追加到当前段并记录索引（需持有写锁），返回写入段文件的字节数"""
+        key_bytes = key.encode("utf-8")
+        record = _RECORD_HEADER.pack(_RECORD_MAGIC, len(key_bytes), len(data)) + key_bytes + data
+
+        segments = self._list_segments()
+        segment = segments[-1] if segments else 1
+        path = self._segment_path(segment)
+        if os.path.exists(path) and os.path.getsize(path) + len(record) > self.segment_size:
+            segment += 1
+            path = self._segment_path(segment)
+
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            record_offset = os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, record)
+        finally:
+            os.close(fd)
+        data_offset = record_offset + _RECORD_HEADER.size + len(key_bytes)
+        self._append_entry(OP_PUT, segment, data_offset, len(data), key)
+        return len(record)
+
+    def _put(self, key: str, data: bytes) -> None:
+        with self._locked():
+            self._append_blob(key, data)
+
+    def _locate(self, key: str) -> Optional[Tuple[int, int, int]]:
+        """查找小图位置，未命中时读取其他进程新写入的索引后再查一次"""
+        self._refresh()
+        location = self.index.get(key)
+        if location is None:
+            self._refresh(force=True)
+            location = self.index.get(key)
+        return location
+
+    def _pread(self, location: Tuple[int, int, int], start: int, size: int) -> bytes:
+        segment, offset, _ = location
+        with self._mutex:
+            entry = self._fds.get(segment)
+            if entry is None:
+                entry = self._fds[segment] = [os.open(self._segment_path(segment), os.O_RDONLY), 0]
+            entry[1] += 1
+        try:
+            # 读取不持有锁，压缩线程和事件循环可以同时读取
+            return os.pread(entry[0], size, offset + start)
+        finally:
+            with self._mutex:
+                entry[1] -= 1
+                if entry[1] == 0 and self._fds.get(segment) is not entry:
+                    # 读取期间段已被删除或索引已重新加载
+                    os.close(entry[0])
+
+    def _read_blob(self, key: str, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        location = self._locate(key)
+        if location is None:
+            return None
+        end = location[2] - 1 if end is None else min(end, location[2] - 1)
+        try:
+            return self._pread(location, start, end - start + 1)
+        except FileNotFoundError:
+            # 段已被其他进程压缩删除，重新加载索引后读取新位置
+            self._refresh(force=True)
+            location = self.index.get(key)
+            if location is None:
+                return None
+            return self._pread(location, start, end - start + 1)
+
+    async def put_stream(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        buffer = bytearray()
+        async for chunk in stream:
+            buffer += chunk
+            if len(buffer) > self.max_blob_size:
+                # 大文件：已读取的部分和剩余数据一起写入本机文件
+                async def remaining():
+                    yield bytes(buffer)
+                    async for rest in stream:
+                        yield rest
+                return await self.local.put_stream(key, remaining())
+
+        await asyncio.to_thread(self._put, key, bytes(buffer))
+        return len(buffer)
+
+    async def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        # 小图一次pread读完（通常命中页缓存），不再交给线程池
+        data = self._read_blob(key, start, end)
+        if data is not None:
+            yield data
+            return
+        async for chunk in self.local.get_range(key, start, end):
+            yield chunk
+
+    def _delete(self, key: str) -> bool:
+        with self._locked():
+            if key not in self.index:
+                return False
+            self._append_entry(OP_DELETE, 0, 0, 0, key)
+        return True
+
+    async def delete(self, key: str) -> bool:
+        if self._locate(key) is None:
+            return await self.local.delete(key)
+        # 写锁可能被压缩线程或其他worker持有，在线程中等待，不阻塞事件循环
+        return await asyncio.to_thread(self._delete, key)
+
+    async def size(self, key: str) -> Optional[int]:
+        location = self._locate(key)
+        if location is not None:
+            return location[2]
+        return await self.local.size(key)
+
+    async def exists(self, key: str) -> bool:
+        return self._locate(key) is not None or await self.local.exists(key)
+
+    def garbage_ratio(self, segment: int) -> float:
+        """段文件中已删除数据（含记录头）所占比例"""
+        try:
+            segment_size = os.path.getsize(self._segment_path(segment))
+        except FileNotFoundError:
+            return 0.0
+        if not segment_size:
+            return 0.0
+        return 1 - self.live_bytes.get(segment, 0) / segment_size
+
+    def compact(self, min_garbage_ratio: float) -> int:
+        """压缩垃圾比例超过阈值的段，返回回收的字节数
+
+        有效数据逐条在写锁内复制，压缩期间上传只会被短暂阻塞；
+        多个worker同时压缩时，已被其他进程移动的条目会被跳过。
+        """
+        with self._locked():
+            segments = self._list_segments()
+            candidates = [
+                segment for segment in segments[:-1]
+                if self.garbage_ratio(segment) >= min_garbage_ratio
+            ]
+
+        reclaimed = 0
+        for segment in candidates:
+            with self._mutex:
+                keys = [key for key, location in self.index.items() if location[0] == segment]
+            for key in keys:
+                with self._locked():
+                    location = self.index.get(key)
+                    if location is None or location[0] != segment:
+                        continue
+                    # 复制的记录（含记录头和key）占用当前段的空间
+                    reclaimed -= self._append_blob(key, self._pread(location, 0, location[2]))
+
+            with self._locked():
+                path = self._segment_path(segment)
+                if not os.path.exists(path) or self.live_bytes.get(segment, 0):
+                    continue
+                reclaimed += os.path.getsize(path)
+                self._append_entry(OP_DROP_SEGMENT, segment, 0, 0, "")
+                os.remove(path)
+
+        with self._locked():
+            # 删除和覆盖产生的无效条目过多时重写索引日志
+            if self._log_entries > 2 * len(self.index) + 1024:
+                self._rewrite_log()
+        return reclaimed
+
+    def _rewrite_log(self) -> None:
+        """把当前有效索引写入新版本的日志（需持有写锁）"""
+        generation = self._generation + 1
+        temp_path = f"{self._log_path(generation)}.tmp"
+        with open(temp_path, "wb") as f:
+            for key, (segment, offset, length) in list(self.index.items()):
+                body = _ENTRY_BODY.pack(OP_PUT, segment, offset, length) + key.encode("utf-8")
+                f.write(_ENTRY_LENGTH.pack(len(body)) + body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self._log_path(generation))
+
+        current_temp = os.path.join(self.root, "CURRENT.tmp")
+        with open(current_temp, "w") as f:
+            f.write(str(generation))
+            f.flush()
+            os.fsync(f.fileno())
+        old_log = self._log_path(self._generation)
+        os.replace(current_temp, os.path.join(self.root, "CURRENT"))
+        if os.path.exists(old_log):
+            os.remove(old_log)
+        self._refresh(force=True)
+
+    def stats(self) -> dict:
+        """段文件数量、有效数据和垃圾比例"""
+        with self._mutex:
+            segments = self._list_segments()
+            total_bytes = 0
+            for segment in segments:
+                try:
+                    total_bytes += os.path.getsize(self._segment_path(segment))
+                except FileNotFoundError:
+                    # 其他进程刚压缩删除了该段
+                    pass
+            live_bytes = sum(self.live_bytes.get(segment, 0) for segment in segments)
+            return {
+                "blobs": len(self.index),
+                "segments": len(segments),
+                "segment_bytes": total_bytes,
+                "live_bytes": live_bytes,
+                "garbage_ratio": round(1 - live_bytes / total_bytes, 4) if total_bytes else 0.0,
+                "index_entries": self._log_entries,
+            }
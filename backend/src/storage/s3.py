@@ -0,0 +1,117 @@
+import asyncio
+from typing import AsyncIterator, Optional
+from .base import StorageBackend
+
+# S3要求除最后一个分片外，每个分片至少5MB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class S3Storage(StorageBackend):
+    """S3兼容对象存储（AWS S3、MinIO等）
+
+    写入使用流式分片上传：按 part_size 缓冲，每满一个分片就上传，内存占用与文件大小无关；
+    不足一个分片的小文件直接 put_object。boto3为同步客户端，所有调用都放到线程中执行。
+    """
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key_id: Optional[str] = None, secret_access_key: Optional[str] = None,
+                 key_prefix: str = "", part_size: int = 8 * 1024 * 1024, max_pool_connections: int = 20):
+        # boto3为可选依赖，只在使用S3存储时导入
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.key_prefix = key_prefix
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            config=Config(max_pool_connections=max_pool_connections, retries={"max_attempts": 3, "mode": "standard"})
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.key_prefix}{key}"
+
+    async def put_stream(self, key: str, stream: AsyncIterator[bytes]) -> int:
+        object_key = self._object_key(key)
+        buffer = bytearray()
+        written = 0
+        upload_id = None
+        parts = []
+
+        try:
+            async for chunk in stream:
+                buffer += chunk
+                written += len(chunk)
+                while len(buffer) >= self.part_size:
+                    if upload_id is None:
+                        response = await asyncio.to_thread(
+                            self.client.create_multipart_upload, Bucket=self.bucket, Key=object_key
+                        )
+                        upload_id = response["UploadId"]
+                    part = bytes(buffer[:self.part_size])
+                    del buffer[:self.part_size]
+                    parts.append(await self._upload_part(object_key, upload_id, len(parts) + 1, part))
+
+            if upload_id is None:
+                # 小文件一次上传
+                await asyncio.to_thread(self.client.put_object, Bucket=self.bucket, Key=object_key, Body=bytes(buffer))
+                return written
+
+            if buffer:
+                parts.append(await self._upload_part(object_key, upload_id, len(parts) + 1, bytes(buffer)))
+            await asyncio.to_thread(
+                self.client.complete_multipart_upload,
+                Bucket=self.bucket, Key=object_key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+            return written
+        except BaseException:
+            # 放弃未完成的分片上传，避免残留分片占用存储
+            if upload_id is not None:
+                await asyncio.to_thread(
+                    self.client.abort_multipart_upload, Bucket=self.bucket, Key=object_key, UploadId=upload_id
+                )
+            raise
+
+    async def _upload_part(self, object_key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        response = await asyncio.to_thread(
+            self.client.upload_part,
+            Bucket=self.bucket, Key=object_key, UploadId=upload_id, PartNumber=part_number, Body=body
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    async def get_range(self, key: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = await asyncio.to_thread(
+            self.client.get_object, Bucket=self.bucket, Key=self._object_key(key), Range=byte_range
+        )
+        body = response["Body"]
+        try:
+            while True:
+                chunk = await asyncio.to_thread(body.read, 1024 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    async def delete(self, key: str) -> bool:
+        if not await self.exists(key):
+            return False
+        await asyncio.to_thread(self.client.delete_object, Bucket=self.bucket, Key=self._object_key(key))
+        return True
+
+    async def size(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = await asyncio.to_thread(self.client.head_object, Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return response["ContentLength"]
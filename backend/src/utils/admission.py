@@ -0,0 +1,121 @@
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+from src.config import settings
+from src.utils.metrics import (
+    UPLOAD_QUEUE_DEPTH, UPLOAD_INFLIGHT, UPLOAD_INFLIGHT_BYTES, UPLOAD_QUEUE_WAIT, UPLOAD_SHED
+)
+
+
+class UploadRejected(Exception):
+    """上传排队超时或队列已满，retry_after为建议的重试等待秒数"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """上传准入控制（每个worker进程一个）
+
+    同时进行的上传数不超过 max_concurrent，在途字节数（请求体大小之和）不超过 max_bytes，
+    超出时按到达顺序排队，排队超过 queue_timeout 秒或队列已满时拒绝。
+    单个超过 max_bytes 的上传在没有其他上传时仍可进行，避免永远无法被接纳。
+    """
+
+    def __init__(self, max_bytes: int, max_concurrent: int, queue_timeout: float, max_queue: int):
+        self.max_bytes = max_bytes
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.active = 0
+        self.inflight_bytes = 0
+        self._waiters: deque = deque()
+        # 上传平均耗时（指数加权），用于估算 Retry-After
+        self._service_time = 1.0
+
+    def _fits(self, cost: int) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        return self.active == 0 or self.inflight_bytes + cost <= self.max_bytes
+
+    def _take(self, cost: int) -> None:
+        self.active += 1
+        self.inflight_bytes += cost
+        UPLOAD_INFLIGHT.inc()
+        UPLOAD_INFLIGHT_BYTES.inc(cost)
+
+    def _wake(self) -> None:
+        # 严格按到达顺序放行：队首的大文件放不下时后面的小文件也继续等待，大文件不会被饿死
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(cost):
+                break
+            self._waiters.popleft()
+            self._take(cost)
+            future.set_result(None)
+        UPLOAD_QUEUE_DEPTH.set(len(self._waiters))
+
+    def retry_after(self) -> int:
+        """按当前排队长度和平均上传耗时估算排到需要的秒数"""
+        rounds = (len(self._waiters) + 1) / max(1, self.max_concurrent)
+        return max(1, math.ceil(rounds * self._service_time))
+
+    def _reject(self, reason: str) -> UploadRejected:
+        UPLOAD_SHED.labels(reason).inc()
+        return UploadRejected(reason, self.retry_after())
+
+    async def acquire(self, cost: int) -> int:
+        """申请上传配额，返回实际占用的字节数（用于 release）；无法接纳时抛出 UploadRejected"""
+        cost = min(max(cost, 0), self.max_bytes)
+        if not self._waiters and self._fits(cost):
+            self._take(cost)
+            UPLOAD_QUEUE_WAIT.observe(0)
+            return cost
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (cost, future)
+        self._waiters.append(waiter)
+        UPLOAD_QUEUE_DEPTH.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # 客户端断开：已经被放行的要归还配额
+            if future.done() and not future.cancelled():
+                self.release(cost)
+            raise
+        finally:
+            if waiter in self._waiters:
+                # 超时或断开的请求离开队列，排在后面的请求可能已经可以放行
+                self._waiters.remove(waiter)
+                self._wake()
+        UPLOAD_QUEUE_WAIT.observe(time.perf_counter() - start)
+        return cost
+
+    def release(self, cost: int, duration: Optional[float] = None) -> None:
+        self.active -= 1
+        self.inflight_bytes -= cost
+        UPLOAD_INFLIGHT.dec()
+        UPLOAD_INFLIGHT_BYTES.dec(cost)
+        if duration is not None:
+            self._service_time = self._service_time * 0.9 + duration * 0.1
+        self._wake()
+
+
+upload_admission = AdmissionController(
+    settings.UPLOAD_MAX_INFLIGHT_BYTES,
+    settings.UPLOAD_MAX_CONCURRENT,
+    settings.UPLOAD_QUEUE_TIMEOUT,
+    settings.UPLOAD_MAX_QUEUE,
+)
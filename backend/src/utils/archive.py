@@ -0,0 +1,363 @@
+import zlib
+import struct
+import asyncio
+import zipfile
+from datetime import datetime
+from typing import AsyncIterator, Optional, List, Tuple
+
+# 逐条读取ZIP/TAR时每次从请求体读取的最大字节数
+READ_SIZE = 64 * 1024
+
+ZIP_LOCAL_HEADER = b"PK\x03\x04"
+ZIP_DATA_DESCRIPTOR = b"PK\x07\x08"
+# 中央目录、ZIP64中央目录结束记录、中央目录结束记录：之后没有文件数据
+ZIP_DIRECTORY_SIGNATURES = (b"PK\x01\x02", b"PK\x06\x06", b"PK\x05\x06")
+
+
+class ZipStreamWriter:
+    """边生成边输出的ZIP（仅存储模式，不压缩）
+
+    自身作为不可seek的输出文件交给 zipfile，各条目的CRC和大小写在数据描述符中，
+    不需要临时文件；每写入一块数据后调用 drain 取出已生成的字节，内存占用只与单次写入的块大小有关。
+    """
+
+    def __init__(self):
+        self._buffer: List[bytes] = []
+        self._zip = zipfile.ZipFile(self, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def write(self, data) -> int:
+        # zipfile写入的目标文件接口
+        self._buffer.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        """取出目前为止生成的字节"""
+        data = b"".join(self._buffer)
+        self._buffer.clear()
+        return data
+
+    def open(self, name: str, modified: Optional[datetime] = None, size: Optional[int] = None):
+        """开始写入一个条目，返回可写的文件对象；size已知时据此决定是否使用ZIP64"""
+        modified = modified or datetime.now()
+        zinfo = zipfile.ZipInfo(name, date_time=max(modified.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+        zinfo.compress_type = zipfile.ZIP_STORED
+        zinfo.external_attr = 0o644 << 16
+        if size is not None:
+            zinfo.file_size = size
+        return self._zip.open(zinfo, "w", force_zip64=size is None)
+
+    def close(self) -> bytes:
+        """写入中央目录，返回剩余的字节"""
+        self._zip.close()
+        return self.drain()
+
+
+class ArchiveError(Exception):
+    """归档文件格式错误或不完整"""
+
+
+class _StreamReader:
+    """在异步字节流上按需读取指定长度，未消费的数据可以退回"""
+
+    def __init__(self, stream: AsyncIterator[bytes]):
+        self._stream = stream.__aiter__()
+        self._buffer = bytearray()
+        self._eof = False
+
+    async def _fill(self, size: int) -> None:
+        while len(self._buffer) < size and not self._eof:
+            try:
+                self._buffer += await self._stream.__anext__()
+            except StopAsyncIteration:
+                self._eof = True
+
+    async def peek(self, size: int) -> bytes:
+        await self._fill(size)
+        return bytes(self._buffer[:size])
+
+    async def read(self, size: int) -> bytes:
+        """读取最多size字节，流结束时可能更短"""
+        await self._fill(size)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    async def read_exact(self, size: int) -> bytes:
+        data = await self.read(size)
+        if len(data) < size:
+            raise ArchiveError("归档文件不完整")
+        return data
+
+    async def read_some(self, size: int = READ_SIZE) -> bytes:
+        """读取已有的数据（没有时等待下一块），流结束时返回空字节"""
+        if not self._buffer:
+            await self._fill(1)
+        return await self.read(min(size, len(self._buffer)))
+
+    async def skip(self, size: int) -> None:
+        while size > 0:
+            data = await self.read_some(min(size, READ_SIZE))
+            if not data:
+                raise ArchiveError("归档文件不完整")
+            size -= len(data)
+
+    def unread(self, data: bytes) -> None:
+        self._buffer[:0] = data
+
+
+class _EntryCollector:
+    """收集一个条目的内容，超过 max_size 后只计算CRC和长度，不再保留数据"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.crc = 0
+        self._parts: List[bytes] = []
+
+    def add(self, data: bytes) -> None:
+        self.size += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+        if self.size <= self.max_size:
+            self._parts.append(data)
+        else:
+            self._parts.clear()
+
+    def result(self) -> Optional[bytes]:
+        return b"".join(self._parts) if self.size <= self.max_size else None
+
+
+def _inflate(decompressor, data: bytes, collector: _EntryCollector) -> None:
+    """解压一块数据并计入条目，每次最多输出 READ_SIZE 字节，超过大小上限的条目不会一次展开到内存
+
+    高压缩比的数据解压和CRC计算耗时较长，调用方放到线程中执行，不阻塞事件循环。
+    """
+    collector.add(decompressor.decompress(data, READ_SIZE))
+    while decompressor.unconsumed_tail and not decompressor.eof:
+        collector.add(decompressor.decompress(decompressor.unconsumed_tail, READ_SIZE))
+
+
+async def _gunzip(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    async for chunk in stream:
+        data = chunk
+        # 在线程中解压，每次最多输出 READ_SIZE 字节
+        while data and not decompressor.eof:
+            try:
+                output = await asyncio.to_thread(decompressor.decompress, data, READ_SIZE)
+            except zlib.error:
+                raise ArchiveError("gzip数据损坏")
+            if output:
+                yield output
+            data = decompressor.unconsumed_tail
+    data = decompressor.flush()
+    if data:
+        yield data
+
+
+def _tar_number(field: bytes) -> int:
+    if field[:1] and field[0] & 0x80:
+        # GNU base-256 编码（超过8GB的文件）
+        return int.from_bytes(field[1:], "big")
+    field = field.split(b"\0", 1)[0].strip()
+    try:
+        return int(field, 8) if field else 0
+    except ValueError:
+        raise ArchiveError("不是有效的TAR文件")
+
+
+def _pax_path(data: bytes) -> Optional[str]:
+    # PAX扩展头：每条记录为 "长度 key=value\n"
+    try:
+        while data:
+            length = int(data.split(b" ", 1)[0])
+            record, data = data[:length], data[length:]
+            key, _, value = record.split(b" ", 1)[1].rstrip(b"\n").partition(b"=")
+            if key == b"path":
+                return value.decode("utf-8", "replace")
+    except (ValueError, IndexError):
+        raise ArchiveError("TAR扩展头格式错误")
+    return None
+
+
+async def _iter_tar(reader: _StreamReader, max_size: int) -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+    long_name = None
+    while True:
+        header = await reader.read(512)
+        if len(header) < 512 or header == bytes(512):
+            # 结束标记（两个全零块）或流结束
+            return
+        checksum = _tar_number(header[148:156])
+        if checksum != sum(header[:148]) + 256 + sum(header[156:]):
+            raise ArchiveError("不是有效的TAR文件")
+        size = _tar_number(header[124:136])
+        padded = (size + 511) // 512 * 512
+        type_flag = header[156:157]
+        name = header[:100].split(b"\0", 1)[0].decode("utf-8", "replace")
+        if header[257:262] == b"ustar" and header[345]:
+            name = header[345:500].split(b"\0", 1)[0].decode("utf-8", "replace") + "/" + name
+
+        if type_flag in (b"L", b"x"):
+            # 下一个条目的长文件名（GNU）或扩展头（PAX）
+            data = await reader.read_exact(size)
+            await reader.skip(padded - size)
+            long_name = data.rstrip(b"\0").decode("utf-8", "replace") if type_flag == b"L" else _pax_path(data)
+            continue
+        if long_name:
+            name, long_name = long_name, None
+        if type_flag not in (b"0", b"\0", b"7") or size > max_size:
+            # 目录、链接等非普通文件，以及超过大小上限的文件：跳过内容
+            await reader.skip(padded)
+            if type_flag in (b"0", b"\0", b"7"):
+                yield name, None
+            continue
+        data = await reader.read_exact(size)
+        await reader.skip(padded - size)
+        yield name, data
+
+
+def _zip64_sizes(extra: bytes, compressed_size: int, file_size: int) -> Tuple[int, int, bool]:
+    """从ZIP64扩展字段读取大小，返回 (压缩后大小, 原始大小, 是否为ZIP64)"""
+    while len(extra) >= 4:
+        header_id, length = struct.unpack("<HH", extra[:4])
+        if header_id == 0x0001:
+            values = list(struct.unpack(f"<{length // 8}Q", extra[4:4 + length // 8 * 8]))
+            if file_size == 0xFFFFFFFF and values:
+                file_size = values.pop(0)
+            if compressed_size == 0xFFFFFFFF and values:
+                compressed_size = values.pop(0)
+            return compressed_size, file_size, True
+        extra = extra[4 + length:]
+    return compressed_size, file_size, False
+
+
+async def _read_descriptor(reader: _StreamReader, zip64: bool) -> Tuple[int, int]:
+    """读取数据描述符，返回 (CRC, 原始大小)"""
+    if await reader.peek(4) == ZIP_DATA_DESCRIPTOR:
+        await reader.skip(4)
+    if zip64:
+        crc, _, file_size = struct.unpack("<IQQ", await reader.read_exact(20))
+    else:
+        crc, _, file_size = struct.unpack("<III", await reader.read_exact(12))
+    return crc, file_size
+
+
+async def _scan_stored(reader: _StreamReader, collector: _EntryCollector, zip64: bool) -> int:
+    """读取大小写在数据描述符中的未压缩条目：查找带签名、CRC和长度都与已读数据一致的描述符，返回描述符中的CRC"""
+    descriptor_size = 24 if zip64 else 16
+    pending = bytearray()
+    while True:
+        data = await reader.read_some()
+        if not data:
+            raise ArchiveError("归档文件不完整")
+        pending += data
+        index = pending.find(ZIP_DATA_DESCRIPTOR)
+        while index >= 0 and index + descriptor_size <= len(pending):
+            if zip64:
+                crc, compressed_size, _ = struct.unpack("<IQQ", pending[index + 4:index + 24])
+            else:
+                crc, compressed_size, _ = struct.unpack("<III", pending[index + 4:index + 16])
+            if compressed_size == collector.size + index and crc == zlib.crc32(pending[:index], collector.crc):
+                collector.add(bytes(pending[:index]))
+                reader.unread(bytes(pending[index + descriptor_size:]))
+                return crc
+            index = pending.find(ZIP_DATA_DESCRIPTOR, index + 1)
+        # 保留可能是描述符开头的部分，其余计入条目内容
+        keep = index if index >= 0 else max(0, len(pending) - 3)
+        collector.add(bytes(pending[:keep]))
+        del pending[:keep]
+
+
+async def _iter_zip(reader: _StreamReader, max_size: int) -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+    while True:
+        signature = await reader.peek(4)
+        if not signature or signature in ZIP_DIRECTORY_SIGNATURES:
+            return
+        if signature != ZIP_LOCAL_HEADER:
+            raise ArchiveError("不是有效的ZIP文件")
+        (_, _, flags, method, _, _, crc, compressed_size, file_size,
+         name_length, extra_length) = struct.unpack("<IHHHHHIIIHH", await reader.read_exact(30))
+        raw_name = await reader.read_exact(name_length)
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437", "replace")
+        extra = await reader.read_exact(extra_length)
+        compressed_size, file_size, zip64 = _zip64_sizes(extra, compressed_size, file_size)
+        has_descriptor = bool(flags & 0x08)
+
+        if flags & 0x01 or method not in (0, 8):
+            # 加密或不支持的压缩方式：大小已知时跳过，否则无法继续解析
+            if has_descriptor:
+                raise ArchiveError(f"不支持的ZIP条目: {name}")
+            await reader.skip(compressed_size)
+            yield name, None
+            continue
+
+        collector = _EntryCollector(max_size)
+        if method == 8:
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            remaining = None if has_descriptor else compressed_size
+            while not decompressor.eof:
+                if remaining is not None and collector.size > max_size:
+                    # 压缩后大小已知且已超过大小上限：不再解压，直接跳过剩余数据
+                    break
+                data = await reader.read_some(READ_SIZE if remaining is None else min(READ_SIZE, remaining))
+                if not data:
+                    raise ArchiveError("归档文件不完整")
+                if remaining is not None:
+                    remaining -= len(data)
+                try:
+                    await asyncio.to_thread(_inflate, decompressor, data, collector)
+                except zlib.error:
+                    raise ArchiveError(f"ZIP条目数据损坏: {name}")
+            if decompressor.unused_data:
+                reader.unread(decompressor.unused_data)
+            if remaining:
+                await reader.skip(remaining)
+            if not decompressor.eof:
+                yield name, None
+                continue
+        elif has_descriptor:
+            crc = await _scan_stored(reader, collector, zip64)
+        else:
+            remaining = compressed_size
+            while remaining:
+                data = await reader.read_some(min(READ_SIZE, remaining))
+                if not data:
+                    raise ArchiveError("归档文件不完整")
+                remaining -= len(data)
+                collector.add(data)
+
+        if has_descriptor and method == 8:
+            crc, file_size = await _read_descriptor(reader, zip64)
+        if collector.crc != crc:
+            raise ArchiveError(f"ZIP条目校验失败: {name}")
+        if name.endswith("/"):
+            continue
+        yield name, collector.result()
+
+
+async def iter_archive(stream: AsyncIterator[bytes], max_size: int) -> AsyncIterator[Tuple[str, Optional[bytes]]]:
+    """逐条读取ZIP、TAR或gzip压缩的TAR字节流，不解压到临时文件
+
+    按文件头自动识别格式，依次返回 (条目路径, 内容)；超过 max_size 的文件内容为None（数据已跳过），
+    目录和链接等非普通文件不返回。内存占用与单个条目的大小上限有关，与归档总大小无关。
+    """
+    reader = _StreamReader(stream)
+    head = await reader.peek(4)
+    if head == ZIP_LOCAL_HEADER or head in ZIP_DIRECTORY_SIGNATURES:
+        entries = _iter_zip(reader, max_size)
+    elif head[:2] == b"\x1f\x8b":
+        entries = _iter_tar(_StreamReader(_gunzip(_drain(reader))), max_size)
+    else:
+        entries = _iter_tar(reader, max_size)
+    async for entry in entries:
+        yield entry
+
+
+async def _drain(reader: _StreamReader) -> AsyncIterator[bytes]:
+    while True:
+        data = await reader.read_some()
+        if not data:
+            return
+        yield data
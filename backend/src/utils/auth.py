@@ -5,6 +5,7 @@ from fastapi import HTTPException, status
 from typing import Optional
 import hashlib
 import bcrypt
+from src.utils.metrics import PASSWORD_HASH
 
 
 def _process_password(password: str) -> bytes:
@@ -23,7 +24,8 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         # 处理密码，确保和哈希时使用相同的逻辑
         processed_password = _process_password(plain_password)
         # 直接使用bcrypt库验证
-        return bcrypt.checkpw(processed_password, hashed_password.encode('utf-8'))
+        with PASSWORD_HASH.labels("verify").time():
+            return bcrypt.checkpw(processed_password, hashed_password.encode('utf-8'))
     except Exception as e:
         # 记录错误并返回False
         print(f"密码验证错误: {e}")
@@ -37,7 +39,8 @@ def get_password_hash(password: str) -> str:
         processed_password = _process_password(password)
         # 生成盐值并创建哈希
         salt = bcrypt.gensalt(rounds=12)
-        hashed = bcrypt.hashpw(processed_password, salt)
+        with PASSWORD_HASH.labels("hash").time():
+            hashed = bcrypt.hashpw(processed_password, salt)
         # 转换为字符串返回
         return hashed.decode('utf-8')
     except Exception as e:
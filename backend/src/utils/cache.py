@@ -0,0 +1,162 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Hashable
+from src.config import settings
+
+
+class FrequencySketch:
+    """TinyLFU使用的Count-Min Sketch：用固定内存近似统计访问频率
+
+    每个计数器上限15（4位），累计采样数达到 sample_size 后所有计数减半，
+    让频率随时间衰减，过去的热点不会永远占据缓存。
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int):
+        self.width = max(64, width)
+        self.sample_size = self.width * 10
+        self.additions = 0
+        self.table = [bytearray(self.width) for _ in range(self.DEPTH)]
+
+    def _indexes(self, key: Hashable):
+        key_hash = hash(key)
+        for i in range(self.DEPTH):
+            # 用不同的种子派生各行的哈希值
+            yield i, hash((key_hash, i)) % self.width
+
+    def increment(self, key: Hashable) -> None:
+        for row, index in self._indexes(key):
+            if self.table[row][index] < self.MAX_COUNT:
+                self.table[row][index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._reset()
+
+    def estimate(self, key: Hashable) -> int:
+        return min(self.table[row][index] for row, index in self._indexes(key))
+
+    def _reset(self) -> None:
+        for row in self.table:
+            for i in range(self.width):
+                row[i] >>= 1
+        self.additions //= 2
+
+
+class HotObjectCache:
+    """按字节预算的进程内小文件缓存（LRU淘汰 + TinyLFU准入）
+
+    新对象需要挤出已有对象时，只有访问频率高于被淘汰对象才会被缓存，
+    避免一次性的批量扫描把热点图片冲掉。
+    多个worker进程各自持有缓存，条目带TTL以限制其他进程删除图片后的陈旧时间。
+    """
+
+    def __init__(self, max_bytes: int, max_object_size: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self.ttl = ttl
+        self.sketch = FrequencySketch(width=max(1, max_bytes // 4096))
+        self.entries: OrderedDict = OrderedDict()  # key -> (body, headers, expire_at)
+        self.keys_by_group: dict = {}  # 分组（同一张图片） -> 该组的所有缓存key，用于失效
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        """查询缓存，返回 (body, headers)；同时记录访问频率"""
+        with self._lock:
+            self.sketch.increment(key)
+            entry = self.entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def should_admit(self, key: Hashable, size: int) -> bool:
+        """判断对象是否值得读入内存缓存（不修改缓存）"""
+        if not self.enabled or size > self.max_object_size:
+            return False
+        with self._lock:
+            return self._admit(key, size)
+
+    def _admit(self, key: Hashable, size: int) -> bool:
+        free = self.max_bytes - self.used_bytes
+        if size <= free:
+            return True
+        # 与将被淘汰的最久未用对象比较访问频率
+        candidate_frequency = self.sketch.estimate(key)
+        for victim_key, (body, _, _) in self.entries.items():
+            if candidate_frequency <= self.sketch.estimate(victim_key):
+                return False
+            free += len(body)
+            if size <= free:
+                return True
+        return False
+
+    def put(self, key: tuple, body: bytes, headers: dict) -> bool:
+        """写入缓存，未通过准入时返回False
+
+        key的第一个元素作为分组，invalidate时整组失效。
+        """
+        size = len(body)
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            if size > self.max_object_size or not self._admit(key, size):
+                self.rejected += 1
+                return False
+            while self.used_bytes + size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+            self.entries[key] = (body, headers, time.monotonic() + self.ttl)
+            self.keys_by_group.setdefault(key[0], set()).add(key)
+            self.used_bytes += size
+            return True
+
+    def invalidate(self, group: Hashable) -> None:
+        """文件被删除或替换时移除该分组的所有缓存"""
+        with self._lock:
+            for key in self.keys_by_group.pop(group, set()):
+                self._remove(key)
+
+    def _remove(self, key: tuple) -> None:
+        body, _, _ = self.entries.pop(key)
+        self.used_bytes -= len(body)
+        keys = self.keys_by_group.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_group[key[0]]
+
+    def stats(self) -> dict:
+        """缓存命中率和内存占用"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+# 图片原图访问缓存，key为 ((用户名, 文件名), Accept协商结果)
+hot_cache = HotObjectCache(
+    max_bytes=settings.HOT_CACHE_MAX_BYTES,
+    max_object_size=settings.HOT_CACHE_MAX_OBJECT_SIZE,
+    ttl=settings.HOT_CACHE_TTL
+)
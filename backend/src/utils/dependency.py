@@ -1,30 +1,83 @@
-from fastapi import Depends, HTTPException, status
+import asyncio
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from src.database import get_db
 from src.schemas.common import Response
 from src.services.auth import AuthService
 from src.services.token import TokenService
+from src.models.user import User
+from src.config import settings
 from .auth import decode_access_token
+from .tracing import span
+from .rate_limit import rate_limiter, token_key, client_key
 
 # OAuth2密码Bearer模式
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     """获取当前用户（支持用户登录Token和外部Token）"""
-    try:
-        # 尝试解析为用户登录Token
-        payload = decode_access_token(token)
-        user_id = int(payload.get("sub"))
-        user = AuthService.get_current_user(db, user_id)
-        return user
-    except Exception as e:
-        # 尝试解析为外部Token
+    with span("auth"):
         try:
-            user = TokenService.verify_token(db, token)
+            # 尝试解析为用户登录Token
+            payload = decode_access_token(token)
+            user_id = int(payload.get("sub"))
+            user = AuthService.get_current_user(db, user_id)
             return user
         except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="无效的认证信息",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+            # 登录Token是JWT（含"."），外部Token不含"."：过期或签名无效的JWT直接拒绝，不做外部Token校验
+            if "." in token:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="无效的认证信息",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            # 外部Token要逐个做bcrypt校验：同一Token、同一客户端或全局鉴权失败过多时直接拒绝
+            # （每次换一个随机Token只能绕过按Token的计数）
+            failure_keys = [token_key(token), client_key(request)]
+            await rate_limiter.enforce("auth_failures", failure_keys, consume=False)
+            await rate_limiter.enforce("auth_failures_global", ["all"], consume=False)
+            # 尝试解析为外部Token（bcrypt计算在线程中执行，不阻塞事件循环）
+            try:
+                user = await asyncio.to_thread(TokenService.verify_token, db, token)
+                return user
+            except Exception as e:
+                await rate_limiter.acquire("auth_failures", failure_keys)
+                await rate_limiter.acquire("auth_failures_global", ["all"])
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="无效的认证信息",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    """获取当前管理员用户（用户名在 ADMIN_USERNAMES 中）"""
+    if current_user.username not in settings.admin_usernames_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限",
+        )
+    return current_user
+
+
+async def rate_limit_token(token: str = Depends(oauth2_scheme)):
+    """按Token限制请求次数（在鉴权之前执行，超限的请求不再做Token校验）"""
+    await rate_limiter.enforce("requests", [token_key(token)])
+
+async def rate_limit_user(current_user: User = Depends(get_current_user)):
+    """按用户限制请求次数（同一用户的多个Token共享额度）"""
+    await rate_limiter.enforce("requests", [f"user:{current_user.id}"])
+
+async def rate_limit_upload(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user)
+):
+    """按用户和Token限制上传字节数（按请求体的 Content-Length 计，缺失时按单文件大小上限计）"""
+    try:
+        size = int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        size = settings.MAX_FILE_SIZE
+    await rate_limiter.enforce("upload_bytes", [f"user:{current_user.id}", token_key(token)], size)
+
+# 挂到路由器上：APIRouter(dependencies=rate_limits)
+rate_limits = [Depends(rate_limit_token), Depends(rate_limit_user)]
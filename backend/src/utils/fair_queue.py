@@ -0,0 +1,145 @@
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Hashable, Optional, Tuple
+from src.config import settings
+from src.utils.metrics import FAIR_QUEUE_DEPTH, FAIR_QUEUE_USERS, FAIR_QUEUE_WAIT
+from src.utils.tracing import span
+
+
+class DeficitRoundRobin:
+    """按key（用户）分队列的差额轮询（DRR）
+
+    每个有任务的key轮流获得quantum的额度，额度够支付队首任务的开销时出队；
+    开销可以是字节数（写盘）或任务数（后台处理），批量提交大量任务的用户只占自己的一份，
+    其他用户的任务不会排在它的整批任务之后。
+    """
+
+    def __init__(self, stage: str, quantum: int):
+        self.stage = stage
+        self.quantum = quantum
+        self._queues: Dict[Hashable, deque] = {}
+        self._deficit: Dict[Hashable, float] = {}
+        self._active: deque = deque()
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def key_count(self) -> int:
+        """有任务排队的key数"""
+        return len(self._queues)
+
+    def depth(self, key: Hashable) -> int:
+        queue = self._queues.get(key)
+        return len(queue) if queue else 0
+
+    def _update_gauges(self) -> None:
+        FAIR_QUEUE_DEPTH.labels(self.stage).set(self._size)
+        FAIR_QUEUE_USERS.labels(self.stage).set(len(self._queues))
+
+    def push(self, key: Hashable, item: Any, cost: float = 1) -> None:
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._deficit[key] = 0
+            self._active.append(key)
+        self._queues[key].append((cost, item))
+        self._size += 1
+        self._update_gauges()
+
+    def _remove_key(self, key: Hashable) -> None:
+        # 队列清空的key不保留额度，重新排队时从0开始
+        del self._queues[key]
+        del self._deficit[key]
+        self._active.remove(key)
+
+    def pop(self) -> Optional[Tuple[Hashable, Any]]:
+        """按DRR顺序取出下一个任务，队列为空时返回None"""
+        while self._active:
+            key = self._active[0]
+            queue = self._queues[key]
+            cost, item = queue[0]
+            if self._deficit[key] >= cost:
+                self._deficit[key] -= cost
+                queue.popleft()
+                self._size -= 1
+                if not queue:
+                    self._remove_key(key)
+                self._update_gauges()
+                return key, item
+            # 额度不够：补充额度后轮到下一个key
+            self._deficit[key] += self.quantum
+            self._active.rotate(-1)
+        return None
+
+    def pop_newest(self, key: Hashable) -> Optional[Any]:
+        """取出key最后提交的任务（队列满时丢弃占用最多的用户的最新任务）"""
+        queue = self._queues.get(key)
+        if not queue:
+            return None
+        _, item = queue.pop()
+        self._size -= 1
+        if not queue:
+            self._remove_key(key)
+        self._update_gauges()
+        return item
+
+    def heaviest(self) -> Optional[Hashable]:
+        """排队任务最多的key"""
+        return max(self._queues, key=lambda key: len(self._queues[key]), default=None)
+
+
+class FairScheduler:
+    """按用户公平分配有限的并发槽位（每个worker进程一个）
+
+    空闲时直接进入；槽位占满后各用户的请求分别排队，释放槽位时按DRR选择下一个用户。
+    """
+
+    def __init__(self, stage: str, concurrency: int, quantum: int):
+        self.stage = stage
+        self.concurrency = concurrency
+        self.active = 0
+        self._queue = DeficitRoundRobin(stage, quantum)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, cost: float = 1):
+        """占用一个槽位，cost为本次操作的开销（如写入的字节数）"""
+        if self.active < self.concurrency and not len(self._queue):
+            self.active += 1
+            FAIR_QUEUE_WAIT.labels(self.stage).observe(0)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._queue.push(key, future, cost)
+            start = time.perf_counter()
+            try:
+                with span(f"{self.stage}_queue"):
+                    await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release()
+                else:
+                    # 仍在队列中：标记取消，出队时跳过
+                    future.cancel()
+                raise
+            FAIR_QUEUE_WAIT.labels(self.stage).observe(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self.active -= 1
+        while self.active < self.concurrency:
+            popped = self._queue.pop()
+            if popped is None:
+                break
+            future = popped[1]
+            if future.done():
+                continue
+            self.active += 1
+            future.set_result(None)
+
+
+# 写盘（直传保存、切片保存和合并）：按写入字节数公平轮询
+disk_scheduler = FairScheduler("disk_write", settings.DISK_WRITE_CONCURRENCY, quantum=1024 * 1024)
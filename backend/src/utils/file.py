@@ -1,59 +1,104 @@
 import os
+import re
+import glob
 import shutil
-from typing import Tuple, Optional
+import hashlib
+from typing import Tuple, Optional, AsyncIterator
 from datetime import datetime, timedelta
 import secrets
 import uuid
 from src.config import settings
+from src.utils.probe import probe_image, probe_matches_extension, PROBE_HEADER_SIZE
+from src.storage import get_storage
+from src.utils.metrics import UPLOAD_STAGE, UPLOAD_BYTES
+from src.utils.tracing import span
 from fastapi import UploadFile, HTTPException, status
 import aiofiles
 import html
 
 
-async def save_file(file: UploadFile, username: str) -> Tuple[str, str]:
-    """保存文件到本地存储"""
+async def iter_bytes(content: bytes) -> AsyncIterator[bytes]:
+    """将内存中的内容包装为存储后端写入所需的异步流"""
+    yield content
+
+
+async def iter_chunk_files(temp_dir: str, total_chunks: int, read_size: int = 1024 * 1024) -> AsyncIterator[bytes]:
+    """按顺序流式读取所有切片文件，内存占用与文件大小无关"""
+    for i in range(total_chunks):
+        chunk_file_path = os.path.join(temp_dir, f"chunk_{i}")
+        async with aiofiles.open(chunk_file_path, 'rb') as chunk_file:
+            while True:
+                content = await chunk_file.read(read_size)
+                if not content:
+                    break
+                yield content
+
+
+def validate_image_header(header: bytes, file_extension: str) -> dict:
+    """探测文件头，校验真实格式与扩展名一致，返回格式和尺寸信息"""
+    probe = probe_image(header)
+    if not probe_matches_extension(probe, file_extension):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="文件内容不是有效的图片或与扩展名不符"
+        )
+    return probe
+
+
+async def save_file(file: UploadFile, username: str) -> Tuple[str, str, dict]:
+    """保存上传的文件到存储后端
+
+    Returns:
+        Tuple[str, str, dict]: 本地路径、访问URL、文件头探测结果（格式、尺寸和实际写入的字节数 file_size）
+    """
+    # 直接读取整个文件内容，确保完整保存
+    with span("read"):
+        content = await file.read()
+    return await save_content(content, file.filename, username)
+
+
+async def save_content(content: bytes, filename: str, username: str, method: str = "direct") -> Tuple[str, str, dict]:
+    """校验并保存文件内容（直传和归档导入共用，method为上传字节数指标的标签）
+
+    Returns:
+        Tuple[str, str, dict]: 本地路径、访问URL、文件头探测结果（格式、尺寸和实际写入的字节数 file_size）
+    """
     # 验证文件类型
-    if "." not in file.filename:
+    if "." not in filename:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="文件名必须包含扩展名"
         )
-    file_extension = file.filename.split(".")[-1].lower()
+    file_extension = filename.split(".")[-1].lower()
     if file_extension not in settings.allowed_file_types_list:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"不支持的文件类型，允许的类型：{', '.join(settings.allowed_file_types_list)}"
         )
     
-    # 创建用户目录结构：static/{username}/images/
-    user_image_dir = os.path.join(settings.UPLOAD_FOLDER, username, "images")
-    os.makedirs(user_image_dir, exist_ok=True)
-    
     # 生成唯一的文件名，避免冲突
     unique_filename = generate_nicname(username, file_extension)
     
-    # 文件路径：使用唯一文件名进行保存
-    file_path = os.path.join(user_image_dir, unique_filename)
+    # 文件路径：按存储布局解析，如 static/{username}/images/{xx}/{yy}/{filename}
+    file_path = get_image_path(username, unique_filename)
+    
+    content_length = len(content)
     
-    # 保存文件
+    if content_length > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"文件大小超过限制，最大允许 {settings.MAX_FILE_SIZE / 1024 / 1024:.1f}MB"
+        )
+    
+    # 根据文件头探测真实格式和尺寸，与扩展名不符时在写盘前拒绝
+    with span("probe", UPLOAD_STAGE):
+        probe = validate_image_header(content[:PROBE_HEADER_SIZE], file_extension)
+    
+    # 保存文件到存储后端
     try:
-        content_length = 0
-        async with aiofiles.open(file_path, 'wb') as f:
-            # 直接读取整个文件内容，确保完整保存
-            content = await file.read()
-            content_length = len(content)
-            
-            if content_length > settings.MAX_FILE_SIZE:
-                await f.close()
-                os.remove(file_path)  # 清理已写入的文件
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"文件大小超过限制，最大允许 {settings.MAX_FILE_SIZE / 1024 / 1024:.1f}MB"
-                )
-            
-            await f.write(content)
-    except HTTPException:
-        raise  # 重新抛出HTTP异常
+        with span("write"):
+            await get_storage().put_stream(file_path, iter_bytes(content))
+        UPLOAD_BYTES.labels(method).inc(content_length)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -61,9 +106,9 @@ async def save_file(file: UploadFile, username: str) -> Tuple[str, str]:
         )
     
     # 生成URL
-    url = f"{settings.BASE_URL}/{settings.UPLOAD_FOLDER}/{username}/images/{unique_filename}"
+    url = generate_image_url(username, unique_filename)
     
-    return file_path, url
+    return file_path, url, {**probe, "file_size": content_length}
 
 def delete_file(file_path: str) -> bool:
     """删除文件"""
@@ -99,28 +144,191 @@ def generate_image_urls(filename: str, url: str) -> dict:
         "html": f"<img src=\"{escaped_url}\" alt=\"{escaped_filename}\">",
     }
 
+# 存储布局：flat 为 static/{username}/images/{filename}；
+# sharded 为 static/{username}/images/{xx}/{yy}/{filename}，xx/yy取自文件名哈希，避免单目录文件过多
+STORAGE_LAYOUTS = ("sharded", "flat")
+
+def image_stem(filename: str) -> str:
+    """获取原图或衍生文件（{stem}_200w.png、{stem}.webp 等）对应的原图主文件名"""
+    return re.sub(r"_\d+w$", "", filename.split(".", 1)[0])
+
+def get_shard_dir(filename: str) -> str:
+    """根据文件名计算两级哈希分片目录，如 "3f/a2"，衍生文件与原图使用同一分片"""
+    digest = hashlib.md5(image_stem(filename).encode("utf-8")).hexdigest()
+    return os.path.join(digest[:2], digest[2:4])
+
+def _get_layout_path(username: str, sub_dir: str, filename: str, layout: str, root: Optional[str] = None) -> str:
+    base_dir = os.path.join(root or settings.UPLOAD_FOLDER, username, sub_dir)
+    if layout == "sharded":
+        return os.path.join(base_dir, get_shard_dir(filename), filename)
+    return os.path.join(base_dir, filename)
+
+def get_image_path(username: str, filename: str, layout: Optional[str] = None) -> str:
+    """路径解析：计算原图在指定布局（默认当前配置）下的本地路径"""
+    return _get_layout_path(username, "images", filename, layout or settings.STORAGE_LAYOUT)
+
+def is_cold_path(file_path: str) -> bool:
+    """判断原图是否位于冷存储目录"""
+    cold_root = settings.COLD_STORAGE_FOLDER
+    return bool(cold_root) and os.path.abspath(file_path).startswith(os.path.abspath(cold_root) + os.sep)
+
+def _get_root(file_path: str) -> str:
+    """文件所在的存储根目录（热存储或冷存储）"""
+    return settings.COLD_STORAGE_FOLDER if is_cold_path(file_path) else settings.UPLOAD_FOLDER
+
+def get_cold_path(file_path: str) -> str:
+    """原图在冷存储中的路径（保持相同的目录结构）"""
+    return os.path.join(settings.COLD_STORAGE_FOLDER, os.path.relpath(file_path, settings.UPLOAD_FOLDER))
+
+def get_layout(file_path: str) -> str:
+    """根据本地路径判断所属的存储布局"""
+    parts = os.path.relpath(file_path, _get_root(file_path)).split(os.sep)
+    return "sharded" if len(parts) == 5 else "flat"
+
+def split_image_path(file_path: str) -> Tuple[str, str]:
+    """从原图本地路径中解析出 (用户名, 文件名)，兼容所有存储布局和冷存储"""
+    parts = os.path.relpath(file_path, _get_root(file_path)).split(os.sep)
+    return parts[0], parts[-1]
+
+def get_cache_group(file_path: str) -> Tuple[str, str]:
+    """原图及其衍生文件在内存缓存中的分组 (用户名, 主文件名)"""
+    username, filename = split_image_path(file_path)
+    return username, image_stem(filename)
+
+def _resolve_path(username: str, sub_dir: str, filename: str, roots: Tuple[str, ...]) -> Optional[str]:
+    # 先查当前布局，再回退到其他布局，保证迁移前后的URL都能访问
+    for root in roots:
+        for layout in sorted(STORAGE_LAYOUTS, key=lambda l: l != settings.STORAGE_LAYOUT):
+            file_path = _get_layout_path(username, sub_dir, filename, layout, root)
+            if os.path.isfile(file_path):
+                return file_path
+    return None
+
+def resolve_image_path(username: str, filename: str) -> Optional[str]:
+    """查找原图实际所在的本地路径（先热存储后冷存储），不存在时返回None"""
+    roots = (settings.UPLOAD_FOLDER,)
+    if settings.COLD_STORAGE_FOLDER:
+        roots += (settings.COLD_STORAGE_FOLDER,)
+    return _resolve_path(username, "images", filename, roots)
+
+def resolve_derived_path(username: str, filename: str) -> Optional[str]:
+    """查找衍生文件实际所在的本地路径（衍生文件始终位于热存储），不存在时返回None"""
+    return _resolve_path(username, "derived", filename, (settings.UPLOAD_FOLDER,))
+
+def get_derived_dir(username: str) -> str:
+    """获取用户衍生图片目录（缩略图等）：static/{username}/derived/"""
+    return os.path.join(settings.UPLOAD_FOLDER, username, "derived")
+
+def get_derived_path(file_path: str, derived_filename: str) -> str:
+    """获取原图的衍生文件路径（与原图使用相同的存储布局）"""
+    username = split_image_path(file_path)[0]
+    return _get_layout_path(username, "derived", derived_filename, get_layout(file_path))
+
+def get_variant_path(file_path: str, width: int) -> str:
+    """获取指定宽度缩略图的本地路径"""
+    stem, file_extension = os.path.splitext(os.path.basename(file_path))
+    return get_derived_path(file_path, f"{stem}_{width}w{file_extension}")
+
+def get_transcode_path(file_path: str, image_format: str) -> str:
+    """获取原图转码为指定格式后的本地路径"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return get_derived_path(file_path, f"{stem}.{image_format}")
+
+def generate_image_url(username: str, filename: str) -> str:
+    """生成原图访问URL（与存储布局无关）"""
+    return f"{settings.BASE_URL}/{settings.UPLOAD_FOLDER}/{username}/images/{filename}"
+
+def generate_variant_url(url: str, width: int) -> str:
+    """根据原图URL生成指定宽度缩略图的URL"""
+    base_url, filename = url.rsplit("/images/", 1)
+    stem, file_extension = os.path.splitext(filename)
+    return f"{base_url}/derived/{stem}_{width}w{file_extension}"
+
+def generate_rendition_url(url: str, image_format: str) -> str:
+    """根据原图URL生成转换格式后的URL"""
+    base_url, filename = url.rsplit("/images/", 1)
+    stem = os.path.splitext(filename)[0]
+    return f"{base_url}/derived/{stem}.{image_format}"
+
+def list_derived_files(file_path: str) -> list:
+    """列出原图对应的所有衍生文件（检查所有存储布局）"""
+    username, filename = split_image_path(file_path)
+    stem = os.path.splitext(filename)[0]
+    derived_files = []
+    for layout in STORAGE_LAYOUTS:
+        derived_dir = os.path.dirname(_get_layout_path(username, "derived", filename, layout))
+        derived_files += glob.glob(os.path.join(glob.escape(derived_dir), f"{glob.escape(stem)}[_.]*"))
+    return derived_files
+
+def delete_derived_files(file_path: str) -> int:
+    """删除原图对应的所有衍生文件，返回删除数量"""
+    deleted = 0
+    for derived_path in list_derived_files(file_path):
+        if delete_file(derived_path):
+            deleted += 1
+        prune_empty_dirs(derived_path)
+    return deleted
+
+async def delete_image_files(file_path: str) -> bool:
+    """删除原图及其衍生文件
+
+    非本地存储后端只删除原图（衍生文件只在本地存储时生成）。
+    """
+    storage = get_storage()
+    if not storage.is_local:
+        try:
+            return await storage.delete(file_path)
+        except Exception as e:
+            print(f"删除存储文件失败: {str(e)}")
+            return False
+    return delete_local_image_files(file_path)
+
+def delete_local_image_files(file_path: str) -> bool:
+    """删除本机上的原图及其衍生文件，并清理因此变空的分片目录
+
+    迁移过程中数据库路径可能尚未更新，找不到时按文件名在所有布局中查找。
+    """
+    deleted = delete_file(file_path)
+    if not deleted:
+        resolved_path = resolve_image_path(*split_image_path(file_path))
+        if resolved_path:
+            deleted = delete_file(resolved_path)
+            file_path = resolved_path
+    delete_derived_files(file_path)
+    prune_empty_dirs(file_path)
+    return deleted
+
+def prune_empty_dirs(file_path: str) -> None:
+    """从文件所在目录向上逐级删除空目录，直到用户目录（含），冷存储同样适用
+
+    直接尝试rmdir，目录非空时失败即停止，无需listdir遍历大目录。
+    """
+    upload_root = os.path.abspath(_get_root(file_path))
+    current_dir = os.path.abspath(os.path.dirname(file_path))
+    while current_dir.startswith(upload_root + os.sep):
+        try:
+            os.rmdir(current_dir)
+        except OSError:
+            # 目录非空或不存在
+            return
+        current_dir = os.path.dirname(current_dir)
+
 def get_user_dir(username: str) -> str:
     """获取用户目录"""
     return os.path.join(settings.UPLOAD_FOLDER, username)
 
 def clear_empty_user_dir(username: str) -> None:
     """清理空用户目录"""
-    # 清理图片目录
-    user_image_dir = os.path.join(settings.UPLOAD_FOLDER, username, "images")
-    try:
-        if os.path.exists(user_image_dir):
-            if len(os.listdir(user_image_dir)) == 0:
-                os.rmdir(user_image_dir)
-                # 清理用户根目录
-                user_dir = os.path.join(settings.UPLOAD_FOLDER, username)
-                if os.path.exists(user_dir) and len(os.listdir(user_dir)) == 0:
-                    os.rmdir(user_dir)
-    except PermissionError as e:
-        print(f"清理空目录权限不足: {str(e)}")
-    except OSError as e:
-        print(f"清理空目录系统错误: {str(e)}")
-    except Exception as e:
-        print(f"清理空目录未知错误: {str(e)}")
+    # 依次尝试删除图片目录、衍生图片目录和用户根目录，非空时rmdir失败即保留
+    user_dir = get_user_dir(username)
+    for sub_dir in (os.path.join(user_dir, "images"), get_derived_dir(username), user_dir):
+        try:
+            os.rmdir(sub_dir)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            # 目录非空
+            continue
 
 
 async def init_chunk_upload(username: str, filename: str, file_size: int, total_chunks: int) -> Tuple[str, str]:
@@ -155,8 +363,12 @@ async def init_chunk_upload(username: str, filename: str, file_size: int, total_
     return upload_id, temp_dir
 
 
-async def save_chunk(upload_id: str, chunk_index: int, file: UploadFile) -> None:
-    """保存单个切片"""
+async def save_chunk(upload_id: str, chunk_index: int, file: UploadFile, file_extension: Optional[str] = None,
+                     max_total: Optional[int] = None) -> None:
+    """保存单个切片（传入file_extension时校验第一个切片的文件头）
+
+    传入max_total时边写边检查，所有切片的总大小超过max_total时删除本切片并返回413。
+    """
     # 临时文件路径
     temp_dir = os.path.join(settings.TEMP_UPLOAD_FOLDER, upload_id)
     chunk_file_path = os.path.join(temp_dir, f"chunk_{chunk_index}")
@@ -168,29 +380,55 @@ async def save_chunk(upload_id: str, chunk_index: int, file: UploadFile) -> None
             detail="上传会话不存在"
         )
     
+    # 第一个切片包含文件头，写盘前校验真实格式
+    if chunk_index == 0 and file_extension:
+        header = await file.read(PROBE_HEADER_SIZE)
+        validate_image_header(header, file_extension)
+        await file.seek(0)
+    
+    # 本切片最多可写入的字节数：声明的文件大小减去其他切片已写入的大小
+    limit = None
+    if max_total is not None:
+        limit = max_total - sum(
+            os.path.getsize(path) for path in glob.glob(os.path.join(temp_dir, "chunk_*"))
+            if path != chunk_file_path
+        )
+    
     # 保存切片
+    exceeded = False
     try:
         async with aiofiles.open(chunk_file_path, 'wb') as f:
             # 使用循环读取文件内容，确保正确读取所有数据
             chunk_size = 1024 * 1024  # 1MB chunks
+            written = 0
             while True:
                 content = await file.read(chunk_size)
                 if not content:
                     break
+                written += len(content)
+                if limit is not None and written > limit:
+                    exceeded = True
+                    break
                 await f.write(content)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"保存切片失败: {str(e)}"
         )
+    if exceeded:
+        os.remove(chunk_file_path)
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="切片总大小超过初始化时声明的文件大小"
+        )
 
 
-async def merge_chunks(upload_id: str, username: str, filename: str, total_chunks: int) -> Tuple[str, str]:
-    """合并所有切片成完整文件"""
-    
-    # 创建用户目录结构：static/{username}/images/
-    user_image_dir = os.path.join(settings.UPLOAD_FOLDER, username, "images")
-    os.makedirs(user_image_dir, exist_ok=True)
+async def merge_chunks(upload_id: str, username: str, filename: str, total_chunks: int) -> Tuple[str, str, dict]:
+    """合并所有切片成完整文件
+
+    Returns:
+        Tuple[str, str, dict]: 本地路径、访问URL、文件头探测结果（格式和尺寸）
+    """
     
     # 获取文件扩展名
     file_extension = filename.split(".")[-1].lower()
@@ -198,8 +436,8 @@ async def merge_chunks(upload_id: str, username: str, filename: str, total_chunk
     # 生成唯一的文件名，避免冲突
     unique_filename = generate_nicname(username, file_extension)
     
-    # 文件路径：使用唯一文件名进行保存
-    file_path = os.path.join(user_image_dir, unique_filename)
+    # 文件路径：按存储布局解析，如 static/{username}/images/{xx}/{yy}/{filename}
+    file_path = get_image_path(username, unique_filename)
     
     # 临时目录路径
     temp_dir = os.path.join(settings.TEMP_UPLOAD_FOLDER, upload_id)
@@ -220,27 +458,27 @@ async def merge_chunks(upload_id: str, username: str, filename: str, total_chunk
                 detail=f"切片 {i} 未上传"
             )
     
-    # 合并切片
+    # 根据第一个切片的文件头探测真实格式和尺寸
+    async with aiofiles.open(os.path.join(temp_dir, "chunk_0"), 'rb') as chunk_file:
+        header = await chunk_file.read(PROBE_HEADER_SIZE)
+    with span("probe", UPLOAD_STAGE):
+        probe = validate_image_header(header, file_extension)
+    
+    # 合并切片：按顺序流式写入存储后端，写入失败时由存储后端清理不完整的文件
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            for i in range(total_chunks):
-                chunk_file_path = os.path.join(temp_dir, f"chunk_{i}")
-                async with aiofiles.open(chunk_file_path, 'rb') as chunk_file:
-                    chunk_content = await chunk_file.read()
-                    await f.write(chunk_content)
+        with span("write"):
+            written = await get_storage().put_stream(file_path, iter_chunk_files(temp_dir, total_chunks))
+        UPLOAD_BYTES.labels("chunked").inc(written)
     except Exception as e:
-        # 清理已合并的文件
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"合并切片失败: {str(e)}"
         )
     
     # 生成URL：使用唯一文件名
-    url = f"{settings.BASE_URL}/{settings.UPLOAD_FOLDER}/{username}/images/{unique_filename}"
+    url = generate_image_url(username, unique_filename)
     
-    return file_path, url
+    return file_path, url, probe
 
 
 async def cleanup_chunk_upload(upload_id: str) -> None:
@@ -282,6 +520,25 @@ async def cleanup_expired_chunks() -> None:
                 print(f"清理临时目录 {chunk_dir} 失败: {str(e)}")
 
 
+def count_chunk_sessions() -> int:
+    """统计进行中的切片上传会话数（每个会话对应一个临时目录）"""
+    try:
+        with os.scandir(settings.TEMP_UPLOAD_FOLDER) as entries:
+            return sum(1 for entry in entries if entry.is_dir())
+    except FileNotFoundError:
+        return 0
+
+
+def get_chunk_upload_size(upload_id: str) -> int:
+    """切片上传会话已上传的总字节数（会话不存在时为0）"""
+    temp_dir = os.path.join(settings.TEMP_UPLOAD_FOLDER, os.path.basename(upload_id))
+    try:
+        with os.scandir(temp_dir) as entries:
+            return sum(entry.stat().st_size for entry in entries if entry.is_file())
+    except FileNotFoundError:
+        return 0
+
+
 async def get_chunk_upload_status(upload_id: str, total_chunks: int) -> int:
     """获取切片上传状态（已上传切片数）"""
     temp_dir = os.path.join(settings.TEMP_UPLOAD_FOLDER, upload_id)
@@ -1,5 +1,6 @@
 import os
 from src.config import settings
+from src.storage import get_storage
 from typing import Optional
 import base64
 import requests
@@ -8,7 +9,7 @@ async def upload_to_gitee(file_path: str, filename: str) -> Optional[str]:
     """纯Python实现：上传文件到Gitee仓库的images目录
     
     Args:
-        file_path: 本地文件路径
+        file_path: 文件存储路径（Image.path）
         filename: 文件名
         
     Returns:
@@ -23,14 +24,13 @@ async def upload_to_gitee(file_path: str, filename: str) -> Optional[str]:
         pure_filename = os.path.basename(file_path)
         target_path = f"images/{pure_filename}"
         
-        # 读取并Base64编码文件
-        with open(file_path, "rb") as f:
-            file_content = f.read()
+        # 从存储后端读取并Base64编码文件
+        file_content = await get_storage().read(file_path)
         
         encoded_content = base64.b64encode(file_content).decode("utf-8")
         
         # 构建API请求
-        api_url = f"https://gitee.com/api/v5/repos/{settings.GITEE_REPO_OWNER}/{settings.GITEE_REPO_NAME}/contents/{target_path}"
+        api_url = f"{settings.GITEE_API_URL}/repos/{settings.GITEE_REPO_OWNER}/{settings.GITEE_REPO_NAME}/contents/{target_path}"
         
         # 准备请求头和数据
         headers = {
@@ -0,0 +1,268 @@
+import io
+import os
+import base64
+import shutil
+import subprocess
+from typing import List
+from PIL import Image as PILImage, ImageOps, ImageSequence
+
+# 本模块中的函数运行在进程池的子进程里，只做纯文件处理，不访问数据库
+
+# 低清占位图的最大边长（像素）
+PLACEHOLDER_SIZE = 16
+
+# 各格式的保存参数
+_SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80, "method": 4},
+    "AVIF": {"quality": 60, "speed": 6},
+}
+
+
+def render_derivatives(file_path: str, variant_paths: dict) -> dict:
+    """解码一次原图，生成响应式缩略图和低清占位图
+
+    Args:
+        file_path: 原图路径
+        variant_paths: {宽度: 输出路径}
+
+    Returns:
+        dict: {"variants": 实际生成的宽度列表（不会放大原图，动图跳过）,
+               "placeholder": 低清占位图data URI,
+               "width"/"height": 按EXIF方向校正后的显示尺寸}
+    """
+    generated = []
+    with PILImage.open(file_path) as img:
+        image_format = img.format
+        is_animated = getattr(img, "is_animated", False)
+        # 按EXIF方向校正，保证衍生图片方向与浏览器显示的原图一致
+        img = ImageOps.exif_transpose(img)
+
+        # 动图缩放会丢失动画，交给原图提供
+        widths = [] if is_animated else sorted(variant_paths)
+        for width in widths:
+            if width >= img.width:
+                continue
+
+            height = max(1, round(img.height * width / img.width))
+            resized = img.resize((width, height), PILImage.LANCZOS)
+            if image_format == "JPEG" and resized.mode not in ("RGB", "L"):
+                resized = resized.convert("RGB")
+
+            output_path = variant_paths[width]
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            # 先写临时文件再重命名，避免被读到半个文件
+            temp_path = f"{output_path}.tmp"
+            resized.save(temp_path, format=image_format, **_SAVE_OPTIONS.get(image_format, {}))
+            os.replace(temp_path, output_path)
+            generated.append(width)
+
+        return {
+            "variants": generated,
+            "placeholder": _render_placeholder(img),
+            "width": img.width,
+            "height": img.height,
+        }
+
+
+def _render_placeholder(img: PILImage.Image) -> str:
+    """生成低清占位图（LQIP）：缩小到 PLACEHOLDER_SIZE 以内的WebP，以data URI返回"""
+    thumb = img.convert("RGBA" if img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info else "RGB")
+    thumb.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), PILImage.BILINEAR)
+    buffer = io.BytesIO()
+    thumb.save(buffer, format="WEBP", quality=30)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def transcode_image(file_path: str, output_path: str, image_format: str) -> bool:
+    """将原图转码为指定格式（WEBP/AVIF）
+
+    转码结果不小于原图或原图是动图（APNG，转码只保留第一帧）时不保留，
+    改为写入 {output_path}.skip 标记，后续请求直接返回原图。
+
+    Returns:
+        bool: 是否生成了可用的转码文件
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temp_path = f"{output_path}.tmp"
+    try:
+        with PILImage.open(file_path) as img:
+            if getattr(img, "is_animated", False):
+                return _keep_if_smaller(temp_path, output_path, 0)
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+            img.save(temp_path, format=image_format, **_SAVE_OPTIONS.get(image_format, {}))
+
+    except Exception as e:
+        print(f"图片转码失败 {file_path} -> {image_format}: {str(e)}")
+        return _keep_if_smaller(temp_path, output_path, 0)
+
+    return _keep_if_smaller(temp_path, output_path, os.path.getsize(file_path))
+
+
+# ffmpeg转码参数：偶数尺寸（yuv420p要求）、去掉音轨、MP4把索引前置便于边下边播
+_FFMPEG_VIDEO_OPTIONS = {
+    "mp4": ["-c:v", "libx264", "-crf", "26", "-preset", "medium", "-movflags", "+faststart"],
+    "webm": ["-c:v", "libvpx-vp9", "-crf", "40", "-b:v", "0"],
+}
+
+
+def _keep_if_smaller(temp_path: str, output_path: str, original_size: int) -> bool:
+    """转换结果小于原图时原子替换到输出路径，否则删除并写入 .skip 标记"""
+    if os.path.exists(temp_path) and os.path.getsize(temp_path) < original_size:
+        os.replace(temp_path, output_path)
+        return True
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    open(f"{output_path}.skip", "wb").close()
+    return False
+
+
+def convert_animation(file_path: str, webp_path: str, video_paths: dict, max_pixels: int) -> List[str]:
+    """将GIF转换为动态WebP，以及（本机有ffmpeg时）MP4/WebM视频
+
+    Args:
+        file_path: GIF原图路径
+        webp_path: 动态WebP输出路径
+        video_paths: {视频格式: 输出路径}，如 {"mp4": ".../x.mp4"}
+        max_pixels: 帧数×宽×高的上限，超过时不转换
+
+    Returns:
+        List[str]: 成功生成且比原图小的格式列表
+    """
+    original_size = os.path.getsize(file_path)
+    os.makedirs(os.path.dirname(webp_path), exist_ok=True)
+    converted = []
+
+    temp_path = f"{webp_path}.tmp"
+    try:
+        with PILImage.open(file_path) as img:
+            is_animated = getattr(img, "is_animated", False)
+            # 解码前按帧数和尺寸估算工作量，拒绝帧数极多的大尺寸动图
+            n_frames = getattr(img, "n_frames", 1)
+            if n_frames * img.width * img.height > max_pixels:
+                print(f"GIF帧数×尺寸超过限制，跳过转换 {file_path}: {n_frames}帧 {img.width}x{img.height}")
+                return converted
+            durations = [frame.info.get("duration", 100) for frame in ImageSequence.Iterator(img)]
+            img.seek(0)
+            # 编码器逐帧读取并转换，不同时在内存中保留所有解码后的帧
+            img.save(
+                temp_path, format="WEBP", save_all=True,
+                duration=durations, loop=img.info.get("loop", 0), **_SAVE_OPTIONS["WEBP"]
+            )
+        if _keep_if_smaller(temp_path, webp_path, original_size):
+            converted.append("webp")
+    except Exception as e:
+        print(f"GIF转换WebP失败 {file_path}: {str(e)}")
+        _keep_if_smaller(temp_path, webp_path, 0)
+        is_animated = False
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg or not is_animated:
+        return converted
+
+    for video_format, output_path in video_paths.items():
+        temp_path = f"{output_path}.tmp"
+        command = [
+            ffmpeg, "-y", "-loglevel", "error", "-i", file_path,
+            "-an", "-pix_fmt", "yuv420p", "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+            *_FFMPEG_VIDEO_OPTIONS[video_format], "-f", video_format, temp_path
+        ]
+        try:
+            result = subprocess.run(command, capture_output=True, timeout=300)
+            if result.returncode != 0:
+                print(f"GIF转换{video_format}失败 {file_path}: {result.stderr.decode(errors='ignore')}")
+        except Exception as e:
+            print(f"GIF转换{video_format}失败 {file_path}: {str(e)}")
+        if _keep_if_smaller(temp_path, output_path, original_size):
+            converted.append(video_format)
+
+    return converted
+
+
+# EXIF方向值对应的jpegtran无损变换参数
+_JPEGTRAN_TRANSFORMS = {
+    2: ["-flip", "horizontal"],
+    3: ["-rotate", "180"],
+    4: ["-flip", "vertical"],
+    5: ["-transpose"],
+    6: ["-rotate", "90"],
+    7: ["-transverse"],
+    8: ["-rotate", "270"],
+}
+
+
+def _optimize_png(file_path: str, temp_path: str) -> bool:
+    """PNG：校正方向、去除元数据并以最高压缩等级重新编码（像素无损）
+
+    动态PNG（APNG）跳过：重新编码只会保留第一帧。
+    """
+    with PILImage.open(file_path) as img:
+        if getattr(img, "is_animated", False):
+            return False
+        img.load()
+        options = {"optimize": True}
+        # 保留色彩配置和透明色，其余文本/EXIF块全部丢弃
+        if img.info.get("icc_profile"):
+            options["icc_profile"] = img.info["icc_profile"]
+        if "transparency" in img.info:
+            options["transparency"] = img.info["transparency"]
+        ImageOps.exif_transpose(img).save(temp_path, format="PNG", **options)
+    return True
+
+
+def _optimize_jpeg(file_path: str, temp_path: str) -> bool:
+    """JPEG：使用jpegtran做无损的方向校正、元数据去除和霍夫曼表优化
+
+    Pillow重新编码JPEG必然有损，未安装jpegtran时跳过。
+    """
+    jpegtran = shutil.which("jpegtran")
+    if not jpegtran:
+        return False
+
+    with PILImage.open(file_path) as img:
+        orientation = img.getexif().get(0x0112, 1)
+
+    command = [jpegtran, "-copy", "icc", "-optimize", "-progressive"]
+    if orientation in _JPEGTRAN_TRANSFORMS:
+        # -perfect：无法无损变换（尺寸不是MCU整数倍）时直接失败，不做有损裁剪
+        command += ["-perfect"] + _JPEGTRAN_TRANSFORMS[orientation]
+    command += ["-outfile", temp_path, file_path]
+
+    result = subprocess.run(command, capture_output=True, timeout=120)
+    return result.returncode == 0
+
+
+def optimize_image(file_path: str) -> int:
+    """无损优化原图，只有变小时才原子替换
+
+    Returns:
+        int: 节省的字节数，未替换时为0
+    """
+    temp_path = f"{file_path}.opt"
+    try:
+        with PILImage.open(file_path) as img:
+            image_format = img.format
+
+        if image_format == "PNG":
+            optimized = _optimize_png(file_path, temp_path)
+        elif image_format == "JPEG":
+            optimized = _optimize_jpeg(file_path, temp_path)
+        else:
+            optimized = False
+
+        if optimized and os.path.exists(temp_path):
+            original_size = os.path.getsize(file_path)
+            saved = original_size - os.path.getsize(temp_path)
+            if saved > 0:
+                os.replace(temp_path, file_path)
+                return saved
+    except Exception as e:
+        print(f"原图优化失败 {file_path}: {str(e)}")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return 0
@@ -0,0 +1,130 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from typing import Dict, Optional, Tuple
+from src.utils.metrics import EVENT_LOOP_LAG, EVENT_LOOP_BLOCKED, route_label
+from src.config import settings
+
+# 阻塞日志中保留的调用栈层数（从阻塞点向外）
+STACK_LIMIT = 20
+
+
+class LoopBlockedError(RuntimeError):
+    """测试模式下请求阻塞事件循环超过 LOOP_BLOCK_FAIL_MS"""
+
+
+def _find_request(frame) -> Optional[dict]:
+    """沿调用栈向外查找正在处理的HTTP请求的scope
+
+    事件循环被阻塞时，阻塞点所在协程的帧通过 f_back 串联到ASGI服务器调用应用的帧，
+    各层中间件和路由的局部变量 scope 指向同一个字典，取最外层的一个。
+    """
+    found = None
+    while frame is not None:
+        try:
+            scope = frame.f_locals.get("scope")
+        except Exception:
+            scope = None
+        if isinstance(scope, dict) and scope.get("type") == "http":
+            found = scope
+        frame = frame.f_back
+    return found
+
+
+class LoopMonitor:
+    """事件循环延迟监控
+
+    协程按固定间隔休眠，实际唤醒时间与预期的差值即调度延迟，记录到 event_loop_lag_seconds；
+    看门狗线程检查协程的心跳，超过 LOOP_BLOCK_THRESHOLD_MS 未更新时说明事件循环被阻塞，
+    采集事件循环线程的调用栈和正在处理的路由写入日志。
+    """
+
+    def __init__(self, interval: float, threshold_ms: int, fail_ms: int = 0):
+        self.interval = interval
+        self.threshold = threshold_ms / 1000
+        # 测试模式：阻塞超过该时长的请求结束时抛出 LoopBlockedError，0表示关闭
+        self.fail_after = fail_ms / 1000
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+        # id(scope) -> (阻塞毫秒数, 调用栈)，测试模式下由看门狗写入、请求结束时取出
+        self._violations: Dict[int, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """在事件循环中启动（应用startup事件中调用）"""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _measure(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, loop.time() - start - self.interval))
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        limits = [limit for limit in (self.threshold, self.fail_after) if limit > 0]
+        check_interval = max(0.005, min(limits) / 4)
+        current_stall = None
+        logged = failed = False
+        while not self._stop.wait(check_interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < min(limits):
+                continue
+            if heartbeat != current_stall:
+                # 新的一次阻塞
+                current_stall = heartbeat
+                logged = failed = False
+            if logged and (failed or not self.fail_after):
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            scope = _find_request(frame)
+            stack = "".join(traceback.format_stack(frame, limit=STACK_LIMIT))
+            del frame
+
+            if not logged and stalled >= self.threshold:
+                logged = True
+                route = route_label(scope) if scope else "none"
+                EVENT_LOOP_BLOCKED.labels(route).inc()
+                request = f"{scope['method']} {scope['path']}" if scope else "无请求"
+                print(f"事件循环已阻塞 {stalled * 1000:.0f}ms（{request}，路由 {route}），阻塞位置:\n{stack}")
+            if self.fail_after and not failed and stalled >= self.fail_after and scope is not None:
+                failed = True
+                with self._lock:
+                    self._violations[id(scope)] = (stalled * 1000, stack)
+
+    def check_request(self, scope: dict) -> None:
+        """测试模式：请求处理期间阻塞事件循环超过 LOOP_BLOCK_FAIL_MS 时抛出 LoopBlockedError"""
+        with self._lock:
+            violation = self._violations.pop(id(scope), None)
+        if violation is not None:
+            blocked_ms, stack = violation
+            raise LoopBlockedError(
+                f"{scope['method']} {scope['path']} 阻塞事件循环 {blocked_ms:.0f}ms"
+                f"（上限 {self.fail_after * 1000:.0f}ms），阻塞位置:\n{stack}"
+            )
+
+
+loop_monitor = LoopMonitor(
+    settings.LOOP_LAG_INTERVAL,
+    settings.LOOP_BLOCK_THRESHOLD_MS,
+    settings.LOOP_BLOCK_FAIL_MS,
+)
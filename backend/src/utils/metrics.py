@@ -0,0 +1,90 @@
+import os
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+
+# gunicorn多worker部署时设置环境变量 PROMETHEUS_MULTIPROC_DIR：各进程把指标写入该目录下的文件，
+# 抓取 /metrics 时汇总所有worker的数据，无论请求落到哪个worker结果都一致
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# 秒级耗时的直方图分桶：覆盖从毫秒级的路由到数秒的上传
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# HTTP请求
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP请求耗时（按路由模板）",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+
+# 上传与访问流量
+UPLOAD_BYTES = Counter("image_upload_bytes_total", "上传写入存储的字节数", ["method"])
+SERVED_BYTES = Counter("image_served_bytes_total", "图片访问返回的字节数", ["kind"])
+UPLOAD_STAGE = Histogram(
+    "image_upload_stage_seconds", "上传各阶段耗时：save（读取并写入存储）、probe（文件头校验）、db_commit、gitee",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+CHUNK_SESSIONS = Gauge(
+    "chunk_upload_sessions", "进行中的切片上传会话数（抓取时统计临时目录）",
+    multiprocess_mode="mostrecent"
+)
+
+# 上传准入控制（每个worker独立排队，多worker时汇总）
+UPLOAD_QUEUE_DEPTH = Gauge("upload_admission_queue_depth", "等待准入的上传请求数", multiprocess_mode="livesum")
+UPLOAD_INFLIGHT = Gauge("upload_admission_inflight", "正在处理的上传请求数", multiprocess_mode="livesum")
+UPLOAD_INFLIGHT_BYTES = Gauge("upload_admission_inflight_bytes", "正在处理的上传请求体字节数", multiprocess_mode="livesum")
+UPLOAD_QUEUE_WAIT = Histogram("upload_admission_wait_seconds", "上传请求排队等待准入的时间", buckets=LATENCY_BUCKETS)
+UPLOAD_SHED = Counter("upload_admission_rejected_total", "排队超时或队列已满被拒绝（503）的上传请求数", ["reason"])
+
+# 密码和外部Token的bcrypt计算
+PASSWORD_HASH = Histogram("password_hash_seconds", "bcrypt哈希和校验耗时", ["operation"], buckets=LATENCY_BUCKETS)
+
+# 限流
+RATE_LIMIT_REJECTED = Counter("rate_limit_rejected_total", "超出限流额度被拒绝（429）的请求数", ["budget"])
+
+# 数据库连接池与SQL语句
+DB_POOL_CHECKOUT_WAIT = Histogram("db_pool_checkout_wait_seconds", "从连接池获取连接的等待时间", buckets=LATENCY_BUCKETS)
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "已借出的数据库连接数", multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "超出pool_size的溢出连接数", multiprocess_mode="livesum")
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL语句执行耗时", ["operation"], buckets=LATENCY_BUCKETS)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "每个请求执行的SQL语句数",
+    ["route"], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+)
+DB_REPEATED_QUERIES = Counter("db_repeated_queries_total", "同一请求中重复执行超过阈值的SQL语句（疑似N+1查询）", ["route"])
+
+# 后台进程池
+BACKGROUND_LAG = Histogram(
+    "background_task_lag_seconds", "后台任务从提交到开始执行的排队时间",
+    ["pool"], buckets=LATENCY_BUCKETS
+)
+BACKGROUND_DURATION = Histogram("background_task_duration_seconds", "后台任务执行耗时", ["pool"], buckets=LATENCY_BUCKETS)
+BACKGROUND_PENDING = Gauge("background_tasks_pending", "排队和执行中的后台任务数", ["pool"], multiprocess_mode="livesum")
+BACKGROUND_REJECTED = Counter("background_tasks_rejected_total", "进程池饱和被拒绝的后台任务数", ["pool"])
+
+# 按用户公平调度（写盘和后台处理），user为用户ID
+# 不按用户打标签：用户数无上限，多进程模式下标签一旦出现就会一直保留在指标文件中
+FAIR_QUEUE_DEPTH = Gauge("fair_queue_depth", "公平调度队列中排队的任务数", ["stage"], multiprocess_mode="livesum")
+FAIR_QUEUE_USERS = Gauge("fair_queue_users", "有任务排队的用户数", ["stage"], multiprocess_mode="livesum")
+FAIR_QUEUE_WAIT = Histogram("fair_queue_wait_seconds", "任务在公平调度队列中的等待时间", ["stage"], buckets=LATENCY_BUCKETS)
+
+# 事件循环
+EVENT_LOOP_LAG = Histogram("event_loop_lag_seconds", "事件循环调度延迟（定时唤醒的实际时间与预期之差）", buckets=LATENCY_BUCKETS)
+EVENT_LOOP_BLOCKED = Counter("event_loop_blocked_total", "事件循环阻塞超过阈值的次数（按阻塞时正在处理的路由）", ["route"])
+
+
+def route_label(scope) -> str:
+    """请求对应的路由模板，静态文件统一归为 /static"""
+    # 路由匹配后FastAPI会把路由对象写入scope
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope["path"].startswith("/static/"):
+        return "/static"
+    return "unmatched"
+
+
+def render_metrics() -> bytes:
+    """生成Prometheus文本格式的指标（多进程模式下汇总所有worker）"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
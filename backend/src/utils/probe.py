@@ -0,0 +1,102 @@
+import struct
+from typing import Optional
+
+# 探测图片格式和尺寸最多读取的头部字节数（JPEG的SOF段可能位于较大的EXIF之后）
+PROBE_HEADER_SIZE = 64 * 1024
+
+# 文件扩展名对应的真实格式
+EXTENSION_FORMATS = {
+    "jpg": "jpeg",
+    "jpeg": "jpeg",
+    "png": "png",
+    "gif": "gif",
+    "webp": "webp",
+}
+
+# JPEG中携带图像尺寸的SOF段标记（排除DHT/JPG/DAC）
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _probe_png(header: bytes) -> dict:
+    if len(header) < 24 or header[12:16] != b"IHDR":
+        return {"format": "png", "width": None, "height": None}
+    width, height = struct.unpack(">II", header[16:24])
+    return {"format": "png", "width": width, "height": height}
+
+
+def _probe_gif(header: bytes) -> dict:
+    if len(header) < 10:
+        return {"format": "gif", "width": None, "height": None}
+    width, height = struct.unpack("<HH", header[6:10])
+    return {"format": "gif", "width": width, "height": height}
+
+
+def _probe_webp(header: bytes) -> dict:
+    chunk = header[12:16]
+    width = height = None
+    if chunk == b"VP8 " and len(header) >= 30:
+        # 有损：帧头起始码之后是14位宽高
+        width, height = struct.unpack("<HH", header[26:30])
+        width, height = width & 0x3FFF, height & 0x3FFF
+    elif chunk == b"VP8L" and len(header) >= 25:
+        # 无损：签名字节0x2F之后依次是14位(宽-1)、14位(高-1)
+        bits = int.from_bytes(header[21:25], "little")
+        width, height = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    elif chunk == b"VP8X" and len(header) >= 30:
+        # 扩展格式（动图/透明）：24位(宽-1)、24位(高-1)
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+    return {"format": "webp", "width": width, "height": height}
+
+
+def _probe_jpeg(header: bytes) -> dict:
+    offset = 2
+    while offset + 4 <= len(header):
+        if header[offset] != 0xFF:
+            break
+        marker = header[offset + 1]
+        # 填充字节
+        if marker == 0xFF:
+            offset += 1
+            continue
+        # 无长度字段的独立标记
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", header[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 9 > len(header):
+                break
+            height, width = struct.unpack(">HH", header[offset + 5:offset + 9])
+            return {"format": "jpeg", "width": width, "height": height}
+        # 到达图像数据仍未找到SOF
+        if marker == 0xDA:
+            break
+        offset += 2 + segment_length
+    return {"format": "jpeg", "width": None, "height": None}
+
+
+def probe_image(header: bytes) -> Optional[dict]:
+    """仅根据文件头部字节探测图片真实格式和尺寸
+
+    Args:
+        header: 文件开头的字节（建议至少 PROBE_HEADER_SIZE 字节）
+
+    Returns:
+        Optional[dict]: {"format", "width", "height"}，无法识别格式时返回None；
+            头部不足以确定尺寸时宽高为None
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _probe_png(header)
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return _probe_gif(header)
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return _probe_webp(header)
+    if header.startswith(b"\xff\xd8\xff"):
+        return _probe_jpeg(header)
+    return None
+
+
+def probe_matches_extension(probe: Optional[dict], file_extension: str) -> bool:
+    """检查探测到的真实格式是否与扩展名一致"""
+    return probe is not None and EXTENSION_FORMATS.get(file_extension.lower()) == probe["format"]
@@ -0,0 +1,217 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# 采样时忽略的空闲栈：叶子帧位于这些模块时线程在等待IO或任务，不占用CPU
+_IDLE_MODULES = ("selectors.py", "threading.py", "queue.py")
+# 在C函数中阻塞等待的空闲线程，叶子帧就是调用方：(文件名, 函数名)
+_IDLE_FRAMES = {("thread.py", "_worker")}  # concurrent.futures 线程池等待任务
+
+# 每个worker保留的内存快照数
+MAX_MEMORY_SNAPSHOTS = 10
+
+# 内存快照统计时忽略的分配（tracemalloc自身和模块导入）
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+Frame = Tuple[str, str, int]  # (函数名, 文件, 行号)
+
+
+def _frame_key(frame) -> Frame:
+    code = frame.f_code
+    return getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno
+
+
+def _stack(frame) -> Optional[Tuple[Frame, ...]]:
+    """从叶子帧向上收集调用栈，返回从根到叶子的帧元组，空闲线程返回None"""
+    module = os.path.basename(frame.f_code.co_filename)
+    if module in _IDLE_MODULES or (module, frame.f_code.co_name) in _IDLE_FRAMES:
+        return None
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class SamplingProfiler:
+    """基于 sys._current_frames 的采样CPU分析器
+
+    后台线程按固定间隔采集当前进程所有线程的调用栈（不含空闲线程），停止或达到最长时间后把结果写入
+    output_path。不修改被分析的代码，也不安装trace/profile钩子，关闭时没有任何开销。
+    同一worker中并发的其他请求也会出现在采样中。
+    """
+
+    def __init__(self, name: str, output_path: str, interval: float, max_duration: float):
+        self.name = name
+        self.output_path = output_path
+        self.interval = interval
+        self.max_duration = max_duration
+        self.samples: Counter = Counter()
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{name}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止采样并等待结果写入文件"""
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        start = time.perf_counter()
+        deadline = start + self.max_duration
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _stack(frame)
+                if stack:
+                    self.samples[stack] += 1
+        self.duration = time.perf_counter() - start
+        try:
+            self._save()
+        except Exception as e:
+            print(f"保存CPU分析结果失败 {self.output_path}: {str(e)}")
+
+    def _save(self) -> None:
+        """以帧表+栈的紧凑格式写入文件，读取时再转换为speedscope或折叠栈格式"""
+        frames: Dict[Frame, int] = {}
+        stacks = []
+        for stack, count in self.samples.most_common():
+            stacks.append([[frames.setdefault(frame, len(frames)) for frame in stack], count])
+        os.makedirs(os.path.dirname(self.output_path), exist_ok=True)
+        temp_path = f"{self.output_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({
+                "name": self.name,
+                "pid": os.getpid(),
+                "started_at": self.started_at,
+                "duration": self.duration,
+                "interval": self.interval,
+                "frames": list(frames),
+                "stacks": stacks,
+            }, f)
+        os.replace(temp_path, self.output_path)
+
+
+def _frame_label(frame: list) -> str:
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def to_collapsed(profile: dict) -> str:
+    """折叠栈格式（每行 "根;...;叶 次数"），可直接用于 flamegraph.pl 或导入speedscope"""
+    labels = [_frame_label(frame) for frame in profile["frames"]]
+    return "\n".join(
+        ";".join(labels[index] for index in stack) + f" {count}"
+        for stack, count in profile["stacks"]
+    ) + "\n"
+
+
+def to_speedscope(profile: dict) -> dict:
+    """speedscope 的 sampled 格式（https://www.speedscope.app）"""
+    interval = profile["interval"]
+    samples = [stack for stack, _ in profile["stacks"]]
+    weights = [count * interval for _, count in profile["stacks"]]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": profile["name"],
+        "exporter": "imagebed",
+        "activeProfileIndex": 0,
+        "shared": {
+            "frames": [{"name": name, "file": filename, "line": line} for name, filename, line in profile["frames"]],
+        },
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{profile['name']} (pid {profile['pid']})",
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+class MemoryTracker:
+    """tracemalloc 内存分配快照（每个worker独立保存）"""
+
+    def __init__(self):
+        self._snapshots: "OrderedDict[int, tracemalloc.Snapshot]" = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def current_snapshot(self) -> tracemalloc.Snapshot:
+        """临时采集一次快照（不保存）"""
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def take_snapshot(self) -> Tuple[int, tracemalloc.Snapshot]:
+        """采集并保存快照，超过 MAX_MEMORY_SNAPSHOTS 时丢弃最早的快照"""
+        snapshot = self.current_snapshot()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = snapshot
+            while len(self._snapshots) > MAX_MEMORY_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        return snapshot_id, snapshot
+
+    def get_snapshot(self, snapshot_id: int) -> Optional[tracemalloc.Snapshot]:
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    def snapshot_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._snapshots)
+
+
+def format_statistics(stats: list, limit: int) -> List[dict]:
+    """把 tracemalloc 的 Statistic/StatisticDiff 转换为可序列化的字典"""
+    result = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        entry = {
+            "location": f"{frame.filename}:{frame.lineno}",
+            "size": stat.size,
+            "count": stat.count,
+        }
+        if hasattr(stat, "size_diff"):
+            entry["size_diff"] = stat.size_diff
+            entry["count_diff"] = stat.count_diff
+        result.append(entry)
+    return result
+
+
+memory_tracker = MemoryTracker()
@@ -0,0 +1,17 @@
+"""pytest插件：按接口断言SQL语句数量上限，往返次数回退时测试失败
+
+启用方式：pytest -p src.utils.query_budget，或在 conftest.py 中声明
+pytest_plugins = ["src.utils.query_budget"]
+
+    def test_list_images(client, auth_headers, query_budget):
+        with query_budget(3, "GET /api/images"):
+            client.get("/api/images", headers=auth_headers)
+"""
+import pytest
+from src.utils.query_stats import capture_queries
+
+
+@pytest.fixture
+def query_budget():
+    """返回上下文管理器工厂 query_budget(max_queries, label)，代码块结束时断言执行的SQL语句数"""
+    return capture_queries
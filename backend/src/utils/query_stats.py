@@ -0,0 +1,98 @@
+import re
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from src.utils.metrics import DB_QUERY_DURATION
+
+_OPERATION_PATTERN = re.compile(r"^\s*(\w+)")
+
+
+class QueryStats:
+    """一段时间内（一个请求或一次断言）执行的SQL语句统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float) -> None:
+        # 同一请求的查询可能分别在事件循环和线程池中执行
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        """重复执行超过threshold次的语句（疑似N+1查询）"""
+        return [(statement, count) for statement, count in self.statements.most_common() if count > threshold]
+
+    def describe(self) -> str:
+        return "\n".join(
+            f"  [{count}x] {' '.join(statement.split())}" for statement, count in self.statements.most_common()
+        )
+
+
+# 当前请求的统计，请求开始时由中间件创建，线程池复制上下文后共享同一个对象
+_request_queries: ContextVar[Optional[QueryStats]] = ContextVar("request_queries", default=None)
+
+# 进行中的全局统计（测试断言用，统计所有线程的语句），为空时不产生开销
+_captures: List[QueryStats] = []
+_captures_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """执行的SQL语句数超过预算"""
+
+
+def _operation(statement: str) -> str:
+    match = _OPERATION_PATTERN.match(statement)
+    return match.group(1).upper() if match else "OTHER"
+
+
+def record_query(statement: str, duration: float) -> None:
+    """由数据库引擎的 after_cursor_execute 事件调用"""
+    DB_QUERY_DURATION.labels(_operation(statement)).observe(duration)
+    stats = _request_queries.get()
+    if stats is not None:
+        stats.record(statement, duration)
+    if _captures:
+        with _captures_lock:
+            for capture in _captures:
+                capture.record(statement, duration)
+
+
+def start_request() -> tuple:
+    """开始统计当前请求的SQL语句，返回统计对象和用于恢复上下文的token"""
+    stats = QueryStats()
+    return stats, _request_queries.set(stats)
+
+
+def end_request(token) -> None:
+    _request_queries.reset(token)
+
+
+@contextmanager
+def capture_queries(max_queries: Optional[int] = None, label: str = ""):
+    """统计代码块执行期间所有线程执行的SQL语句，超过max_queries时抛出 QueryBudgetExceeded
+
+        with capture_queries(3, "GET /api/images") as stats:
+            client.get("/api/images", headers=headers)
+    """
+    stats = QueryStats()
+    with _captures_lock:
+        _captures.append(stats)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+    if max_queries is not None and stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label or '代码块'} 执行了 {stats.count} 条SQL语句，预算 {max_queries} 条"
+            f"（耗时 {(time.perf_counter() - start) * 1000:.1f}ms）:\n{stats.describe()}"
+        )
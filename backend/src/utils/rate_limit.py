@@ -0,0 +1,163 @@
+import time
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from src.config import settings
+from src.utils.metrics import RATE_LIMIT_REJECTED
+
+# 令牌桶：容量为每分钟的额度（允许一分钟内的突发），按 额度/60 每秒匀速补充。
+# 在Redis中原子地补充并检查所有key（用户和Token）的桶，全部足够时才一起扣减，返回需要等待的秒数（0表示放行）。
+# 使用Redis服务器时间，多个worker、多台机器的时钟不一致也不影响；
+# 数值以字符串返回，避免Lua数字转为Redis整数回复时丢失小数部分。
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = math.min(tonumber(ARGV[3]), capacity)
+local consume = ARGV[4] == "1"
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local state = redis.call("HMGET", key, "tokens", "ts")
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    levels[i] = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    if levels[i] < cost then
+        wait = math.max(wait, (cost - levels[i]) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+if consume then
+    for i, key in ipairs(KEYS) do
+        redis.call("HSET", key, "tokens", tostring(levels[i] - cost), "ts", tostring(now))
+        redis.call("PEXPIRE", key, math.ceil(capacity / rate * 1000) + 1000)
+    end
+end
+return "0"
+"""
+
+# Redis不可用后重新尝试连接的间隔（秒），期间使用进程内令牌桶
+REDIS_RETRY_INTERVAL = 30
+# 进程内令牌桶数量达到该值时清理已经补满的桶
+MEMORY_MAX_BUCKETS = 100000
+
+
+class MemoryBuckets:
+    """进程内令牌桶（Redis不可用时的降级实现，额度按worker各自计算）"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    def acquire(self, keys: List[str], capacity: float, rate: float, cost: float, consume: bool) -> float:
+        cost = min(cost, capacity)
+        now = time.monotonic()
+        levels = []
+        wait = 0.0
+        for key in keys:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            levels.append(min(capacity, tokens + max(0.0, now - ts) * rate))
+            if levels[-1] < cost:
+                wait = max(wait, (cost - levels[-1]) / rate)
+        if wait or not consume:
+            return wait
+        if len(self._buckets) >= MEMORY_MAX_BUCKETS:
+            self._evict(now)
+        for key, tokens in zip(keys, levels):
+            self._buckets[key] = (tokens - cost, now)
+        return 0.0
+
+    def _evict(self, now: float) -> None:
+        # 容量为每分钟额度，超过一分钟未使用的桶都已补满，删除后与新建的桶等价
+        self._buckets = {key: (tokens, ts) for key, (tokens, ts) in self._buckets.items() if now - ts < 60}
+
+
+class RateLimiter:
+    """按用户和Token分别限流的令牌桶
+
+    预算（每分钟额度，0表示不限制）：
+    - requests：请求次数
+    - upload_bytes：上传字节数（按请求的 Content-Length 计）
+    - auth_failures：鉴权失败次数（失败的外部Token校验要对所有Token做bcrypt计算），按Token和客户端地址计
+    - auth_failures_global：所有客户端合计的鉴权失败次数
+    配置了 REDIS_URL 时所有worker共享Redis中的令牌桶，未配置或Redis不可用时降级为进程内令牌桶。
+    """
+
+    def __init__(self):
+        self.memory = MemoryBuckets()
+        self._script = None
+        self._redis_down_until = 0.0
+
+    @staticmethod
+    def budget(name: str) -> Optional[Tuple[float, float]]:
+        """预算的 (容量, 每秒补充量)，未启用时返回None"""
+        per_minute = {
+            "requests": settings.RATE_LIMIT_REQUESTS_PER_MINUTE,
+            "upload_bytes": settings.RATE_LIMIT_UPLOAD_MB_PER_MINUTE * 1024 * 1024,
+            "auth_failures": settings.RATE_LIMIT_AUTH_FAILURES_PER_MINUTE,
+            "auth_failures_global": settings.RATE_LIMIT_AUTH_FAILURES_GLOBAL_PER_MINUTE,
+        }[name]
+        if not settings.RATE_LIMIT_ENABLED or per_minute <= 0:
+            return None
+        return float(per_minute), per_minute / 60
+
+    def _get_script(self):
+        if self._script is None:
+            import redis.asyncio as redis
+            client = redis.from_url(settings.REDIS_URL, socket_timeout=0.25, socket_connect_timeout=0.25)
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    async def _acquire(self, keys: List[str], capacity: float, rate: float, cost: float, consume: bool) -> float:
+        if settings.REDIS_URL and time.monotonic() >= self._redis_down_until:
+            try:
+                result = await self._get_script()(keys=keys, args=[capacity, rate, cost, "1" if consume else "0"])
+                return float(result)
+            except Exception as e:
+                print(f"限流Redis不可用，{REDIS_RETRY_INTERVAL}秒内使用进程内令牌桶: {str(e)}")
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+        return self.memory.acquire(keys, capacity, rate, cost, consume)
+
+    async def acquire(self, name: str, keys: List[str], cost: float = 1, consume: bool = True) -> float:
+        """从预算 name 下每个key的令牌桶中扣减cost，返回需要等待的秒数（0表示放行）
+
+        任意一个桶额度不足即拒绝，且不扣减其他桶；consume为False时只检查剩余额度。
+        """
+        budget = self.budget(name)
+        if budget is None or not keys:
+            return 0.0
+        capacity, rate = budget
+        return await self._acquire([f"ratelimit:{name}:{key}" for key in keys], capacity, rate, cost, consume)
+
+    async def enforce(self, name: str, keys: List[str], cost: float = 1, consume: bool = True) -> None:
+        """额度不足时返回429，Retry-After为补足额度需要等待的秒数"""
+        retry_after = await self.acquire(name, keys, cost, consume)
+        if retry_after:
+            RATE_LIMIT_REJECTED.labels(name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="请求过于频繁，请稍后重试",
+                headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+
+
+def token_key(token: str) -> str:
+    """Token限流的key，不把Token原文写入Redis"""
+    return "token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+
+
+def client_key(request: Request) -> str:
+    """客户端地址限流的key：配置了 TRUSTED_PROXY_HEADER 时取代理写入的地址，否则取连接的对端地址"""
+    address = None
+    if settings.TRUSTED_PROXY_HEADER:
+        # X-Forwarded-For 中最后一个地址由最近的代理追加，前面的地址可能是客户端伪造的
+        value = request.headers.get(settings.TRUSTED_PROXY_HEADER, "")
+        address = value.split(",")[-1].strip() or None
+    if address is None and request.client:
+        address = request.client.host
+    return f"ip:{address or 'unknown'}"
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,51 @@
+import threading
+from datetime import datetime
+from typing import Dict, Hashable, Tuple
+
+
+class HitCounter:
+    """进程内按小时分桶的命中计数器
+
+    访问路径上只在内存中累加，不写数据库；由后台任务定期取出，批量写入统计表。
+    """
+
+    def __init__(self):
+        self.buckets: Dict[Tuple[Hashable, datetime], list] = {}  # (key, 小时) -> [次数, 字节数, 最近时间]
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable, nbytes: int = 0) -> None:
+        """记录一次命中"""
+        now = datetime.now()
+        bucket = now.replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            entry = self.buckets.get((key, bucket))
+            if entry is None:
+                entry = self.buckets[(key, bucket)] = [0, 0, now]
+            entry[0] += 1
+            entry[1] += nbytes
+            entry[2] = now
+
+    def drain(self) -> Dict[Tuple[Hashable, datetime], list]:
+        """取出并清空累计的命中，返回 {(key, 小时): [次数, 字节数, 最近时间]}"""
+        with self._lock:
+            buckets, self.buckets = self.buckets, {}
+        return buckets
+
+    def restore(self, drained: Dict[Tuple[Hashable, datetime], list]) -> None:
+        """写入数据库失败时把取出的计数放回，下次一起写入"""
+        with self._lock:
+            for bucket_key, (hits, nbytes, last_seen) in drained.items():
+                entry = self.buckets.get(bucket_key)
+                if entry is None:
+                    self.buckets[bucket_key] = [hits, nbytes, last_seen]
+                else:
+                    entry[0] += hits
+                    entry[1] += nbytes
+                    entry[2] = max(entry[2], last_seen)
+
+
+# 图片访问计数，key为缓存分组 (用户名, 主文件名)，原图和衍生文件的访问计入同一张图片
+image_hits = HitCounter()
+
+# 外部Token调用计数，key为 (Token ID, 用户ID)
+token_hits = HitCounter()
@@ -0,0 +1,152 @@
+import json
+import time
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from src.config import settings
+
+# 当前请求已结束的阶段：(名称, 开始时间戳纳秒, 耗时秒)
+# 列表在请求开始时创建，线程池和后台任务复制上下文后共享同一个列表
+_request_spans: ContextVar[Optional[List[Tuple[str, int, float]]]] = ContextVar("request_spans", default=None)
+
+# OpenTelemetry追踪器，未配置时为None
+_provider = None
+_tracer = None
+
+
+@contextmanager
+def span(name: str, histogram=None):
+    """记录一个阶段的耗时
+
+    在请求上下文中时追加到当前请求的阶段列表，用于 Server-Timing 响应头和耗时日志；
+    传入 histogram 时同时以 name 为标签记录到对应的Prometheus直方图。
+    """
+    start = time.perf_counter()
+    start_ns = time.time_ns()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if histogram is not None:
+            histogram.labels(name).observe(duration)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((name, start_ns, duration))
+
+
+def start_request() -> Tuple[List[Tuple[str, int, float]], object]:
+    """开始记录当前请求的阶段，返回阶段列表和用于恢复上下文的token"""
+    spans = []
+    return spans, _request_spans.set(spans)
+
+
+def end_request(token) -> None:
+    _request_spans.reset(token)
+
+
+def summarize(spans: List[Tuple[str, int, float]]) -> Dict[str, list]:
+    """按阶段名汇总耗时（批量上传时同一阶段会出现多次），返回 名称 -> [总耗时毫秒, 次数]"""
+    summary: Dict[str, list] = {}
+    for name, _, duration in spans:
+        entry = summary.setdefault(name, [0.0, 0])
+        entry[0] += duration * 1000
+        entry[1] += 1
+    return summary
+
+
+def format_server_timing(spans: List[Tuple[str, int, float]], total: float) -> str:
+    """生成 Server-Timing 响应头，如 auth;dur=1.2, save;dur=35.0;desc="x3", total;dur=40.1"""
+    metrics = []
+    for name, (duration_ms, count) in summarize(spans).items():
+        metric = f"{name};dur={duration_ms:.1f}"
+        if count > 1:
+            metric += f';desc="x{count}"'
+        metrics.append(metric)
+    metrics.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(metrics)
+
+
+def finish_request(method: str, route: str, status_code: int, start_ns: int, total: float,
+                   spans: List[Tuple[str, int, float]]) -> None:
+    """请求结束：按采样率输出结构化耗时日志，配置了OpenTelemetry时导出链路"""
+    total_ms = total * 1000
+    if (total_ms >= settings.TIMING_LOG_SLOW_MS
+            or (settings.TIMING_LOG_SAMPLE_RATE > 0 and random.random() < settings.TIMING_LOG_SAMPLE_RATE)):
+        print(json.dumps({
+            "event": "request_timing",
+            "method": method,
+            "route": route,
+            "status": status_code,
+            "total_ms": round(total_ms, 1),
+            "spans": {
+                name: round(duration_ms, 1) if count == 1 else {"ms": round(duration_ms, 1), "count": count}
+                for name, (duration_ms, count) in summarize(spans).items()
+            },
+        }, ensure_ascii=False))
+
+    if _tracer is not None:
+        _export(method, route, status_code, start_ns, total, spans)
+
+
+def setup_tracing(exporter=None) -> bool:
+    """初始化OpenTelemetry导出
+
+    未传入 exporter 时按 OTEL_EXPORTER_OTLP_ENDPOINT 配置创建OTLP/HTTP导出器；测试时可传入
+    InMemorySpanExporter 等导出器在进程内接收链路。需要安装 opentelemetry-sdk 和
+    opentelemetry-exporter-otlp-proto-http，未安装或未配置时不导出。
+    """
+    global _provider, _tracer
+    if exporter is None and not settings.OTEL_EXPORTER_OTLP_ENDPOINT:
+        return False
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    except ImportError:
+        print("未安装 opentelemetry-sdk，不导出请求链路")
+        return False
+
+    if exporter is None:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("未安装 opentelemetry-exporter-otlp-proto-http，不导出请求链路")
+            return False
+        processor = BatchSpanProcessor(OTLPSpanExporter(endpoint=settings.OTEL_EXPORTER_OTLP_ENDPOINT))
+    else:
+        # 进程内导出器同步导出，请求结束后即可读取
+        processor = SimpleSpanProcessor(exporter)
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": settings.OTEL_SERVICE_NAME}))
+    _provider.add_span_processor(processor)
+    _tracer = _provider.get_tracer("imagebed")
+    return True
+
+
+def shutdown_tracing() -> None:
+    """刷新尚未导出的链路"""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+        _provider = _tracer = None
+
+
+def _export(method: str, route: str, status_code: int, start_ns: int, total: float,
+            spans: List[Tuple[str, int, float]]) -> None:
+    """按记录的时间戳补建请求的根span和各阶段子span"""
+    from opentelemetry import trace
+
+    try:
+        root = _tracer.start_span(f"{method} {route}", start_time=start_ns, attributes={
+            "http.request.method": method,
+            "http.route": route,
+            "http.response.status_code": status_code,
+        })
+        context = trace.set_span_in_context(root)
+        for name, span_start_ns, duration in spans:
+            child = _tracer.start_span(name, context=context, start_time=span_start_ns)
+            child.end(end_time=span_start_ns + int(duration * 1e9))
+        root.end(end_time=start_ns + int(total * 1e9))
+    except Exception as e:
+        print(f"导出请求链路失败: {str(e)}")
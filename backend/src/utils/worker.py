@@ -0,0 +1,196 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Hashable, Optional, Any
+from src.config import settings
+from src.utils.metrics import BACKGROUND_LAG, BACKGROUND_DURATION, BACKGROUND_PENDING, BACKGROUND_REJECTED
+from src.utils.fair_queue import DeficitRoundRobin
+
+# 保存后台任务引用，防止被垃圾回收
+_tasks: set = set()
+
+
+def _lower_priority(nice: int) -> None:
+    """子进程初始化：降低调度优先级"""
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def _timed_call(fn: Callable, submitted_at: float, args: tuple) -> tuple:
+    """在子进程中执行任务，返回 (排队时间, 执行耗时, 结果)"""
+    started_at = time.time()
+    result = fn(*args)
+    return started_at - submitted_at, time.time() - started_at, result
+
+
+class BackgroundPool:
+    """有界的后台进程池
+
+    进程池在首次提交任务时创建，避免导入时就派生子进程；
+    任务先按用户排队，进程池中最多同时有 max_workers 个任务，空出时按DRR轮流取各用户的任务，
+    一个用户批量上传产生的大量任务不会让其他用户的任务排在整批之后；
+    排队和执行中的任务数达到上限后，提交者占用未超过平均份额时丢弃占用最多的用户的最新任务，
+    否则拒绝新任务（背压），由调用方决定降级方式。
+    任务被拒绝、丢弃或因进程池损坏未能完成时执行其 on_drop 回调，调用方据此记录未完成的任务，之后重新提交；
+    任务本身抛出异常时只执行 on_error 回调，重试也会同样失败，不再重新提交。
+    子进程异常退出导致进程池损坏时丢弃该进程池，下一个任务重新创建。
+    """
+
+    def __init__(self, name: str, max_workers: int, queue_size: int, nice: int = 0):
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.nice = nice
+        self.pending = 0  # 已提交但尚未完成的任务数（排队 + 执行中）
+        self.running = 0  # 已交给进程池的任务数
+        self._queue = DeficitRoundRobin(name, quantum=1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        """获取进程池"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_lower_priority,
+                initargs=(self.nice,)
+            )
+        return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor) -> None:
+        """丢弃已损坏的进程池（子进程被杀死或崩溃），下一个任务提交时重新创建"""
+        if self._executor is executor:
+            print(f"后台进程池已损坏（{self.name}），重新创建")
+            self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _drop(on_drop: Optional[Callable[[], None]]) -> None:
+        """任务未能执行：在线程中执行 on_drop 回调（通常包含数据库写入）"""
+        if on_drop is None:
+            return
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(on_drop))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+    def _make_room(self, key: Hashable) -> bool:
+        """队列已满时，提交者排队的任务少于平均份额则丢弃占用最多的用户的最新任务"""
+        heaviest = self._queue.heaviest()
+        if heaviest is None or heaviest == key:
+            return False
+        users = self._queue.key_count() + (0 if self._queue.depth(key) else 1)
+        if self._queue.depth(key) >= len(self._queue) / users:
+            return False
+        dropped = self._queue.pop_newest(heaviest)
+        self._drop(dropped[4])
+        self.pending -= 1
+        BACKGROUND_PENDING.labels(self.name).dec()
+        BACKGROUND_REJECTED.labels(self.name).inc()
+        print(f"后台任务队列已满（{self.name}），丢弃用户 {heaviest} 最新提交的任务")
+        return True
+
+    def submit(self, fn: Callable, *args: Any, callback: Optional[Callable[[Any], None]] = None,
+               key: Hashable = None, on_drop: Optional[Callable[[], None]] = None,
+               on_error: Optional[Callable[[], None]] = None) -> bool:
+        """提交后台任务，不等待结果
+
+        Args:
+            fn: 在子进程中执行的函数（必须可被pickle）
+            args: 函数参数
+            callback: 任务成功后在线程中执行的回调，参数为任务返回值
+            key: 公平调度的分组（通常为用户ID），为空的任务共用一个分组
+            on_drop: 任务被拒绝、被丢弃或因进程池损坏未能完成时在线程中执行的回调
+            on_error: 任务本身或回调抛出异常时在线程中执行的回调（不会再调用on_drop）
+
+        Returns:
+            bool: 提交成功返回True；进程池已饱和时返回False
+        """
+        if self.pending >= self.queue_size and not self._make_room(key):
+            BACKGROUND_REJECTED.labels(self.name).inc()
+            self._drop(on_drop)
+            return False
+
+        self._queue.push(key, (fn, args, callback, time.time(), on_drop, on_error))
+        self.pending += 1
+        BACKGROUND_PENDING.labels(self.name).inc()
+        self._dispatch()
+        return True
+
+    def _dispatch(self) -> None:
+        """进程池有空闲时按DRR取出任务交给进程池"""
+        loop = asyncio.get_running_loop()
+        while self.running < self.max_workers:
+            popped = self._queue.pop()
+            if popped is None:
+                break
+            self.running += 1
+            task = loop.create_task(self._run(*popped[1]))
+            _tasks.add(task)
+            task.add_done_callback(_tasks.discard)
+
+    async def _run(self, fn: Callable, args: tuple, callback: Optional[Callable[[Any], None]], submitted_at: float,
+                   on_drop: Optional[Callable[[], None]], on_error: Optional[Callable[[], None]]) -> None:
+        """在进程池中执行任务并执行回调"""
+        try:
+            executor = self.get_executor()
+            try:
+                future = asyncio.get_running_loop().run_in_executor(executor, _timed_call, fn, submitted_at, args)
+                lag, duration, result = await future
+            except BrokenProcessPool:
+                # 子进程崩溃或被杀死：任务没有执行完，按被丢弃处理
+                self._discard_executor(executor)
+                print(f"后台任务因进程池损坏未完成（{self.name}）")
+                if on_drop:
+                    await asyncio.to_thread(on_drop)
+                return
+            finally:
+                # 任务执行完立即补充下一个，不等待回调
+                self.running -= 1
+                self._dispatch()
+            BACKGROUND_LAG.labels(self.name).observe(lag)
+            BACKGROUND_DURATION.labels(self.name).observe(duration)
+            if callback:
+                # 回调通常包含数据库写入，放到线程中执行以免阻塞事件循环
+                await asyncio.to_thread(callback, result)
+        except Exception as e:
+            print(f"后台任务失败（{self.name}）: {str(e) or type(e).__name__}")
+            if on_error:
+                await asyncio.to_thread(on_error)
+        finally:
+            self.pending -= 1
+            BACKGROUND_PENDING.labels(self.name).dec()
+
+    def shutdown(self) -> None:
+        """关闭进程池（丢弃尚未交给进程池的任务）"""
+        while (popped := self._queue.pop()) is not None:
+            on_drop = popped[1][4]
+            if on_drop:
+                on_drop()
+            self.pending -= 1
+            BACKGROUND_PENDING.labels(self.name).dec()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# 图片处理进程池：缩略图、转码等
+process_pool = BackgroundPool(
+    "process",
+    max_workers=settings.PROCESS_POOL_WORKERS,
+    queue_size=settings.PROCESS_QUEUE_SIZE
+)
+
+# 原图优化进程池：低优先级运行，不与请求处理争抢CPU
+optimize_pool = BackgroundPool(
+    "optimize",
+    max_workers=settings.OPTIMIZE_POOL_WORKERS,
+    queue_size=settings.OPTIMIZE_QUEUE_SIZE,
+    nice=settings.OPTIMIZE_NICE
+)
+
+
+def shutdown_executor() -> None:
+    """关闭所有后台进程池"""
+    process_pool.shutdown()
+    optimize_pool.shutdown()
@@ -0,0 +1,78 @@
+"""后端测试的公共配置
+
+在 backend 目录下运行：
+
+    pip install -r tests/requirements.txt
+    python -m pytest tests
+
+配置必须在导入 src 之前写入环境变量：在每次运行的临时目录中执行，上传目录和临时切片目录都位于其中，数据库使用SQLite。
+"""
+import io
+import os
+import uuid
+import sys
+import shutil
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="imagebed-tests-")
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    REDIS_URL="",
+    STORAGE_BACKEND="local",
+    STORAGE_LAYOUT="sharded",
+    UPLOAD_FOLDER="static",
+    TEMP_UPLOAD_FOLDER="temp",
+    BASE_URL="http://localhost:8000",
+    GITEE_ACCESS_TOKEN="",
+)
+sys.path.insert(0, BACKEND_DIR)
+# 存储路径和静态文件挂载都相对于工作目录
+os.chdir(WORKDIR)
+os.makedirs("static", exist_ok=True)
+
+import pytest
+
+pytest_plugins = ["src.utils.query_budget"]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """整个测试会话共用的应用客户端（执行启动和关闭事件）"""
+    from fastapi.testclient import TestClient
+    from src.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    """已注册用户的认证请求头"""
+    client.post("/api/auth/register", json={"username": "tester", "password": "tester-password"})
+    response = client.post("/api/auth/login", json={"username": "tester", "password": "tester-password"})
+    return {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+
+
+@pytest.fixture
+def new_user(client):
+    """新注册的用户，返回 (用户ID, 认证请求头)：存储计数和配额不受其他测试影响"""
+    username = f"user_{uuid.uuid4().hex[:12]}"
+    user_id = client.post("/api/auth/register", json={"username": username, "password": "tester-password"}).json()["data"]["id"]
+    response = client.post("/api/auth/login", json={"username": username, "password": "tester-password"})
+    return user_id, {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def png():
+    """可通过上传校验的PNG图片"""
+    from PIL import Image as PILImage
+
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (64, 48), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
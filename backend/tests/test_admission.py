@@ -0,0 +1,104 @@
+"""上传准入控制：按到达顺序放行、排队超时和队列已满时拒绝、503响应格式"""
+import asyncio
+import pytest
+from src.utils.admission import AdmissionController, UploadRejected
+
+
+def _controller(**kwargs) -> AdmissionController:
+    options = {"max_bytes": 100, "max_concurrent": 2, "queue_timeout": 1.0, "max_queue": 10}
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_fifo_admission():
+    async def main():
+        admission = _controller()
+        order = []
+
+        async def upload(name, cost):
+            taken = await admission.acquire(cost)
+            order.append(name)
+            return taken
+
+        assert await admission.acquire(60) == 60
+        # 队首的大上传放不下时，后面的小上传即使放得下也继续等待
+        big = asyncio.create_task(upload("big", 60))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(upload("small", 10))
+        await asyncio.sleep(0.01)
+        assert order == [] and len(admission._waiters) == 2
+
+        admission.release(60)
+        await asyncio.gather(big, small)
+        assert order == ["big", "small"]
+        assert (admission.active, admission.inflight_bytes) == (2, 70)
+
+        # 超过 max_bytes 的上传按上限计，没有其他上传时仍可进行
+        admission.release(60)
+        admission.release(10)
+        assert await admission.acquire(1000) == 100
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_and_full():
+    async def main():
+        admission = _controller(max_concurrent=1, queue_timeout=0.05, max_queue=1)
+        await admission.acquire(10)
+
+        waiting = asyncio.create_task(admission.acquire(10))
+        await asyncio.sleep(0)
+        with pytest.raises(UploadRejected) as error:
+            await admission.acquire(10)
+        assert error.value.reason == "queue_full"
+        assert error.value.retry_after >= 1
+
+        with pytest.raises(UploadRejected) as error:
+            await waiting
+        assert error.value.reason == "timeout"
+        # 超时的请求离开队列，不占用配额
+        assert not admission._waiters
+        assert (admission.active, admission.inflight_bytes) == (1, 10)
+
+        admission.release(10)
+        assert (admission.active, admission.inflight_bytes) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        admission = _controller(max_concurrent=1)
+        await admission.acquire(10)
+        cancelled = asyncio.create_task(admission.acquire(10))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(admission.acquire(20))
+        await asyncio.sleep(0)
+
+        # 客户端断开：离开队列，后面的请求照常放行
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        admission.release(10)
+        assert await queued == 20
+        assert (admission.active, admission.inflight_bytes) == (1, 20)
+
+    asyncio.run(main())
+
+
+def test_rejected_upload_response(client, auth_headers, png, monkeypatch):
+    # 已有一个上传在进行且不允许排队：新的上传立即被拒绝
+    admission = _controller(max_concurrent=1, max_queue=0)
+    admission.active = 1
+    monkeypatch.setattr("src.middlewares.admission.upload_admission", admission)
+
+    response = client.post("/api/images", headers=auth_headers, files=[("files", ("a.png", png, "image/png"))])
+    assert response.status_code == 503
+    assert response.json() == {"code": 503, "message": "服务器繁忙，请稍后重试", "data": None}
+    assert int(response.headers["Retry-After"]) >= 1
+
+    response = client.put("/api/images/import/1", headers=auth_headers, content=b"")
+    assert response.status_code == 503
+
+    # 非上传请求不受准入控制
+    assert client.get("/api/images", headers=auth_headers).status_code == 200
+    assert client.post("/api/images/import", headers=auth_headers, json={}).status_code == 200
@@ -0,0 +1,132 @@
+"""流式归档解析：ZIP（存储/压缩、有无数据描述符）、TAR（GNU长文件名、PAX扩展头）、tar.gz、超大条目和损坏的归档"""
+import io
+import os
+import asyncio
+import tarfile
+import zipfile
+import pytest
+from src.utils.archive import iter_archive, ArchiveError
+
+MAX_SIZE = 64 * 1024
+
+
+class _Unseekable(io.RawIOBase):
+    """不可定位的输出：zipfile 会为每个条目写入数据描述符"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+async def _chunks(data: bytes, size: int):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+def _entries(data: bytes, max_size: int = MAX_SIZE, chunk_size: int = 1000) -> list:
+    async def collect():
+        return [entry async for entry in iter_archive(_chunks(data, chunk_size), max_size)]
+    return asyncio.run(collect())
+
+
+FILES = {
+    "a.png": os.urandom(3000),
+    # 内容中包含数据描述符签名，存储模式下不能被误认为条目结束
+    "dir/b.png": b"PK\x07\x08" + os.urandom(20) + b"PK\x07\x08" * 50,
+    "c.txt": b"hello " * 2000,
+}
+
+
+def _zip(compression: int, descriptor: bool) -> bytes:
+    output = _Unseekable() if descriptor else io.BytesIO()
+    with zipfile.ZipFile(output, "w", compression) as archive:
+        archive.writestr(zipfile.ZipInfo("dir/"), b"")
+        for name, data in FILES.items():
+            if descriptor:
+                with archive.open(name, "w") as entry:
+                    entry.write(data)
+            else:
+                archive.writestr(name, data)
+    return (output.buffer if descriptor else output).getvalue()
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+@pytest.mark.parametrize("descriptor", [False, True])
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_zip(compression, descriptor, chunk_size):
+    data = _zip(compression, descriptor)
+    flags = [info.flag_bits & 0x08 for info in zipfile.ZipFile(io.BytesIO(data)).infolist()]
+    assert all(flags) if descriptor else not any(flags)
+    assert _entries(data, chunk_size=chunk_size) == list(FILES.items())
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED])
+@pytest.mark.parametrize("descriptor", [False, True])
+def test_zip_oversized_entry(compression, descriptor):
+    entries = _entries(_zip(compression, descriptor), max_size=5000)
+    # 超过大小上限的条目内容为None，后续条目不受影响
+    assert entries == [("a.png", FILES["a.png"]), ("dir/b.png", FILES["dir/b.png"]), ("c.txt", None)]
+
+
+def _tar(tar_format: int, mode: str = "w") -> bytes:
+    output = io.BytesIO()
+    with tarfile.open(fileobj=output, mode=mode, format=tar_format) as archive:
+        for name, data in TAR_FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+        directory = tarfile.TarInfo("empty")
+        directory.type = tarfile.DIRTYPE
+        archive.addfile(directory)
+    return output.getvalue()
+
+
+TAR_FILES = {
+    "short.png": os.urandom(700),
+    # 超过100字节的路径：GNU格式写入长文件名条目，PAX格式写入扩展头
+    "long/" + "x" * 150 + ".png": os.urandom(1500),
+    "图片/中文.png": os.urandom(512),
+}
+
+
+@pytest.mark.parametrize("tar_format", [tarfile.GNU_FORMAT, tarfile.PAX_FORMAT])
+@pytest.mark.parametrize("chunk_size", [7, 64 * 1024])
+def test_tar(tar_format, chunk_size):
+    assert _entries(_tar(tar_format), chunk_size=chunk_size) == list(TAR_FILES.items())
+
+
+def test_tar_gz():
+    assert _entries(_tar(tarfile.PAX_FORMAT, "w:gz"), chunk_size=100) == list(TAR_FILES.items())
+
+
+def test_tar_oversized_entry():
+    entries = _entries(_tar(tarfile.GNU_FORMAT), max_size=1000)
+    assert [(name, data is not None) for name, data in entries] == [
+        ("short.png", True), ("long/" + "x" * 150 + ".png", False), ("图片/中文.png", True),
+    ]
+
+
+@pytest.mark.parametrize("data", [
+    _zip(zipfile.ZIP_DEFLATED, False)[:2000],
+    _zip(zipfile.ZIP_STORED, True)[:3500],
+    _tar(tarfile.GNU_FORMAT)[:1200],
+    _tar(tarfile.PAX_FORMAT, "w:gz")[:300],
+], ids=["zip-deflated", "zip-descriptor", "tar", "tar-gz"])
+def test_truncated(data):
+    with pytest.raises(ArchiveError):
+        _entries(data)
+
+
+def test_corrupt():
+    data = bytearray(_zip(zipfile.ZIP_DEFLATED, False))
+    # 破坏第一个条目的压缩数据
+    data[60:80] = bytes(20)
+    with pytest.raises(ArchiveError):
+        _entries(bytes(data))
+    with pytest.raises(ArchiveError):
+        _entries(os.urandom(4096))
@@ -0,0 +1,41 @@
+"""外部Token鉴权失败的限流：随机Token不能绕过客户端和全局计数"""
+import uuid
+from src.config import settings
+from src.utils.rate_limit import rate_limiter
+
+
+def _random_token_requests(client, count):
+    return [
+        client.get("/api/images", headers={"Authorization": f"Bearer {uuid.uuid4().hex}"}).status_code
+        for _ in range(count)
+    ]
+
+
+def test_random_tokens_throttled_per_client(client, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_FAILURES_PER_MINUTE", 3)
+    monkeypatch.setattr(settings, "TRUSTED_PROXY_HEADER", "X-Forwarded-For")
+    monkeypatch.setattr(rate_limiter.memory, "_buckets", {})
+
+    codes = [
+        client.get(
+            "/api/images",
+            headers={"Authorization": f"Bearer {uuid.uuid4().hex}", "X-Forwarded-For": "spoofed, 10.0.0.1"},
+        ).status_code
+        for _ in range(5)
+    ]
+    assert codes == [401, 401, 401, 429, 429]
+
+    # 其他客户端不受影响
+    response = client.get(
+        "/api/images",
+        headers={"Authorization": f"Bearer {uuid.uuid4().hex}", "X-Forwarded-For": "10.0.0.2"},
+    )
+    assert response.status_code == 401
+
+
+def test_random_tokens_throttled_globally(client, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_FAILURES_PER_MINUTE", 0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_AUTH_FAILURES_GLOBAL_PER_MINUTE", 2)
+    monkeypatch.setattr(rate_limiter.memory, "_buckets", {})
+
+    assert _random_token_requests(client, 3) == [401, 401, 429]
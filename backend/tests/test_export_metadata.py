@@ -0,0 +1,46 @@
+"""元数据导出：CSV中以公式字符开头的用户文本按文本导出，NDJSON保持原样"""
+import csv
+import io
+import json
+import uuid
+import pytest
+from src.services.processing import ProcessingService
+
+NAMES = ["=cmd|calc!A1", "+1+1", "-2", "@SUM(A1)", "plain"]
+
+
+@pytest.fixture(autouse=True)
+def no_background_processing(monkeypatch):
+    monkeypatch.setattr(ProcessingService, "schedule_post_upload", staticmethod(lambda image: None))
+
+
+@pytest.fixture
+def uploaded(client, new_user, png):
+    _, headers = new_user
+    nicnames = [f"{name}{uuid.uuid4().hex[:6]}" for name in NAMES]
+    files = [("files", (f"{name}.png", png, "image/png")) for name in NAMES]
+    response = client.post("/api/images", headers=headers, files=files, data={"nicnames": nicnames})
+    assert response.json()["data"]["uploaded"] == len(NAMES)
+    return headers, nicnames
+
+
+def test_csv_escapes_formulas(client, uploaded):
+    headers, nicnames = uploaded
+    response = client.get("/api/images/export/metadata?format=csv&sort_by=id&order=asc", headers=headers)
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+
+    assert [row["filename"] for row in rows] == [
+        "'=cmd|calc!A1.png", "'+1+1.png", "'-2.png", "'@SUM(A1).png", "plain.png",
+    ]
+    assert [row["nicname"] for row in rows] == [
+        ("'" + nicname if nicname[0] in "=+-@" else nicname) for nicname in nicnames
+    ]
+    assert rows[0]["url"].startswith("http")
+
+
+def test_ndjson_unchanged(client, uploaded):
+    headers, nicnames = uploaded
+    response = client.get("/api/images/export/metadata?format=ndjson&sort_by=id&order=asc", headers=headers)
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["filename"] for record in records] == [f"{name}.png" for name in NAMES]
+    assert [record["nicname"] for record in records] == nicnames
@@ -0,0 +1,50 @@
+"""后台图片处理：动图（APNG）不能被优化或转码成单帧"""
+import os
+from PIL import Image as PILImage
+from src.utils.image_process import optimize_image, transcode_image
+
+
+def _write_apng(path, frames=5):
+    images = [PILImage.new("RGBA", (64, 64), (i * 40, 255 - i * 40, 0, 255)) for i in range(frames)]
+    # 不压缩：只按第一帧重新编码必然更小
+    images[0].save(path, format="PNG", save_all=True, append_images=images[1:], duration=100, loop=0, compress_level=0)
+    return os.path.getsize(path)
+
+
+def test_optimize_keeps_apng_frames(tmp_path):
+    path = str(tmp_path / "anim.png")
+    size = _write_apng(path)
+
+    assert optimize_image(path) == 0
+    assert os.path.getsize(path) == size
+    with PILImage.open(path) as img:
+        assert img.n_frames == 5
+
+
+def test_optimize_still_png(tmp_path):
+    path = str(tmp_path / "still.png")
+    PILImage.new("RGB", (64, 64), (10, 20, 30)).save(path, format="PNG", compress_level=0)
+
+    assert optimize_image(path) > 0
+    with PILImage.open(path) as img:
+        assert img.size == (64, 64)
+
+
+def test_transcode_skips_apng(tmp_path):
+    path = str(tmp_path / "anim.png")
+    _write_apng(path)
+    output_path = str(tmp_path / "derived" / "anim.webp")
+
+    assert transcode_image(path, output_path, "WEBP") is False
+    assert not os.path.exists(output_path)
+    assert os.path.exists(f"{output_path}.skip")
+
+
+def test_transcode_still_png(tmp_path):
+    path = str(tmp_path / "still.png")
+    PILImage.new("RGB", (64, 64), (10, 20, 30)).save(path, format="PNG", compress_level=0)
+    output_path = str(tmp_path / "derived" / "still.webp")
+
+    assert transcode_image(path, output_path, "WEBP") is True
+    with PILImage.open(output_path) as img:
+        assert img.format == "WEBP"
@@ -0,0 +1,90 @@
+"""归档导入接口：逐条导入、跳过非图片、超大条目、归档损坏时任务失败并释放预留配额、超出配额"""
+import io
+import os
+import zipfile
+import pytest
+from src.config import settings
+from src.database import SessionLocal
+from src.models.user import User
+from src.services.processing import ProcessingService
+
+
+@pytest.fixture(autouse=True)
+def no_background_processing(monkeypatch):
+    monkeypatch.setattr(ProcessingService, "schedule_post_upload", staticmethod(lambda image: None))
+
+
+def _zip(files: dict) -> bytes:
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return output.getvalue()
+
+
+def _import(client, headers, data: bytes) -> dict:
+    job = client.post("/api/images/import", headers=headers, json={"filename": "photos.zip"}).json()["data"]
+    response = client.put(f"/api/images/import/{job['id']}", headers=headers, content=data)
+    assert response.json()["data"]["id"] == job["id"], response.json()
+    return response.json()["data"]
+
+
+def _usage(client, headers) -> dict:
+    return client.get("/api/images/storage-usage", headers=headers).json()["data"]
+
+
+def test_import_zip(client, new_user, png, monkeypatch):
+    _, headers = new_user
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", len(png) + 100)
+    data = _zip({
+        "a.png": png,
+        "dir/b.png": png,
+        "notes.txt": b"not an image",
+        "__MACOSX/._a.png": b"resource fork",
+        "big.png": os.urandom(len(png) + 200),
+        "fake.png": b"not really a png",
+    })
+
+    job = _import(client, headers, data)
+    assert job["status"] == "completed"
+    assert (job["entries"], job["imported"], job["skipped"], job["failed"]) == (6, 2, 2, 2)
+    assert job["bytes_read"] == len(data)
+
+    images = client.get("/api/images", headers=headers).json()["data"]
+    assert sorted(image["filename"] for image in images) == ["a.png", "b.png"]
+    assert _usage(client, headers)["used"] == 2 * len(png)
+    assert _usage(client, headers)["reserved"] == 0
+
+    # 每个任务只能上传一次
+    response = client.put(f"/api/images/import/{job['id']}", headers=headers, content=data)
+    assert response.json()["code"] == 400
+
+
+@pytest.mark.parametrize("corrupt", ["truncated", "garbage"])
+def test_import_corrupt_archive(client, new_user, png, corrupt):
+    _, headers = new_user
+    data = _zip({"a.png": png, "b.png": png, "c.png": png})
+    data = data[:len(data) // 2] if corrupt == "truncated" else b"PK\x03\x04" + os.urandom(2000)
+
+    job = _import(client, headers, data)
+    assert job["status"] == "failed"
+    assert job["error"]
+    assert job["finished_at"]
+    # 未入库的图片被删除，预留的配额全部释放
+    assert client.get("/api/images", headers=headers).json()["data"] == []
+    assert _usage(client, headers) == {"used": 0, "reserved": 0, "quota": None}
+
+
+def test_import_over_quota(client, new_user, png):
+    user_id, headers = new_user
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).storage_quota = len(png) * 2 + 10
+        db.commit()
+    finally:
+        db.close()
+
+    job = _import(client, headers, _zip({f"{i}.png": png for i in range(4)}))
+    assert job["status"] == "completed"
+    assert (job["imported"], job["failed"]) == (2, 2)
+    assert _usage(client, headers) == {"used": len(png) * 2, "reserved": 0, "quota": len(png) * 2 + 10}
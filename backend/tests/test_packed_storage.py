@@ -0,0 +1,166 @@
+"""小图打包存储：读写删除、区间读取、压缩、索引日志重写与重新加载、不完整的日志尾部"""
+import os
+import asyncio
+import threading
+import pytest
+from src.storage.local import LocalStorage
+from src.storage.packed import PackedStorage
+
+MAX_BLOB_SIZE = 4096
+
+
+def _open(root) -> PackedStorage:
+    return PackedStorage(str(root), max_blob_size=MAX_BLOB_SIZE, segment_size=64 * 1024, local=LocalStorage())
+
+
+async def _chunks(data: bytes, size: int = 1000):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+def _put(storage: PackedStorage, key: str, data: bytes) -> int:
+    return asyncio.run(storage.put_stream(key, _chunks(data)))
+
+
+def _read(storage: PackedStorage, key: str, start: int = 0, end: int = None) -> bytes:
+    async def read():
+        return b"".join([chunk async for chunk in storage.get_range(key, start, end)])
+    return asyncio.run(read())
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return _open(tmp_path / "packed")
+
+
+def test_put_get_delete(storage, tmp_path):
+    data = os.urandom(3000)
+    assert _put(storage, "alice/a.png", data) == len(data)
+    assert _read(storage, "alice/a.png") == data
+    assert asyncio.run(storage.size("alice/a.png")) == len(data)
+    assert asyncio.run(storage.exists("alice/a.png"))
+
+    assert asyncio.run(storage.delete("alice/a.png"))
+    assert not asyncio.run(storage.exists("alice/a.png"))
+    assert not asyncio.run(storage.delete("alice/a.png"))
+
+
+def test_large_file_stored_as_local_file(storage, tmp_path):
+    key = str(tmp_path / "local" / "big.png")
+    data = os.urandom(MAX_BLOB_SIZE * 3)
+    assert _put(storage, key, data) == len(data)
+    assert os.path.getsize(key) == len(data)
+    assert storage.stats()["blobs"] == 0
+    assert _read(storage, key) == data
+
+    assert asyncio.run(storage.delete(key))
+    assert not os.path.exists(key)
+
+
+def test_get_range(storage):
+    data = bytes(range(256)) * 10
+    _put(storage, "a.png", data)
+    assert _read(storage, "a.png", 10, 19) == data[10:20]
+    assert _read(storage, "a.png", 2500) == data[2500:]
+    # 超出末尾的区间截断到文件末尾
+    assert _read(storage, "a.png", 2550, 10000) == data[2550:]
+
+
+def test_other_worker_sees_writes_and_deletes(tmp_path):
+    writer, reader = _open(tmp_path / "packed"), _open(tmp_path / "packed")
+    data = os.urandom(1000)
+    _put(writer, "a.png", data)
+    # 未命中时立即读取其他进程新写入的索引
+    assert _read(reader, "a.png") == data
+
+    assert asyncio.run(writer.delete("a.png"))
+    reader._refresh(force=True)
+    assert not asyncio.run(reader.exists("a.png"))
+
+
+def test_compact_reclaims_space_while_reading(storage):
+    blobs = {f"img/{i}.png": os.urandom(3000) for i in range(100)}
+    for key, data in blobs.items():
+        _put(storage, key, data)
+    assert storage.stats()["segments"] > 3
+
+    deleted = [key for i, key in enumerate(blobs) if i % 4]
+    for key in deleted:
+        asyncio.run(storage.delete(key))
+    kept = {key: data for key, data in blobs.items() if key not in deleted}
+    before = storage.stats()
+
+    errors = []
+    stop = threading.Event()
+
+    def read_loop():
+        while not stop.is_set():
+            for key, data in kept.items():
+                if storage._read_blob(key) != data:
+                    errors.append(key)
+
+    readers = [threading.Thread(target=read_loop) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    try:
+        reclaimed = storage.compact(0.5)
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+    assert errors == []
+    assert reclaimed > 0
+    after = storage.stats()
+    assert after["segment_bytes"] == before["segment_bytes"] - reclaimed
+    assert after["segments"] < before["segments"]
+    assert after["blobs"] == len(kept)
+    for key, data in kept.items():
+        assert _read(storage, key) == data
+
+
+def test_log_rewrite_and_reload(tmp_path):
+    root = tmp_path / "packed"
+    storage = _open(root)
+    for i in range(600):
+        _put(storage, f"tmp/{i}.png", b"x" * 100)
+    for i in range(600):
+        asyncio.run(storage.delete(f"tmp/{i}.png"))
+    _put(storage, "keep.png", b"keep")
+    other = _open(root)
+
+    storage.compact(0.5)
+
+    # 只保留有效条目，旧版本日志被删除
+    assert (root / "CURRENT").read_text() == "1"
+    assert not (root / "index.0.log").exists()
+    assert storage.stats()["index_entries"] == 1
+
+    # 其他worker检测到新版本后重新加载索引
+    other._refresh(force=True)
+    assert _read(other, "keep.png") == b"keep"
+    assert not asyncio.run(other.exists("tmp/0.png"))
+    assert _read(_open(root), "keep.png") == b"keep"
+
+
+def test_truncated_log_tail(tmp_path):
+    root = tmp_path / "packed"
+    storage = _open(root)
+    _put(storage, "a.png", b"aaaa")
+    log_path = root / "index.0.log"
+    complete = log_path.stat().st_size
+    # 写入中途崩溃：只写了条目的一部分
+    with open(log_path, "ab") as f:
+        f.write(b"\x00\x30\x01\x00")
+
+    reloaded = _open(root)
+    assert _read(reloaded, "a.png") == b"aaaa"
+    assert reloaded.stats()["index_entries"] == 1
+
+    # 下一次写入前截掉不完整的条目
+    _put(reloaded, "b.png", b"bbbb")
+    assert log_path.stat().st_size > complete
+    fresh = _open(root)
+    assert _read(fresh, "a.png") == b"aaaa"
+    assert _read(fresh, "b.png") == b"bbbb"
+    assert fresh.stats()["index_entries"] == 2
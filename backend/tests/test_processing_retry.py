@@ -0,0 +1,72 @@
+"""被丢弃的后台任务的重新提交：任务自身失败不重试，重新提交次数有上限"""
+import os
+import uuid
+import asyncio
+from src.config import settings
+from src.database import SessionLocal
+from src.models.image import Image
+from src.services.processing import ProcessingService
+from src.utils.worker import BackgroundPool
+
+
+def _run_pool(*tasks):
+    """在新的进程池中依次执行任务，返回每个任务触发的回调名称"""
+    events = []
+
+    async def main():
+        pool = BackgroundPool("test", max_workers=1, queue_size=8)
+        try:
+            for i, (fn, args) in enumerate(tasks):
+                pool.submit(
+                    fn, *args,
+                    callback=lambda _, i=i: events.append((i, "callback")),
+                    on_drop=lambda i=i: events.append((i, "drop")),
+                    on_error=lambda i=i: events.append((i, "error")),
+                )
+                while pool.pending:
+                    await asyncio.sleep(0.01)
+        finally:
+            pool.shutdown()
+
+    asyncio.run(main())
+    return events
+
+
+def test_task_error_is_not_dropped():
+    assert _run_pool((int, ("5",)), (int, ("x",))) == [(0, "callback"), (1, "error")]
+
+
+def test_broken_pool_drops_task_and_recovers():
+    assert _run_pool((os._exit, (1,)), (int, ("5",))) == [(0, "drop"), (1, "callback")]
+
+
+def _pending_image(client, auth_headers, png):
+    response = client.post(
+        "/api/images", headers=auth_headers, files=[("files", ("a.png", png, "image/png"))], data={"nicnames": uuid.uuid4().hex}
+    )
+    image_id = response.json()["data"]["images"][0]["id"]
+    ProcessingService.mark_pending(image_id, "derivatives")
+    return image_id
+
+
+def test_claim_pending_stops_after_max_attempts(client, auth_headers, png, monkeypatch):
+    monkeypatch.setattr(settings, "PROCESS_RETRY_MAX_ATTEMPTS", 2)
+    # 不提交真实的后台任务，避免处理完成后清除待处理记录
+    monkeypatch.setattr(ProcessingService, "schedule_post_upload", staticmethod(lambda image: None))
+    db = SessionLocal()
+    try:
+        db.query(Image).update({Image.processing_pending: None})
+        db.commit()
+    finally:
+        db.close()
+    image_id = _pending_image(client, auth_headers, png)
+
+    for attempt in range(2):
+        assert [image.id for image in ProcessingService.claim_pending(10)] == [image_id]
+        # 重新提交后又被丢弃
+        ProcessingService.mark_pending(image_id, "derivatives")
+    assert ProcessingService.claim_pending(10) == []
+
+    # 达到上限的图片不占用批次，其他图片仍会被取出
+    other_id = _pending_image(client, auth_headers, png)
+    assert [image.id for image in ProcessingService.claim_pending(1)] == [other_id]
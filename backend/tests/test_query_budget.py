@@ -0,0 +1,45 @@
+"""接口的SQL语句预算：语句数随批量大小增长超过预期时（如重新引入N+1查询）测试失败"""
+import pytest
+from src.services.processing import ProcessingService
+
+# 鉴权查询用户
+AUTH_QUERIES = 1
+# 每个上传文件：预留配额、插入图片、预留转为已用、刷新图片
+UPLOAD_QUERIES_PER_FILE = 4
+
+
+@pytest.fixture(autouse=True)
+def no_background_processing(monkeypatch):
+    """后台处理任务的回调也会写数据库，不计入接口的预算"""
+    monkeypatch.setattr(ProcessingService, "schedule_post_upload", staticmethod(lambda image: None))
+
+
+def _upload(client, headers, png, names):
+    files = [("files", (f"{name}.png", png, "image/png")) for name in names]
+    response = client.post("/api/images", headers=headers, files=files, data={"nicnames": names})
+    assert response.json()["data"]["uploaded"] == len(names)
+    return [image["id"] for image in response.json()["data"]["images"]]
+
+
+@pytest.mark.parametrize("count", [1, 5])
+def test_upload_images(client, auth_headers, png, query_budget, count):
+    with query_budget(AUTH_QUERIES + UPLOAD_QUERIES_PER_FILE * count, f"POST /api/images ({count}个文件)"):
+        _upload(client, auth_headers, png, [f"budget-upload-{count}-{i}" for i in range(count)])
+
+
+@pytest.mark.parametrize("count", [1, 10])
+def test_batch_delete_images(client, auth_headers, png, query_budget, count):
+    image_ids = _upload(client, auth_headers, png, [f"budget-delete-{count}-{i}" for i in range(count)])
+    # 鉴权、查询图片、释放已用空间、删除记录、提交后读取用户名（与图片数量无关）
+    with query_budget(AUTH_QUERIES + 4, f"POST /api/images/batch-delete ({count}张)"):
+        response = client.post("/api/images/batch-delete", headers=auth_headers, json={"image_ids": image_ids + [0]})
+    assert response.json()["data"] == {"deleted": count, "failed": 1}
+
+
+@pytest.mark.parametrize("count", [1, 10])
+def test_list_images(client, auth_headers, png, query_budget, count):
+    _upload(client, auth_headers, png, [f"budget-list-{count}-{i}" for i in range(count)])
+    # 鉴权、总数、当前页（与每页图片数无关）
+    with query_budget(AUTH_QUERIES + 2, "GET /api/images"):
+        response = client.get("/api/images", headers=auth_headers, params={"page_size": 50})
+    assert len(response.json()["data"]) >= count
@@ -0,0 +1,116 @@
+"""存储配额：预留超出配额返回413、保存失败释放预留、按实际大小计入已用空间、删除时减少已用空间"""
+import io
+import asyncio
+import uuid
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+from src.database import SessionLocal
+from src.models.user import User
+from src.services.image import ImageService
+from src.services.processing import ProcessingService
+from src.services.quota import QuotaService
+
+
+@pytest.fixture(autouse=True)
+def no_background_processing(monkeypatch):
+    monkeypatch.setattr(ProcessingService, "schedule_post_upload", staticmethod(lambda image: None))
+
+
+def _set_quota(user_id: int, quota):
+    db = SessionLocal()
+    try:
+        db.get(User, user_id).storage_quota = quota
+        db.commit()
+    finally:
+        db.close()
+
+
+def _counters(user_id: int) -> tuple:
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        return user.storage_used, user.storage_reserved
+    finally:
+        db.close()
+
+
+def _upload(client, headers, files) -> dict:
+    files = [("files", (name, data, "image/png")) for name, data in files]
+    names = [uuid.uuid4().hex for _ in files]
+    return client.post("/api/images", headers=headers, files=files, data={"nicnames": names}).json()["data"]
+
+
+def test_reserve_consume_release_free(new_user):
+    user_id, _ = new_user
+    _set_quota(user_id, 1000)
+    db = SessionLocal()
+    try:
+        QuotaService.reserve(db, user_id, 600)
+        with pytest.raises(HTTPException) as error:
+            QuotaService.reserve(db, user_id, 500)
+        assert error.value.status_code == 413
+        assert _counters(user_id) == (0, 600)
+
+        # 预留600，实际写入400：多预留的部分释放
+        QuotaService.consume(db, user_id, 600, 400)
+        db.commit()
+        assert _counters(user_id) == (400, 0)
+
+        QuotaService.reserve(db, user_id, 600)
+        QuotaService.release(db, user_id, 600)
+        QuotaService.free(db, user_id, 1000)
+        db.commit()
+        # 计数不会减到0以下
+        assert _counters(user_id) == (0, 0)
+    finally:
+        db.close()
+
+
+def test_upload_over_quota(client, new_user, png):
+    user_id, headers = new_user
+    _set_quota(user_id, len(png) + 10)
+
+    result = _upload(client, headers, [("a.png", png), ("b.png", png)])
+    assert (result["uploaded"], result["failed"]) == (1, 1)
+    assert _counters(user_id) == (len(png), 0)
+
+
+def test_failed_save_releases_reservation(client, new_user, png):
+    user_id, headers = new_user
+
+    result = _upload(client, headers, [("fake.png", b"not a png" * 100), ("a.png", png)])
+    assert (result["uploaded"], result["failed"]) == (1, 1)
+    assert _counters(user_id) == (len(png), 0)
+
+
+def test_unknown_size_consumes_actual_size(client, new_user, png):
+    user_id, _ = new_user
+    db = SessionLocal()
+    try:
+        user = db.get(User, user_id)
+        # 客户端未声明大小时按 MAX_FILE_SIZE 预留，保存后按实际大小计入
+        upload = UploadFile(io.BytesIO(png), filename="a.png", size=None)
+        result = asyncio.run(ImageService.upload_images(db, user, [upload], [uuid.uuid4().hex]))
+    finally:
+        db.close()
+    assert result.uploaded == 1
+    assert _counters(user_id) == (len(png), 0)
+
+
+def test_delete_frees_used_space(client, new_user, png):
+    user_id, headers = new_user
+    image_ids = [image["id"] for image in _upload(client, headers, [(f"{i}.png", png) for i in range(4)])["images"]]
+    assert _counters(user_id) == (len(png) * 4, 0)
+
+    assert client.delete(f"/api/images/{image_ids[0]}", headers=headers).json()["code"] == 0
+    assert _counters(user_id) == (len(png) * 3, 0)
+
+    response = client.post("/api/images/batch-delete", headers=headers, json={"image_ids": image_ids[1:3]})
+    assert response.json()["data"] == {"deleted": 2, "failed": 0}
+    assert _counters(user_id) == (len(png), 0)
+
+    # 已删除的图片不会再次减少已用空间
+    response = client.post("/api/images/batch-delete", headers=headers, json={"image_ids": image_ids[:3]})
+    assert response.json()["data"] == {"deleted": 0, "failed": 3}
+    assert _counters(user_id) == (len(png), 0)
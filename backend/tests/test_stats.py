@@ -0,0 +1,28 @@
+"""访问统计查询：统计天数超出范围时返回400而不是500"""
+import pytest
+from src.config import settings
+from src.services.stats import MAX_DAILY_DAYS
+
+
+@pytest.mark.parametrize("path, days", [
+    ("/api/stats/traffic?granularity=day", MAX_DAILY_DAYS + 1),
+    ("/api/stats/traffic?granularity=day", 1000000),
+    ("/api/stats/traffic?granularity=hour", settings.STATS_HOURLY_RETENTION_DAYS + 1),
+    ("/api/stats/top-images?", 1000000),
+    ("/api/stats/tokens?", 1000000),
+    ("/api/stats/traffic?granularity=day", 0),
+])
+def test_days_out_of_range(client, auth_headers, path, days):
+    response = client.get(f"{path}&days={days}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["code"] == 400
+
+
+@pytest.mark.parametrize("path", [
+    f"/api/stats/traffic?granularity=day&days={MAX_DAILY_DAYS}",
+    f"/api/stats/traffic?granularity=hour&days={settings.STATS_HOURLY_RETENTION_DAYS}",
+    "/api/stats/top-images",
+    "/api/stats/tokens",
+])
+def test_days_in_range(client, auth_headers, path):
+    assert client.get(path, headers=auth_headers).json()["code"] == 0
@@ -0,0 +1,34 @@
+"""上传请求的链路导出：使用进程内导出器接收OpenTelemetry span"""
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from src.utils.tracing import setup_tracing, shutdown_tracing
+
+
+@pytest.fixture
+def exporter():
+    span_exporter = InMemorySpanExporter()
+    assert setup_tracing(span_exporter)
+    yield span_exporter
+    shutdown_tracing()
+
+
+def test_upload_exports_stage_spans(client, auth_headers, png, exporter):
+    response = client.post(
+        "/api/images", headers=auth_headers,
+        files=[("files", ("trace.png", png, "image/png"))], data={"nicnames": "trace-upload"}
+    )
+    assert response.json()["data"]["uploaded"] == 1
+
+    spans = exporter.get_finished_spans()
+    root = next(s for s in spans if s.name == "POST /api/images")
+    assert root.attributes["http.route"] == "/api/images"
+    assert root.attributes["http.response.status_code"] == 200
+
+    children = {s.name: s for s in spans if s.parent is not None and s.parent.span_id == root.context.span_id}
+    for stage in ("auth", "save", "db_commit"):
+        assert stage in children
+        # 各阶段位于请求的时间范围内
+        assert root.start_time <= children[stage].start_time <= children[stage].end_time <= root.end_time
+    assert children["auth"].end_time <= children["save"].start_time <= children["db_commit"].start_time
@@ -90,6 +90,15 @@ export interface Image {
   markdown: string;
   html: string;
   gitee_url?: string;
+  format?: string; // 文件头探测到的真实格式
+  width?: number;
+  height?: number;
+  placeholder?: string; // 低清占位图 data URI
+  srcset?: string; // 响应式缩略图地址
+  video_url?: string; // GIF动图转换的视频地址
+  bytes_saved: number;
+  access_count: number; // 累计访问次数
+  last_accessed_at?: string; // 最近访问时间（批量写入，有延迟）
   created_at: string;
 }
 